@@ -1,167 +1,160 @@
 #!/usr/bin/env python3
 """
 BLSM v2 - Bonelab Simple Mod Manager (Final)
-- Ensures working dir is the script/exe folder (fixes disappearing profiles)
-- Profiles folder created next to script/exe
+- Profiles, config and index live next to the script/exe, whatever the working directory
+- Fast start: the window comes up first, profiles are shown from the index and checked against the disk in the background
 - Dark UI using CustomTkinter when available (falls back to Tkinter look)
-- ZIP extraction with safe extraction and simple auto-fix for nested folders
-- Profiles: create / rename / delete / create-from-mods / export
+- ZIP extraction: safe, single-pass and parallel, with auto-fix for nested folders
+- Profiles: create / rename / delete / create-from-mods / update-from-mods (preview, then only the differences) / export
+- Rarely used profiles can be packed into one compressed file and still be activated / exported from it
 - Add ZIP/Folder to profile (ZIPs are extracted into profile)
-- Activate profile (copy profile contents into Mods folder) and Unload (clear Mods)
-- Profile contents are shown when selecting a profile
+- Activate profile (hardlink or copy profile contents into Mods folder) and Unload (clear Mods)
+- Content-addressed blob store so files shared between profiles are stored once
+- Incremental activation: only files that differ between profile and Mods folder are touched
+- Export compresses on several threads and stores already-compressed files (bundles, images, audio) as-is
+- Unload / clear renames the Mods folder contents into a trash folder; deleting happens in the background
+- Optional staged activation: profiles are pre-built next to the Mods folder and swapped in with a rename
+- Heavy operations run as queued background jobs with progress, ETA and cancel (with rollback)
+- Import cache: a ZIP that was imported before is re-added from the store without extracting
+- Persistent profile index (SQLite) with sizes / file counts / hashes, kept up to date after every change
+- Bulk import of a whole downloads folder
+- Search by pallet / crate title or barcode across profiles, version conflicts and missing dependencies (from pallet.json)
+- Every operation is logged with per-phase timings to blsm_ops.log; "Operation Stats" shows the recent ones
+- Profile contents are shown as a tree when selecting a profile; folders load when expanded, with sizes and file counts
 - Scrollbars on lists, dark-friendly colors
+This file is only the Tk window; all profile / Mods folder logic lives in blsm_core.py
+and is also available headless through blsm_cli.py.
 Save this file as BLSM.py and run with the same Python used to build your EXE.
 """
 
 import os
 import sys
-import shutil
-import zipfile
-import json
+import time
 import tkinter as tk
-from tkinter import filedialog, messagebox, simpledialog
-
-# --- Ensure working directory is the script/executable folder ---
-if getattr(sys, "frozen", False):
-    # Running as EXE
-    SCRIPT_DIR = os.path.dirname(sys.executable)
-else:
-    # Running as script
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-try:
-    os.chdir(SCRIPT_DIR)
-except Exception:
-    pass
+from tkinter import filedialog, messagebox, simpledialog, ttk
+from concurrent.futures import ThreadPoolExecutor
+
+from blsm_core import (
+    EXPORT_LEVEL,
+    JobCancelled,
+    JobQueue,
+    ModManager,
+    attach_log,
+    format_bytes,
+    format_import_report,
+    load_config,
+    log,
+    save_config,
+)
+
+# all paths come from blsm_core (absolute, next to the script/executable), so the working
+# directory is left alone
 
-# --- Optional nicer UI with customtkinter ---
-USE_CTK = False
-try:
-    import customtkinter as ctk
-    USE_CTK = True
-    ctk.set_appearance_mode("dark")
-    ctk.set_default_color_theme("blue")
-except Exception:
-    ctk = None  # fallback to plain Tkinter widgets
-
-# --- Constants ---
-CONFIG_FILE = "blsm_config.json"
-PROFILES_DIR = "profiles"
-os.makedirs(PROFILES_DIR, exist_ok=True)
 
-# --- Utility functions ---
-
-
-def safe_extract_member(zf: zipfile.ZipFile, member: str, target_dir: str):
-    """
-    Safely extract a member (prevents ZipSlip).
-    """
-    # Normalize path and ensure it stays inside target_dir
-    dest_path = os.path.normpath(os.path.join(target_dir, member))
-    if not dest_path.startswith(os.path.normpath(target_dir)):
-        raise Exception("Illegal file path in zip (ZipSlip attempt)")
-    # Create parent directories
-    parent = os.path.dirname(dest_path)
-    if parent:
-        os.makedirs(parent, exist_ok=True)
-    # Extract file content
-    with zf.open(member) as src, open(dest_path, "wb") as dst:
-        shutil.copyfileobj(src, dst)
-
-
-def extract_zip_autofix(zip_path: str, dest: str):
+# --- Optional nicer UI with customtkinter ---
+def load_customtkinter():
     """
-    Extract zip to dest. Try to auto-fix single-top-folder zips by moving contents up.
-    This is a simple heuristic (if the zip contains exactly one top-level folder).
+    customtkinter set up for the dark theme, or None (plain Tkinter widgets) if it isn't installed.
+    Imported when the window is created, not on import, so the command line never pays for it.
     """
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        names = [n for n in zf.namelist() if not n.endswith("/")]
-        # collect top-level entries
-        top_levels = set()
-        for n in zf.namelist():
-            part = n.split("/", 1)[0]
-            if part:
-                top_levels.add(part)
-        # extract all safely
-        for member in zf.namelist():
-            # skip directory entries — zipfile.extract will handle them, but we use safe extraction for files
-            if member.endswith("/"):
-                continue
-            # If single top-level folder, strip it
-            if len(top_levels) == 1:
-                root = list(top_levels)[0]
-                if member.startswith(root + "/"):
-                    member_stripped = member[len(root) + 1 :]
-                else:
-                    member_stripped = member
-            else:
-                member_stripped = member
-            # skip empty names
-            if not member_stripped:
-                continue
-            safe_extract_member(zf, member, dest)  # writes to dest/member (we'll handle nested folder fix below)
-    # If zip had a single top-level folder that was extracted, try to flatten
     try:
-        # find entries in dest
-        entries = os.listdir(dest)
-        if len(entries) == 1:
-            single = os.path.join(dest, entries[0])
-            if os.path.isdir(single):
-                # move contents up
-                for child in os.listdir(single):
-                    shutil.move(os.path.join(single, child), os.path.join(dest, child))
-                try:
-                    os.rmdir(single)
-                except Exception:
-                    pass
-    except FileNotFoundError:
-        pass
+        import customtkinter
+        customtkinter.set_appearance_mode("dark")
+        customtkinter.set_default_color_theme("blue")
+        return customtkinter
+    except Exception:
+        log.info("customtkinter not available, using plain Tkinter", exc_info=True)
+        return None
 
 
+# --- Constants ---
+JOB_POLL_MS = 150
+PRESTAGE_IDLE_MS = 2000
+# contents tree: poll interval for folder loads, items inserted per Tk turn, items shown before "... more"
+TREE_POLL_MS = 30
+TREE_CHUNK = 300
+TREE_PAGE = 3000
+# redraws (profile list, a chunk of the contents tree) taking longer than this are logged
+UI_SLOW_MS = 50
+
 # --- App class ---
 
 
 class BLSMApp:
     def __init__(self):
+        # state
+        self.mods_folder = ""
+        self.load_config()
+
         # Create main window (use CTk if available for nicer look)
-        if USE_CTK:
-            self.root = ctk.CTk()
-        else:
-            self.root = tk.Tk()
+        self.ctk = load_customtkinter()
+        self.root = self.ctk.CTk() if self.ctk else tk.Tk()
         self.root.title("BLSM — Bonelab Mod Manager")
         self.root.geometry("980x560")
 
-        # state
-        self.mods_folder = ""
-        self.load_config()
+        # opening the index is cheap; checking it against the disk happens after the window is up
+        self.core = ModManager(mods_folder=self.mods_folder, mode=self.get_activation_mode(),
+                               staged=self.config.get("staged_activation", False))
+        # warnings / errors go to the same rotating log as the operation records
+        attach_log(self.core.ops.path)
+        self.core.ops.profiling = self.config.get("profile_operations", False)
+        self.stats_window = None
+        self.prestage_after = None
+        self.jobs = JobQueue()
+        self.profile_names = []
+        self.packed_profiles = set()
+        self.tree_profile = None
+        self.tree_generation = 0
+        self.tree_more = {}
+        # one thread reads folder levels for the contents tree, so expanding never waits for a job
+        self.tree_loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blsm-tree")
 
         # build UI
         self.build_ui()
 
-        # initial load
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(JOB_POLL_MS, self.poll_jobs)
+        # idle callbacks run once the window has been mapped and drawn
+        self.root.after_idle(self.show_snapshot)
+
+    # ---------- Startup ----------
+    def show_snapshot(self):
+        """
+        Fill the window from what the index knew at the last exit (one SQLite query, no disk walk),
+        then check the disk on the job thread.
+        """
         self.refresh_profiles()
-        # If we have last selected in config, try to select it
-        try:
-            last = getattr(self, "config", {}).get("last_profile", None)
-            if last:
-                idx = None
-                for i, p in enumerate(self.list_profiles.get(0, "end")):
-                    if p == last:
-                        idx = i
-                        break
-                if idx is not None:
-                    self.list_profiles.selection_set(idx)
-                    self.list_profiles.activate(idx)
-                    self.load_profile_contents()
-        except Exception:
-            pass
+        last = self.config.get("last_profile")
+        if last in self.profile_names:
+            # its contents load on the tree thread
+            self.select_profile(last)
+        # undo whatever a crashed run left half done, purge old trash, then catch up with changes on disk
+        self.run_job("Startup check", self.startup_check, self.startup_checked)
+
+    def startup_check(self, progress):
+        recovered = self.core.recover()
+        return recovered, self.core.index.sync()
+
+    def startup_checked(self, result):
+        recovered, changed = result
+        if changed:
+            prof = self.get_selected_profile()
+            self.refresh_profiles()
+            if prof in changed:
+                self.select_profile(prof)
+            elif prof in self.profile_names:
+                # same contents as shown; only restore the selection
+                self.list_profiles.selection_set(self.profile_names.index(prof))
+        self.recovered(recovered)
 
     # ---------- UI ----------
     def build_ui(self):
         # choose widget classes
-        Frame = ctk.CTkFrame if USE_CTK else tk.Frame
-        Button = ctk.CTkButton if USE_CTK else tk.Button
-        Label = ctk.CTkLabel if USE_CTK else tk.Label
-        Entry = ctk.CTkEntry if USE_CTK else tk.Entry
+        ctk = self.ctk
+        Frame = ctk.CTkFrame if ctk else tk.Frame
+        Button = ctk.CTkButton if ctk else tk.Button
+        Label = ctk.CTkLabel if ctk else tk.Label
+        Entry = ctk.CTkEntry if ctk else tk.Entry
 
         # layout: three columns
         root = self.root
@@ -187,18 +180,36 @@ class BLSMApp:
         Button(left, text="Rename", command=self.rename_profile).pack(fill="x", pady=3)
         Button(left, text="Delete", command=self.delete_profile).pack(fill="x", pady=3)
         Button(left, text="Create from Mods Folder", command=self.create_profile_from_mods).pack(fill="x", pady=6)
+        Button(left, text="Update from Mods Folder", command=self.update_profile_from_mods).pack(fill="x", pady=3)
+        Button(left, text="Edit Layers", command=self.edit_layers).pack(fill="x", pady=3)
+        Button(left, text="Pack / Unpack", command=self.toggle_pack).pack(fill="x", pady=3)
+        Button(left, text="Deduplicate Storage", command=self.deduplicate_storage).pack(fill="x", pady=3)
+        Button(left, text="Search Mods", command=self.open_search).pack(fill="x", pady=3)
 
         # middle: profile contents
         mid = Frame(root)
         mid.grid(row=0, column=1, sticky="nsew", padx=10, pady=10)
         Label(mid, text="Profile Contents", font=("Segoe UI", 14, "bold")).pack(anchor="w")
-        self.list_contents = tk.Listbox(mid, bg="#2b2b2b", fg="white", selectbackground="#1f6aa5")
-        self.list_contents.pack(fill="both", expand=True, pady=6)
-        sbc = tk.Scrollbar(mid, orient="vertical", command=self.list_contents.yview)
-        self.list_contents.config(yscrollcommand=sbc.set)
+        # folders are only read when expanded; see load_tree_level
+        style = ttk.Style(root)
+        style.configure("BLSM.Treeview", background="#2b2b2b", fieldbackground="#2b2b2b", foreground="white")
+        style.map("BLSM.Treeview", background=[("selected", "#1f6aa5")])
+        self.tree_contents = ttk.Treeview(mid, columns=("size", "files"), style="BLSM.Treeview")
+        self.tree_contents.heading("#0", text="Name", anchor="w")
+        self.tree_contents.heading("size", text="Size", anchor="e")
+        self.tree_contents.heading("files", text="Files", anchor="e")
+        self.tree_contents.column("#0", width=260, stretch=True)
+        self.tree_contents.column("size", width=80, anchor="e", stretch=False)
+        self.tree_contents.column("files", width=60, anchor="e", stretch=False)
+        self.tree_contents.pack(fill="both", expand=True, pady=6)
+        sbc = tk.Scrollbar(mid, orient="vertical", command=self.tree_contents.yview)
+        self.tree_contents.config(yscrollcommand=sbc.set)
         sbc.pack(side="right", fill="y")
+        self.tree_contents.bind("<<TreeviewOpen>>", self.on_tree_open)
+        self.tree_contents.bind("<Double-Button-1>", self.on_tree_double_click)
 
         Button(mid, text="Add ZIP / Folder", command=self.add_to_profile).pack(fill="x", pady=3)
+        Button(mid, text="Bulk Import Folder", command=self.bulk_import_folder).pack(fill="x", pady=3)
         Button(mid, text="Remove Selected", command=self.remove_from_profile).pack(fill="x", pady=3)
         Button(mid, text="Export as ZIP", command=self.export_profile).pack(fill="x", pady=3)
 
@@ -213,8 +224,8 @@ class BLSMApp:
             try:
                 self.mods_entry.delete(0, "end")
                 self.mods_entry.insert(0, self.mods_folder)
-            except Exception:
-                pass
+            except tk.TclError:
+                log.warning("could not show the mods folder", exc_info=True)
 
         Button(right, text="Select Folder", command=self.select_mods_folder).pack(fill="x", pady=3)
         Button(right, text="Auto-Detect", command=self.autodetect_mods_folder).pack(fill="x", pady=3)
@@ -227,78 +238,342 @@ class BLSMApp:
         r1.pack(anchor="w")
         r2.pack(anchor="w")
 
-        Button(right, text="Activate Profile (copy)", command=self.confirm_activate).pack(fill="x", pady=8)
+        # activation mode: hardlinks make switching near-instant when profiles and Mods share a drive
+        self.link_mode_var = tk.BooleanVar(value=self.config.get("activation_mode", "link") == "link")
+        tk.Checkbutton(right, text="Use hardlinks (fast switch)", variable=self.link_mode_var,
+                       command=self.on_link_mode_changed).pack(anchor="w", pady=(10, 0))
+        # staged mode: the selected profile is built next to the Mods folder while idle, activation is a rename
+        self.staged_var = tk.BooleanVar(value=self.config.get("staged_activation", False))
+        tk.Checkbutton(right, text="Pre-stage profiles (instant switch)", variable=self.staged_var,
+                       command=self.on_staged_changed).pack(anchor="w")
+
+        Button(right, text="Activate Profile", command=self.confirm_activate).pack(fill="x", pady=8)
         Button(right, text="Unload Mods (clear)", command=self.confirm_unload).pack(fill="x", pady=3)
+        Button(right, text="Verify Mods Folder", command=self.verify_mods_folder).pack(fill="x", pady=3)
 
-        # small status label
+        # small status label (also shows progress of the running job)
         self.status_var = tk.StringVar(value="")
         tk.Label(right, textvariable=self.status_var, wraplength=220, justify="left").pack(pady=(10, 0))
+        Button(right, text="Cancel Running Job", command=self.cancel_jobs).pack(fill="x", pady=3)
+        Button(right, text="Operation Stats", command=self.open_stats).pack(fill="x", pady=3)
 
     # ---------- Config ----------
     def load_config(self):
-        self.config = {}
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                    self.config = json.load(f)
-                    self.mods_folder = self.config.get("mods_folder", "")
-            except Exception:
-                self.config = {}
-        # ensure profiles dir exists
-        os.makedirs(PROFILES_DIR, exist_ok=True)
+        self.config = load_config()
+        self.mods_folder = self.config.get("mods_folder", "")
 
     def save_config(self):
         try:
             self.config["mods_folder"] = self.mods_folder
-            with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.config, f, indent=2)
-        except Exception:
-            pass
+            save_config(self.config)
+        except OSError:
+            log.exception("could not save the config")
+
+    def get_activation_mode(self):
+        return self.config.get("activation_mode", "link")
+
+    def on_link_mode_changed(self):
+        self.config["activation_mode"] = "link" if self.link_mode_var.get() else "copy"
+        self.core.mode = self.config["activation_mode"]
+        self.save_config()
+
+    def on_staged_changed(self):
+        self.config["staged_activation"] = self.staged_var.get()
+        self.core.staged = self.config["staged_activation"]
+        self.save_config()
+        self.schedule_prestage()
+
+    def set_mods_folder(self, folder):
+        self.mods_folder = folder
+        self.core.mods_folder = folder
+        # try to set in entry
+        try:
+            self.mods_entry.delete(0, "end")
+            self.mods_entry.insert(0, folder)
+        except tk.TclError:
+            log.warning("could not show the mods folder", exc_info=True)
+        self.save_config()
+
+    # ---------- Jobs ----------
+    def run_job(self, name, func, on_done=None):
+        """
+        Queue func(progress) on the worker thread. on_done(result) runs on the Tk thread afterwards.
+        """
+        def done(result):
+            self.status_var.set(f"{name}: done.")
+            if on_done:
+                on_done(result)
+
+        def failed(e):
+            if isinstance(e, JobCancelled):
+                self.status_var.set(f"{name}: cancelled, changes rolled back.")
+            else:
+                log.error("%s failed", name, exc_info=e)
+                self.status_var.set(f"{name}: failed.")
+                messagebox.showerror("Error", f"{name} failed: {e}")
+
+        self.jobs.submit(name, func, done, failed)
+        self.update_job_status()
+
+    def poll_jobs(self):
+        self.root.after(JOB_POLL_MS, self.poll_jobs)
+        for job in self.jobs.poll():
+            if job.error is None:
+                job.on_done(job.result)
+            else:
+                job.on_error(job.error)
+        self.update_job_status()
+
+    def update_job_status(self):
+        job = self.jobs.current
+        if job is None:
+            return
+        p = job.progress
+        text = job.name + (f" [{p.phase}]" if p.phase else "") + f"\n{p.describe()}"
+        queued = self.jobs.pending_count()
+        if queued:
+            text += f"\n{queued} more queued"
+        self.status_var.set(text)
+
+    def log_redraw(self, what, t0):
+        seconds = time.perf_counter() - t0
+        if seconds * 1000 > UI_SLOW_MS:
+            self.core.ops.event("ui", seconds, name=what)
+
+    # ---------- Operation stats ----------
+    def open_stats(self):
+        if self.stats_window is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            self.fill_stats()
+            return
+        win = self.stats_window = tk.Toplevel(self.root)
+        win.title("BLSM — Recent Operations")
+        win.geometry("820x460")
+
+        top = tk.Frame(win)
+        top.pack(fill="x", padx=8, pady=6)
+        self.profile_ops_var = tk.BooleanVar(value=self.core.ops.profiling)
+        tk.Checkbutton(top, text="Profile operations (cProfile + tracemalloc report per operation)",
+                       variable=self.profile_ops_var, command=self.on_profile_ops_changed).pack(side="left")
+        tk.Button(top, text="Refresh", command=self.fill_stats).pack(side="right")
+
+        columns = ("when", "profile", "seconds", "size", "files", "rate", "status")
+        tree = self.stats_tree = ttk.Treeview(win, columns=columns, height=12, style="BLSM.Treeview")
+        tree.heading("#0", text="Operation")
+        tree.column("#0", width=110)
+        for col, text, width in (("when", "When", 80), ("profile", "Profile", 140), ("seconds", "Seconds", 70),
+                                 ("size", "Size", 80), ("files", "Files", 60), ("rate", "Rate", 90),
+                                 ("status", "Status", 200)):
+            tree.heading(col, text=text)
+            tree.column(col, width=width, anchor="w" if col in ("profile", "status") else "e")
+        tree.pack(fill="both", expand=True, padx=8)
+        tree.bind("<<TreeviewSelect>>", self.show_op_details)
+        self.stats_details = tk.Text(win, height=8, bg="#222", fg="white")
+        self.stats_details.pack(fill="x", padx=8, pady=6)
+        tk.Label(win, text=f"Log: {self.core.ops.path}", anchor="w").pack(fill="x", padx=8, pady=(0, 6))
+        self.fill_stats()
+
+    def fill_stats(self):
+        tree = self.stats_tree
+        tree.delete(*tree.get_children())
+        self.stats_entries = self.core.ops.recent()[::-1]
+        for i, e in enumerate(self.stats_entries):
+            name = f"ui: {e.get('name', '')}" if e["op"] == "ui" else e["op"]
+            status = "ok" if e.get("ok") else e.get("error", "failed")
+            rate = f"{format_bytes(e['bytes_per_s'])}/s" if e.get("bytes_per_s") else ""
+            tree.insert("", "end", iid=str(i), text=name, values=(
+                time.strftime("%H:%M:%S", time.localtime(e.get("started", 0))), e.get("profile") or "",
+                f"{e['seconds']:.2f}", format_bytes(e.get("bytes", 0)), e.get("files", ""), rate, status))
+
+    def show_op_details(self, event=None):
+        sel = self.stats_tree.selection()
+        if not sel:
+            return
+        e = self.stats_entries[int(sel[0])]
+        lines = [f"{p['phase']}: {p['seconds']:.3f} s, {format_bytes(p['bytes'])}, {p['files']} files"
+                 + (f" ({p['count']}x)" if p.get("count", 1) > 1 else "") for p in e.get("phases", [])]
+        if e.get("result"):
+            lines.append("result: " + ", ".join(f"{k} {v}" for k, v in e["result"].items()))
+        if e.get("report"):
+            lines.append(f"profile report: {e['report']} (peak traced memory {format_bytes(e['peak_traced_bytes'])})")
+        self.stats_details.delete("1.0", "end")
+        self.stats_details.insert("end", "\n".join(lines) or "no phases recorded")
+
+    def on_profile_ops_changed(self):
+        self.config["profile_operations"] = self.profile_ops_var.get()
+        self.core.ops.profiling = self.config["profile_operations"]
+        self.save_config()
+
+    def cancel_jobs(self):
+        if self.jobs.busy():
+            self.jobs.cancel_all()
+            self.status_var.set("Cancelling...")
+
+    def on_close(self):
+        if self.jobs.busy():
+            if not messagebox.askyesno("Confirm", "Operations are still running. Cancel them and quit?"):
+                return
+            self.jobs.cancel_all()
+            self.wait_and_close()
+            return
+        self.root.destroy()
+
+    def wait_and_close(self):
+        # let the worker roll back before the process goes away
+        if self.jobs.busy():
+            self.root.after(JOB_POLL_MS, self.wait_and_close)
+        else:
+            self.root.destroy()
+
+    def recovered(self, result):
+        if result["restored"]:
+            self.refresh_profiles()
+            messagebox.showinfo("BLSM", f"The last session ended during an operation; {result['restored']} "
+                                        "moved files were put back.")
 
     # ---------- Profiles ----------
     def refresh_profiles(self):
+        t0 = time.perf_counter()
         self.list_profiles.delete(0, "end")
+        self.profile_names = []
+        self.packed_profiles = set()
         try:
-            for name in sorted(os.listdir(PROFILES_DIR)):
-                path = os.path.join(PROFILES_DIR, name)
-                if os.path.isdir(path):
-                    self.list_profiles.insert("end", name)
+            for p in self.core.list_profiles(sync=False):
+                self.profile_names.append(p.name)
+                if p.packed:
+                    self.packed_profiles.add(p.name)
+                based_on = f" ← {', '.join(p.parents)}" if p.parents else ""
+                packed = " [packed]" if p.packed else ""
+                self.list_profiles.insert("end", f"{p.name}{based_on}{packed}  ({format_bytes(p.bytes)}, {p.files} files)")
         except Exception:
-            pass
+            log.exception("could not list the profiles")
+        self.log_redraw("profile list", t0)
 
     def get_selected_profile(self):
         sel = self.list_profiles.curselection()
-        if not sel:
+        if not sel or sel[0] >= len(self.profile_names):
             return None
-        return self.list_profiles.get(sel[0])
+        return self.profile_names[sel[0]]
 
     def load_profile_contents(self, event=None):
         prof = self.get_selected_profile()
-        self.list_contents.delete(0, "end")
+        self.clear_contents()
         # save last profile in config
-        if prof:
+        if prof and self.config.get("last_profile") != prof:
             self.config["last_profile"] = prof
             self.save_config()
         if not prof:
             return
-        profile_path = os.path.join(PROFILES_DIR, prof)
+        self.schedule_prestage()
+        # top-level entries (folders/files) with their size from the index
+        self.tree_profile = prof
+        self.load_tree_level(prof, "", "")
+
+    # ---------- Contents tree ----------
+    # item ids: "p:<path>" for files/folders, "l:<path>" for a folder's "Loading..." placeholder,
+    # "m:<path>" for the "... more" item of a long folder
+    def clear_contents(self):
+        # results of loads still running for the old view are dropped by the generation check
+        self.tree_generation += 1
+        self.tree_more.clear()
+        self.tree_contents.delete(*self.tree_contents.get_children())
+
+    def load_tree_level(self, prof, path, parent):
+        """
+        Read one folder level on the loader thread; the Tk thread polls for the result.
+        """
+        future = self.tree_loader.submit(self.core.list_children, prof, path)
+        self.root.after(TREE_POLL_MS, self.poll_tree_level, future, self.tree_generation, parent)
+
+    def poll_tree_level(self, future, generation, parent):
+        if not future.done():
+            self.root.after(TREE_POLL_MS, self.poll_tree_level, future, generation, parent)
+            return
+        if generation != self.tree_generation:
+            return
         try:
-            # list top-level entries (folders/files) for clarity
-            for entry in sorted(os.listdir(profile_path)):
-                self.list_contents.insert("end", entry)
-        except Exception:
-            pass
+            nodes = future.result()
+        except Exception as e:
+            self.status_var.set(f"Could not list profile contents: {e}")
+            return
+        if parent:
+            self.tree_contents.delete(*self.tree_contents.get_children(parent))
+        self.insert_tree_nodes(parent, nodes, 0, generation)
+
+    def insert_tree_nodes(self, parent, nodes, start, generation):
+        """
+        Insert nodes[start:] TREE_CHUNK at a time, giving Tk a turn in between; after every
+        TREE_PAGE items the rest waits behind a "... more" item.
+        """
+        tree = self.tree_contents
+        if generation != self.tree_generation or (parent and not tree.exists(parent)):
+            return
+        t0 = time.perf_counter()
+        stop = min(len(nodes), start + TREE_CHUNK)
+        for node in nodes[start:stop]:
+            iid = tree.insert(parent, "end", iid="p:" + node.path, text=node.name,
+                              values=(format_bytes(node.bytes), node.files))
+            if node.is_dir and node.files:
+                tree.insert(iid, "end", iid="l:" + node.path, text="Loading...")
+        self.log_redraw("contents tree", t0)
+        if stop >= len(nodes):
+            return
+        if stop % TREE_PAGE == 0:
+            more = "m:" + parent[2:]
+            tree.insert(parent, "end", iid=more, text=f"... {len(nodes) - stop} more (double-click to show)")
+            self.tree_more[more] = (parent, nodes, stop)
+            return
+        self.root.after(1, self.insert_tree_nodes, parent, nodes, stop, generation)
+
+    def on_tree_open(self, event=None):
+        iid = self.tree_contents.focus()
+        children = self.tree_contents.get_children(iid)
+        if len(children) == 1 and children[0].startswith("l:"):
+            self.load_tree_level(self.tree_profile, iid[2:], iid)
+
+    def on_tree_double_click(self, event):
+        iid = self.tree_contents.identify_row(event.y)
+        if iid in self.tree_more:
+            parent, nodes, start = self.tree_more.pop(iid)
+            self.tree_contents.delete(iid)
+            self.insert_tree_nodes(parent, nodes, start, self.tree_generation)
+
+    def schedule_prestage(self):
+        # stage the selected profile once the user has stayed on it for a moment
+        if self.prestage_after is not None:
+            self.root.after_cancel(self.prestage_after)
+            self.prestage_after = None
+        if self.core.staged:
+            self.prestage_after = self.root.after(PRESTAGE_IDLE_MS, self.prestage)
+
+    def prestage(self):
+        self.prestage_after = None
+        prof = self.get_selected_profile()
+        if not prof or self.jobs.busy() or not self.mods_folder or not os.path.isdir(self.mods_folder):
+            return
+        if prof == self.core.active_profile():
+            return
+        self.jobs.submit(f"Pre-stage {prof}", lambda progress: self.core.stage(prof, progress),
+                         lambda r: self.status_var.set(f"{prof} is staged, activating it is instant."),
+                         lambda e: self.status_var.set("" if isinstance(e, JobCancelled) else f"Pre-staging {prof} failed: {e}"))
+
+    def select_profile(self, prof):
+        if prof in self.profile_names:
+            idx = self.profile_names.index(prof)
+            self.list_profiles.selection_clear(0, "end")
+            self.list_profiles.selection_set(idx)
+            self.list_profiles.activate(idx)
+        self.load_profile_contents()
 
     def new_profile(self):
         name = simpledialog.askstring("New Profile", "Profile name:")
         if not name:
             return
-        path = os.path.join(PROFILES_DIR, name)
-        if os.path.exists(path):
-            messagebox.showerror("Error", "Profile already exists.")
-            return
         try:
-            os.makedirs(path, exist_ok=False)
+            if self.core.exists(name):
+                messagebox.showerror("Error", "Profile already exists.")
+                return
+            self.core.create_profile(name)
             self.refresh_profiles()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to create profile: {e}")
@@ -310,16 +585,15 @@ class BLSMApp:
         new = simpledialog.askstring("Rename Profile", "New name:", initialvalue=prof)
         if not new or new == prof:
             return
-        src = os.path.join(PROFILES_DIR, prof)
-        dst = os.path.join(PROFILES_DIR, new)
-        if os.path.exists(dst):
-            messagebox.showerror("Error", "Target profile name already exists.")
-            return
         try:
-            os.rename(src, dst)
-            self.refresh_profiles()
-        except Exception as e:
-            messagebox.showerror("Error", f"Rename failed: {e}")
+            if self.core.exists(new):
+                messagebox.showerror("Error", "Target profile name already exists.")
+                return
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.run_job(f"Rename {prof}", lambda progress: self.core.rename_profile(prof, new),
+                     lambda r: self.refresh_profiles())
 
     def delete_profile(self):
         prof = self.get_selected_profile()
@@ -327,12 +601,127 @@ class BLSMApp:
             return
         if not messagebox.askyesno("Confirm", f"Delete profile '{prof}'?"):
             return
-        try:
-            shutil.rmtree(os.path.join(PROFILES_DIR, prof))
+
+        def done(r):
             self.refresh_profiles()
-            self.list_contents.delete(0, "end")
-        except Exception as e:
-            messagebox.showerror("Error", f"Delete failed: {e}")
+            self.clear_contents()
+
+        self.run_job(f"Delete {prof}", lambda progress: self.core.delete_profile(prof, progress), done)
+
+    def edit_layers(self):
+        prof = self.get_selected_profile()
+        if not prof:
+            messagebox.showerror("Error", "Select a profile first.")
+            return
+        spec = self.core.layers(prof)
+        parents = simpledialog.askstring("Edit Layers", f'Profiles "{prof}" builds on, separated by commas\n'
+                                         "(later ones win on conflicts, empty = plain profile):",
+                                         initialvalue=", ".join(spec["parents"]))
+        if parents is None:
+            return
+        remove = simpledialog.askstring("Edit Layers", "Folders / files of the parents to leave out,\n"
+                                        'separated by ";" (e.g. SomeMod; Other/file.txt):',
+                                        initialvalue="; ".join(spec["remove"]))
+        if remove is None:
+            return
+        parents = [p.strip() for p in parents.split(",") if p.strip()]
+        remove = [r.strip() for r in remove.split(";") if r.strip()]
+
+        def update(progress):
+            self.core.set_layers(prof, parents, remove)
+            return self.core.resolve(prof)
+
+        def done(r):
+            self.refresh_profiles()
+            self.select_profile(prof)
+            self.status_var.set(f"{prof}: {len(r['manifest'])} files with its layers")
+            if r["conflicts"]:
+                self.show_layer_conflicts(prof, r["conflicts"])
+
+        self.run_job(f"Layers of {prof}", update, done)
+
+    def show_layer_conflicts(self, prof, conflicts):
+        lines = []
+        for c in conflicts[:10]:
+            if c["kind"] == "pallet":
+                lines.append(f"{c['path']}: same pallet in " + ", ".join(c["paths"]))
+            else:
+                lines.append(f"{c['path']}: in {' and '.join(c['layers'])}, using {c['used']}")
+        if len(conflicts) > 10:
+            lines.append(f"... and {len(conflicts) - 10} more")
+        messagebox.showwarning("BLSM", f'The layers of "{prof}" conflict:\n' + "\n".join(lines))
+
+    def toggle_pack(self):
+        prof = self.get_selected_profile()
+        if not prof:
+            messagebox.showerror("Error", "Select a profile first.")
+            return
+        if prof in self.packed_profiles:
+            if not messagebox.askyesno("Unpack", f'Unpack "{prof}" into a normal folder again?'):
+                return
+
+            def unpacked(r):
+                self.refresh_profiles()
+                self.select_profile(prof)
+                self.status_var.set(f"Unpacked {prof}: {r['files']} files")
+
+            self.run_job(f"Unpack {prof}", lambda progress: self.core.unpack(prof, progress), unpacked)
+            return
+        if not messagebox.askyesno("Pack", f'Compress "{prof}" into a pack?\nIt can still be activated, exported '
+                                           "and searched; to add or remove files, unpack it first."):
+            return
+
+        def packed(r):
+            self.refresh_profiles()
+            self.select_profile(prof)
+            self.status_var.set(f"Packed {prof}: {format_bytes(r['bytes'])} in {format_bytes(r['packed_bytes'])}, "
+                                f"{format_bytes(r['freed'])} of shared storage freed")
+
+        self.run_job(f"Pack {prof}", lambda progress: self.core.pack(prof, progress), packed)
+
+    def deduplicate_storage(self):
+        def done(r):
+            self.refresh_profiles()
+            messagebox.showinfo("BLSM", f"Checked {r['files']} files ({r['hashed']} newly stored).\n"
+                                        f"Freed {r['freed'] / (1024 * 1024):.1f} MB of unused blobs.")
+
+        self.run_job("Deduplicate storage", self.core.deduplicate, done)
+
+    def update_profile_from_mods(self):
+        if not self.mods_folder or not os.path.exists(self.mods_folder):
+            messagebox.showerror("Error", "Set a valid mods folder first.")
+            return
+        prof = self.get_selected_profile() or self.core.active_profile()
+        if not prof:
+            messagebox.showerror("Error", "Select the profile to update.")
+            return
+
+        def updated(r):
+            self.refresh_profiles()
+            self.select_profile(prof)
+            self.status_var.set(f"Updated {prof} from the mods folder: {r['added']} added, {r['replaced']} replaced, "
+                                f"{r['removed']} removed")
+
+        def preview(changes):
+            if changes.empty:
+                if changes.touched:
+                    # same contents, only timestamps differ; fixing them keeps the next activation fast
+                    self.run_job(f"Update {prof}", lambda progress: self.core.update_from_mods(prof, changes, progress))
+                messagebox.showinfo("BLSM", f'"{prof}" already matches the mods folder.')
+                return
+            lines = [f"{len(changes.added)} added, {len(changes.changed)} changed, {len(changes.removed)} removed "
+                     f"({format_bytes(changes.add_bytes)} to copy):"]
+            shown = ([f"+ {rel}" for rel in changes.added[:5]] + [f"~ {rel}" for rel in changes.changed[:5]] +
+                     [f"- {rel}" for rel in changes.removed[:5]])
+            lines += shown
+            if len(shown) < len(changes.added) + len(changes.changed) + len(changes.removed):
+                lines.append("...")
+            if messagebox.askyesno("Update from Mods Folder", "\n".join(lines) + f'\n\nApply these changes to "{prof}"?'):
+                self.run_job(f"Update {prof}", lambda progress: self.core.update_from_mods(prof, changes, progress),
+                             updated)
+
+        self.run_job(f"Compare {prof} with mods folder",
+                     lambda progress: self.core.changes_from_mods(prof, progress=progress), preview)
 
     def create_profile_from_mods(self):
         if not self.mods_folder or not os.path.exists(self.mods_folder):
@@ -341,23 +730,89 @@ class BLSMApp:
         name = simpledialog.askstring("New Profile from Mods", "Enter profile name:")
         if not name:
             return
-        dest = os.path.join(PROFILES_DIR, name)
-        if os.path.exists(dest):
-            messagebox.showerror("Error", "Profile already exists.")
-            return
         try:
-            os.makedirs(dest, exist_ok=True)
-            for item in os.listdir(self.mods_folder):
-                s = os.path.join(self.mods_folder, item)
-                d = os.path.join(dest, item)
-                if os.path.isdir(s):
-                    shutil.copytree(s, d, dirs_exist_ok=True)
-                else:
-                    shutil.copy2(s, d)
+            if self.core.exists(name):
+                messagebox.showerror("Error", "Profile already exists.")
+                return
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        def done(r):
             self.refresh_profiles()
             messagebox.showinfo("BLSM", "Profile created from mods folder.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to create profile: {e}")
+
+        self.run_job(f"Create {name}", lambda progress: self.core.create_from_mods(name, progress), done)
+
+    # ---------- Search ----------
+    def open_search(self):
+        """
+        Search window over the pallet index: words / barcode, version conflicts, missing dependencies.
+        Double-clicking a result selects its profile.
+        """
+        win = tk.Toplevel(self.root)
+        win.title("Search Mods")
+        win.geometry("820x440")
+        top = tk.Frame(win)
+        top.pack(fill="x", padx=8, pady=8)
+        query = tk.Entry(top)
+        query.pack(side="left", fill="x", expand=True)
+        results = tk.Listbox(win, bg="#2b2b2b", fg="white", selectbackground="#1f6aa5")
+        sb = tk.Scrollbar(win, orient="vertical", command=results.yview)
+        results.config(yscrollcommand=sb.set)
+        info = tk.StringVar(value="Search titles, authors or barcodes of pallets, avatars, levels, ...")
+        tk.Label(win, textvariable=info, anchor="w").pack(fill="x", padx=8)
+        sb.pack(side="right", fill="y")
+        results.pack(fill="both", expand=True, padx=8, pady=(0, 8))
+        profiles = []
+
+        def show(rows, what, started):
+            # rows: (profile, text)
+            results.delete(0, "end")
+            profiles[:] = [r[0] for r in rows]
+            for prof, text in rows:
+                results.insert("end", f"{prof}:  {text}")
+            info.set(f"{len(rows)} {what} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+        def hit_text(h):
+            return f"[{h.kind}] {h.title or h.barcode}  ({h.barcode}" + (f", v{h.version}" if h.version else "") + ")"
+
+        def search(event=None):
+            text = query.get().strip()
+            if not text:
+                return
+            started = time.perf_counter()
+            # an exact barcode first, otherwise a word search
+            hits = self.core.find_barcode(text, sync=False) or self.core.search(text, sync=False)
+            show([(h.profile, hit_text(h)) for h in hits], "results", started)
+
+        def conflicts():
+            started = time.perf_counter()
+            rows = []
+            for c in self.core.version_conflicts(sync=False):
+                for version, profs in c["versions"].items():
+                    rows += [(p, f"{c['barcode']}  v{version or '?'}") for p in profs]
+                rows += [(p, f"{c['barcode']}  installed more than once") for p in c["duplicates"]]
+            show(rows, "conflicting pallet entries", started)
+
+        def missing():
+            started = time.perf_counter()
+            dep = query.get().strip() or None
+            rows = [(m["profile"], f"{m['pallet']} needs {m['missing']}" + (f" v{m['version']}" if m["version"] else ""))
+                    for m in self.core.missing_dependencies(dep, sync=False)]
+            show(rows, "missing dependencies", started)
+
+        def open_profile(event=None):
+            sel = results.curselection()
+            if sel:
+                self.select_profile(profiles[sel[0]])
+
+        tk.Button(top, text="Search", command=search).pack(side="left", padx=(6, 0))
+        tk.Button(top, text="Version Conflicts", command=conflicts).pack(side="left", padx=(6, 0))
+        tk.Button(top, text="Missing Dependencies", command=missing).pack(side="left", padx=(6, 0))
+        query.bind("<Return>", search)
+        results.bind("<Double-Button-1>", open_profile)
+        query.focus_set()
 
     # ---------- Profile contents management ----------
     def add_to_profile(self):
@@ -368,93 +823,96 @@ class BLSMApp:
         files = filedialog.askopenfilenames(title="Select ZIP files or folders (hold Ctrl for many)")
         if not files:
             return
-        dest_profile = os.path.join(PROFILES_DIR, prof)
-        for f in files:
-            try:
-                if os.path.isfile(f) and f.lower().endswith(".zip"):
-                    # choose target based on radio
-                    target_choice = self.extract_target_var.get()
-                    target = dest_profile if target_choice == "profile" else self.mods_folder
-                    if target_choice == "mods" and (not self.mods_folder or not os.path.exists(self.mods_folder)):
-                        messagebox.showerror("Error", "Mods folder not set or doesn't exist.")
-                        continue
-                    extract_zip_autofix(f, target)
-                elif os.path.isdir(f):
-                    shutil.copytree(f, os.path.join(dest_profile, os.path.basename(f)), dirs_exist_ok=True)
-                else:
-                    # regular file -> copy into profile
-                    shutil.copy2(f, dest_profile)
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to add {f}: {e}")
-        self.load_profile_contents()
+        # choose target based on radio
+        to_mods = self.extract_target_var.get() == "mods"
+        if to_mods and (not self.mods_folder or not os.path.exists(self.mods_folder)):
+            messagebox.showerror("Error", "Mods folder not set or doesn't exist.")
+            return
+
+        def done(errors):
+            self.refresh_profiles()
+            self.select_profile(prof)
+            if errors:
+                messagebox.showerror("Error", "Failed to add:\n" + "\n".join(f"{f}: {e}" for f, e in errors))
+
+        self.run_job(f"Add to {prof}", lambda progress: self.core.import_paths(prof, files, to_mods, progress), done)
+
+    def bulk_import_folder(self):
+        prof = self.get_selected_profile()
+        if not prof:
+            messagebox.showerror("Error", "Select a profile first.")
+            return
+        source = filedialog.askdirectory(title="Select a folder with mod ZIPs")
+        if not source:
+            return
+
+        def done(report):
+            self.refresh_profiles()
+            self.select_profile(prof)
+            show = messagebox.showwarning if report["failed"] else messagebox.showinfo
+            show("Bulk Import", format_import_report(report))
+
+        self.run_job(f"Bulk import into {prof}", lambda progress: self.core.bulk_import(prof, source, progress=progress),
+                     done)
 
     def remove_from_profile(self):
         prof = self.get_selected_profile()
         if not prof:
             return
-        sel = self.list_contents.curselection()
-        if not sel:
+        # top-level entries or anything inside them
+        names = [iid[2:] for iid in self.tree_contents.selection() if iid.startswith("p:")]
+        if not names:
             return
-        profile_path = os.path.join(PROFILES_DIR, prof)
-        # remove selected entries (top-level)
-        for i in reversed(sel):
-            name = self.list_contents.get(i)
-            target = os.path.join(profile_path, name)
-            try:
-                if os.path.isdir(target):
-                    shutil.rmtree(target)
-                elif os.path.exists(target):
-                    os.remove(target)
-                self.list_contents.delete(i)
-            except Exception as e:
+
+        def done(errors):
+            self.refresh_profiles()
+            self.select_profile(prof)
+            for name, e in errors:
                 messagebox.showerror("Error", f"Failed to remove {name}: {e}")
 
+        self.run_job(f"Remove from {prof}", lambda progress: self.core.remove_entries(prof, names, progress), done)
+
     def export_profile(self):
         prof = self.get_selected_profile()
         if not prof:
             return
-        prof_path = os.path.join(PROFILES_DIR, prof)
         save = filedialog.asksaveasfilename(title="Export profile as ZIP", defaultextension=".zip",
                                             filetypes=[("Zip files", "*.zip")], initialfile=f"{prof}.zip")
         if not save:
             return
-        try:
-            with zipfile.ZipFile(save, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-                for root, dirs, files in os.walk(prof_path):
-                    for f in files:
-                        fp = os.path.join(root, f)
-                        arc = os.path.relpath(fp, prof_path)
-                        zf.write(fp, arc)
-            messagebox.showinfo("BLSM", "Profile exported.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Export failed: {e}")
+        level = simpledialog.askinteger("Export", "Compression level (0 = none, 9 = smallest).\n"
+                                        "Bundles, images and audio are stored as-is either way.",
+                                        initialvalue=self.config.get("export_level", EXPORT_LEVEL), minvalue=0, maxvalue=9)
+        if level is None:
+            return
+        split_mb = simpledialog.askinteger("Export", "Split into parts of this many MB (0 = single file):",
+                                           initialvalue=self.config.get("export_split_mb", 0), minvalue=0)
+        if split_mb is None:
+            return
+        self.config["export_level"] = level
+        self.config["export_split_mb"] = split_mb
+        self.save_config()
+
+        def done(paths):
+            messagebox.showinfo("BLSM", "Profile exported." if len(paths) == 1 else
+                                f"Profile exported in {len(paths)} parts ({os.path.basename(paths[0])} ...).")
+
+        self.run_job(f"Export {prof}",
+                     lambda progress: self.core.export(prof, save, progress, level, split_mb * 1024 * 1024), done)
 
     # ---------- Mods folder ----------
     def select_mods_folder(self):
         folder = filedialog.askdirectory(title="Select Bonelab Mods Folder")
         if not folder:
             return
-        self.mods_folder = folder
-        # try to set in entry
-        try:
-            self.mods_entry.delete(0, "end")
-            self.mods_entry.insert(0, folder)
-        except Exception:
-            pass
-        self.save_config()
+        self.set_mods_folder(folder)
 
     def autodetect_mods_folder(self):
         try:
             user = os.environ.get("USERPROFILE", "")
             candidate = os.path.join(user, "AppData", "LocalLow", "Stress Level Zero", "BONELAB", "Mods")
             if os.path.exists(candidate):
-                self.mods_folder = candidate
-                try:
-                    self.mods_entry.delete(0, "end")
-                    self.mods_entry.insert(0, candidate)
-                except Exception:
-                    pass
-                self.save_config()
+                self.set_mods_folder(candidate)
                 messagebox.showinfo("Auto-Detect", f"Found mods folder:\n{candidate}")
             else:
                 messagebox.showwarning("Auto-Detect", "Mods folder not found. Please select manually.")
@@ -470,7 +928,7 @@ class BLSMApp:
         if not self.mods_folder or not os.path.exists(self.mods_folder):
             messagebox.showerror("Error", "Set a valid mods folder first.")
             return
-        if not messagebox.askyesno("Confirm", f'Clear mods folder and activate profile "{prof}"?'):
+        if not messagebox.askyesno("Confirm", f'Replace mods folder contents with profile "{prof}"?'):
             return
         self.activate_profile()
 
@@ -478,33 +936,23 @@ class BLSMApp:
         prof = self.get_selected_profile()
         if not prof:
             return
-        prof_path = os.path.join(PROFILES_DIR, prof)
-        if not os.path.exists(prof_path):
+        if not self.core.exists(prof):
             messagebox.showerror("Error", "Profile folder not found.")
             return
-        # clear mods folder (try best-effort)
-        try:
-            for item in os.listdir(self.mods_folder):
-                p = os.path.join(self.mods_folder, item)
-                if os.path.isdir(p):
-                    shutil.rmtree(p)
-                else:
-                    os.remove(p)
-        except Exception as e:
-            # non-fatal; warn user
-            messagebox.showwarning("Warning", f"Failed to fully clear mods folder: {e}")
-        # copy profile contents into mods
-        try:
-            for item in os.listdir(prof_path):
-                s = os.path.join(prof_path, item)
-                d = os.path.join(self.mods_folder, item)
-                if os.path.isdir(s):
-                    shutil.copytree(s, d, dirs_exist_ok=True)
-                else:
-                    shutil.copy2(s, d)
-            messagebox.showinfo("BLSM", "Profile activated.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Activation failed: {e}")
+
+        def done(r):
+            if r.get("swapped"):
+                self.status_var.set(f"Activated {prof}: swapped in the staged folder in {r['swap_seconds'] * 1000:.0f} ms")
+            else:
+                self.status_var.set(f"Activated {prof}: {r['added']} added, {r['replaced']} replaced, "
+                                    f"{r['removed']} removed, {r['kept']} unchanged")
+            if r.get("conflicts"):
+                self.show_layer_conflicts(prof, r["conflicts"])
+            else:
+                messagebox.showinfo("BLSM", "Profile activated.")
+
+        # only remove / add / replace what differs between mods folder and profile
+        self.run_job(f"Activate {prof}", lambda progress: self.core.activate(prof, progress), done)
 
     def confirm_unload(self):
         if not self.mods_folder or not os.path.exists(self.mods_folder):
@@ -512,16 +960,43 @@ class BLSMApp:
             return
         if not messagebox.askyesno("Confirm", "Unload (clear) all mods in the mods folder?"):
             return
-        try:
-            for item in os.listdir(self.mods_folder):
-                p = os.path.join(self.mods_folder, item)
-                if os.path.isdir(p):
-                    shutil.rmtree(p)
-                else:
-                    os.remove(p)
-            messagebox.showinfo("BLSM", "Mods folder cleared.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to clear mods folder: {e}")
+        self.run_job("Unload mods", self.core.unload, lambda r: messagebox.showinfo("BLSM", "Mods folder cleared."))
+
+    def verify_mods_folder(self):
+        if not self.mods_folder or not os.path.exists(self.mods_folder):
+            messagebox.showerror("Error", "Set a valid mods folder first.")
+            return
+        prof = self.core.active_profile() or self.get_selected_profile()
+        if not prof:
+            messagebox.showerror("Error", "No profile is active; select the profile to compare with.")
+            return
+
+        def done(report):
+            self.status_var.set(f"Verified {report.checked} files against {prof} in {report.seconds:.1f} s "
+                                f"({report.hashed} hashed)")
+            if report.ok and not report.touched:
+                messagebox.showinfo("BLSM", f'The mods folder matches "{prof}".')
+                return
+            if report.ok:
+                # contents are fine, only timestamps differ; fixing them keeps the next activation fast
+                self.run_job(f"Repair {prof}", lambda progress: self.core.repair(prof, report, progress))
+                return
+            lines = [f"{len(report.missing)} missing, {len(report.extra)} extra, {len(report.modified)} modified:"]
+            shown = report.missing[:5] + report.extra[:5] + report.modified[:5]
+            lines += shown
+            if len(shown) < len(report.missing) + len(report.extra) + len(report.modified):
+                lines.append("...")
+            if not messagebox.askyesno("BLSM", "\n".join(lines) + "\n\nRepair only these files now?"):
+                return
+
+            def repaired(r):
+                self.status_var.set(f"Repaired {prof}: {r['added']} restored, {r['replaced']} replaced, "
+                                    f"{r['removed']} removed")
+                messagebox.showinfo("BLSM", "Mods folder repaired.")
+
+            self.run_job(f"Repair {prof}", lambda progress: self.core.repair(prof, report, progress), repaired)
+
+        self.run_job(f"Verify {prof}", lambda progress: self.core.verify(prof, progress=progress), done)
 
     # ---------- Run ----------
     def run(self):
@@ -530,5 +1005,12 @@ class BLSMApp:
 
 # --------- Entrypoint ---------
 if __name__ == "__main__":
+    # needed for the bulk-import process pool in a frozen EXE
+    import multiprocessing
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        # same commands as blsm_cli.py, so the EXE can be scripted too
+        from blsm_cli import main
+        sys.exit(main(sys.argv[1:]))
     app = BLSMApp()
     app.run()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: profile activation by full copy vs. hardlink materialization.
+
+Builds a synthetic profile (many small pallet files + a few large bundles) in a temp
+directory on the same volume and times activating it into an empty Mods folder with
+both modes. Run from anywhere:
+
+    python benchmarks/bench_activate.py --small 5000 --large 4 --large-mb 256
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import blsm_core  # noqa: E402
+
+
+def make_profile(root, small, large, large_mb):
+    per_pallet = 50
+    for i in range(small):
+        d = os.path.join(root, f"Author{i // per_pallet}.Pallet{i // per_pallet}", "data")
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f"file{i}.json"), "wb") as f:
+            f.write(os.urandom(2048))
+    chunk = os.urandom(1024 * 1024)
+    for i in range(large):
+        d = os.path.join(root, f"Author.Big{i}")
+        os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f"big{i}.bundle"), "wb") as f:
+            for _ in range(large_mb):
+                f.write(chunk)
+
+
+def clear(path):
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--small", type=int, default=2000, help="number of small files")
+    ap.add_argument("--large", type=int, default=2, help="number of large .bundle files")
+    ap.add_argument("--large-mb", type=int, default=64, help="size of each large file in MB")
+    ap.add_argument("--dir", default=None, help="scratch directory (default: system temp)")
+    args = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="blsm-bench-", dir=args.dir)
+    try:
+        profile = os.path.join(work, "profile")
+        mods = os.path.join(work, "Mods")
+        make_profile(profile, args.small, args.large, args.large_mb)
+        total = sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(profile) for f in fs)
+        print(f"profile: {args.small + args.large} files, {total / (1024 * 1024):.1f} MB")
+        for mode in blsm_core.ACTIVATION_MODES:
+            clear(mods)
+            t0 = time.perf_counter()
+            m = blsm_core.materialize_tree(profile, mods, mode)
+            dt = time.perf_counter() - t0
+            print(f"{mode:5s}: {dt:8.3f} s  {m.counts}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
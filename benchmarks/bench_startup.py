@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: how long BLSM takes to import and to show a usable window.
+
+Every measurement runs in a fresh interpreter (so imports are really cold for Python,
+although the OS file cache stays warm) and is repeated --repeat times; the median is kept:
+
+    import-core   import blsm_core (what blsm_cli.py pays before doing anything)
+    import-ui     import BLSM (Tk shell; customtkinter must not be imported yet)
+    snapshot      ModManager() + profile list + last profile's top level from the index,
+                  i.e. what the window shows before touching the disk
+    disk-check    recover() + index.sync() on an unchanged library (runs in the background)
+    window-map    BLSMApp() until its window is mapped       (only with a display)
+    window-ready  ... until the profile list is filled       (only with a display)
+
+The library is generated: --profiles profiles of --entries top-level mods with
+--files-per-entry files each. Results use the bench_suite.py format and can be tracked
+against a baseline the same way:
+
+    python benchmarks/bench_startup.py --save-baseline startup_baseline.json
+    python benchmarks/bench_startup.py --baseline startup_baseline.json --threshold 15
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+import blsm_core  # noqa: E402
+from bench_suite import compare  # noqa: E402
+
+# run in a fresh interpreter; prints one JSON object with its timings in seconds
+CHILD = r"""
+import json, os, sys, time
+t0 = time.perf_counter()
+params = json.loads(os.environ["BLSM_BENCH"])
+sys.path.insert(0, params["repo"])
+out = {}
+what = params["what"]
+if what == "import-core":
+    import blsm_core
+    out["import-core"] = time.perf_counter() - t0
+elif what == "import-ui":
+    import BLSM
+    out["import-ui"] = time.perf_counter() - t0
+    out["customtkinter_loaded"] = "customtkinter" in sys.modules
+elif what in ("snapshot", "disk-check"):
+    import blsm_core
+    t0 = time.perf_counter()
+    mgr = blsm_core.ModManager(params["profiles"], "", "link", params["index"])
+    profiles = mgr.list_profiles(sync=False)
+    mgr.list_children(profiles[-1].name)
+    out["snapshot"] = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    mgr.recover()
+    mgr.index.sync()
+    out["disk-check"] = time.perf_counter() - t0
+else:
+    import functools
+    import tkinter
+    import BLSM
+    import blsm_core
+    BLSM.ModManager = functools.partial(blsm_core.ModManager, profiles_dir=params["profiles"], index_path=params["index"])
+    BLSM.load_config = lambda: {"last_profile": params["last"]}
+    BLSM.save_config = lambda config: None
+    t0 = time.perf_counter()
+    try:
+        app = BLSM.BLSMApp()
+    except tkinter.TclError as e:
+        print(json.dumps({"skipped": str(e)}))
+        sys.exit(0)
+    marks = {}
+    app.root.bind("<Map>", lambda e: marks.setdefault("window-map", time.perf_counter() - t0), add="+")
+
+    def ready():
+        if app.profile_names:
+            marks["window-ready"] = time.perf_counter() - t0
+            app.root.after(10, app.root.destroy)
+        else:
+            app.root.after(1, ready)
+
+    app.root.after(1, ready)
+    app.root.after(30000, app.root.destroy)
+    app.run()
+    out.update(marks)
+print(json.dumps(out))
+"""
+
+
+def build_library(root: str, args):
+    for p in range(args.profiles):
+        for e in range(args.entries):
+            d = os.path.join(root, f"Profile{p:03d}", f"Author{e}.Pallet{e}")
+            os.makedirs(d)
+            for f in range(args.files_per_entry):
+                with open(os.path.join(d, f"file{f}.json"), "w") as fh:
+                    fh.write("{}")
+
+
+def run_child(what: str, params: dict) -> dict:
+    env = dict(os.environ, BLSM_BENCH=json.dumps(dict(params, what=what)))
+    proc = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, timeout=120)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{what} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--profiles", type=int, default=30)
+    ap.add_argument("--entries", type=int, default=100, help="top-level mods per profile")
+    ap.add_argument("--files-per-entry", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--no-window", action="store_true", help="skip the window measurements")
+    ap.add_argument("--dir", default=None, help="scratch directory (default: system temp)")
+    ap.add_argument("--out", default="bench_startup.json", help="results file")
+    ap.add_argument("--baseline", help="compare against this results file")
+    ap.add_argument("--save-baseline", metavar="PATH", help="also write the results here as the new baseline")
+    ap.add_argument("--threshold", type=float, default=15, help="percent slower that counts as a regression")
+    args = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="blsm-startup-", dir=args.dir)
+    samples = {}
+    notes = []
+    try:
+        profiles = os.path.join(work, "profiles")
+        t0 = time.perf_counter()
+        build_library(profiles, args)
+        params = {"repo": REPO_DIR, "profiles": profiles, "index": os.path.join(work, "index.sqlite"),
+                  "last": f"Profile{args.profiles - 1:03d}"}
+        # first run builds the index, like the first start after an upgrade
+        mgr = blsm_core.ModManager(profiles, "", "link", params["index"])
+        mgr.index.sync()
+        mgr.close()
+        print(f"library: {args.profiles} profiles x {args.entries} mods x {args.files_per_entry} files "
+              f"(generated and indexed in {time.perf_counter() - t0:.1f} s)")
+        kinds = ["import-core", "import-ui", "snapshot"] + ([] if args.no_window else ["window"])
+        for _ in range(args.repeat):
+            for what in kinds:
+                result = run_child(what, params)
+                if "skipped" in result:
+                    notes.append(f"window: skipped ({result['skipped']})")
+                    kinds.remove("window")
+                    continue
+                if result.pop("customtkinter_loaded", False):
+                    notes.append("import-ui: customtkinter was imported at module level")
+                for op, seconds in result.items():
+                    samples.setdefault(op, []).append(seconds)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    results = []
+    for op, values in samples.items():
+        seconds = statistics.median(values)
+        results.append({"op": op, "run": "cold", "seconds": round(seconds, 6), "min": round(min(values), 6),
+                        "max": round(max(values), 6), "samples": len(values)})
+        print(f"{op:12s} {seconds * 1000:9.1f} ms  (min {min(values) * 1000:.1f}, max {max(values) * 1000:.1f})")
+    for note in dict.fromkeys(notes):
+        print(note)
+
+    out = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "save_baseline", "dir")},
+        },
+        "results": results,
+    }
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(out, f, indent=2)
+    print(f"\nresults written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("params") != out["meta"]["params"]:
+            print("warning: baseline was recorded with different parameters")
+        if compare(out, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: the core operations on a synthetic Bonelab mod library.
+
+Generates a reproducible library (pallets of small .json/.png files plus a few big .bundle
+files), two profiles that share --overlap percent of their pallets, and runs each operation
+cold and warm:
+
+    extract   extract_zip_autofix of a ZIP of profile A (warm: into the same folder again)
+    import    ModManager.import_paths of that ZIP (warm: a second profile, import cache hit)
+    activate  profile A into the Mods folder (cold: empty Mods folder, warm: already active)
+    switch    A -> B (cold), then B -> A (warm)
+    verify    Mods folder against active profile A (warm: size/mtime, deep: contents of every file)
+    export    profile A to a ZIP
+    create    create profile from the Mods folder (warm: blobs already in the store)
+    pack      profile B into a pack; then "switch packed" activates B from its pack, "export packed"
+              exports it from the pack, and unpack turns it back into a folder
+
+Profiles A and B are imported before timing starts. "cold" is the first run of an operation
+(nothing extracted / active / cached for it yet), "warm" repeats it with that state in place;
+with --drop-caches (Linux, root) the OS page cache is dropped before each cold run as well.
+Each result records wall time, bytes/s, files/s and peak RSS. Results go to a JSON file
+that can be compared against a saved baseline:
+
+    python benchmarks/bench_suite.py --out results.json
+    python benchmarks/bench_suite.py --save-baseline baseline.json
+    python benchmarks/bench_suite.py --baseline baseline.json --threshold 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import blsm_core  # noqa: E402
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+RSS_SAMPLE_INTERVAL = 0.01
+
+
+# --- Memory ---
+
+
+def current_rss():
+    """
+    Resident set size of this process in bytes, or None where it can't be read.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    return None
+
+
+class PeakRSS:
+    """
+    Samples the RSS on a background thread while the block runs; .peak is the highest value seen.
+    """
+
+    def __init__(self):
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while True:
+            rss = current_rss()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+            if self._stop.wait(RSS_SAMPLE_INTERVAL):
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+
+def drop_os_caches() -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+# --- Synthetic library ---
+
+
+def write_pallet(root: str, index: int, rng: random.Random, files: int, small_kb: int):
+    pallet = os.path.join(root, f"Author{index % 37}.Pallet{index}")
+    os.makedirs(os.path.join(pallet, "Textures"), exist_ok=True)
+    os.makedirs(os.path.join(pallet, "Data"), exist_ok=True)
+    meta = {"objects": {"1": {"barcode": f"Author{index % 37}.Pallet{index}", "title": f"Pallet {index}",
+                              "author": f"Author{index % 37}", "version": "1.0.0"}}}
+    with open(os.path.join(pallet, "pallet.json"), "w") as f:
+        json.dump(meta, f)
+    for i in range(files):
+        size = rng.randint(small_kb * 512, small_kb * 1536)
+        if i % 2:
+            path = os.path.join(pallet, "Textures", f"tex{i}.png")
+            data = PNG_HEADER + rng.randbytes(size)
+        else:
+            path = os.path.join(pallet, "Data", f"crate{i}.json")
+            # json compresses well, like the real thing
+            data = json.dumps({"crate": i, "tags": [f"tag{rng.randint(0, 50)}" for _ in range(size // 12)]}).encode()
+        with open(path, "wb") as f:
+            f.write(data)
+    return pallet
+
+
+def write_bundle(pallet: str, index: int, rng: random.Random, size_mb: int):
+    # one random MB repeated: incompressible for deflate (32 KB window) and cheap to generate
+    chunk = rng.randbytes(1024 * 1024)
+    with open(os.path.join(pallet, f"level{index}.bundle"), "wb") as f:
+        for _ in range(size_mb):
+            f.write(chunk)
+
+
+def build_library(root: str, args) -> list:
+    """
+    Creates args.pallets pallets for each profile, sharing args.overlap percent.
+    Returns the pallet folders of profile A and profile B.
+    """
+    rng = random.Random(args.seed)
+    shared = round(args.pallets * args.overlap / 100)
+    total = 2 * args.pallets - shared
+    pallets = [write_pallet(root, i, rng, args.files_per_pallet, args.small_kb) for i in range(total)]
+    # the bundles live in shared pallets first, so overlap covers the big files too
+    for i in range(args.bundles):
+        write_bundle(pallets[i % total], i, rng, args.bundle_mb)
+    a = pallets[:args.pallets]
+    b = pallets[:shared] + pallets[args.pallets:]
+    return [a, b]
+
+
+def make_zip(folders: list, dest: str):
+    with zipfile.ZipFile(dest, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for folder in folders:
+            base = os.path.dirname(folder)
+            for r, _, files in os.walk(folder):
+                for fn in files:
+                    full = os.path.join(r, fn)
+                    zf.write(full, os.path.relpath(full, base))
+
+
+# --- Runs ---
+
+
+class Suite:
+    def __init__(self, work: str, args):
+        self.work = work
+        self.args = args
+        self.results = []
+        library = os.path.join(work, "library")
+        self.a, self.b = build_library(library, args)
+        self.zip = os.path.join(work, "profile_a.zip")
+        make_zip(self.a, self.zip)
+        self.mods = os.path.join(work, "Mods")
+        os.makedirs(self.mods)
+        self.mgr = blsm_core.ModManager(os.path.join(work, "profiles"), self.mods, args.mode,
+                                        os.path.join(work, "index.sqlite"))
+        self.mgr.import_paths("A", self.a)
+        self.mgr.import_paths("B", self.b)
+        # the store and the index now know A and B; the Mods folder is still empty
+        self.sizes = {name: blsm_core.tree_size(self.mgr.profile_path(name)) for name in ("A", "B")}
+
+    def measure(self, op: str, run: str, func, nbytes: int, files: int):
+        if run == "cold" and self.args.drop_caches:
+            drop_os_caches()
+        with PeakRSS() as rss:
+            t0 = time.perf_counter()
+            func()
+            seconds = time.perf_counter() - t0
+        result = {
+            "op": op,
+            "run": run,
+            "seconds": round(seconds, 6),
+            "bytes": nbytes,
+            "files": files,
+            "bytes_per_s": round(nbytes / seconds, 1) if seconds else None,
+            "files_per_s": round(files / seconds, 1) if seconds else None,
+            "peak_rss": rss.peak,
+        }
+        self.results.append(result)
+        print(f"{op:9s} {run:6s} {seconds:9.3f} s  {blsm_core.format_bytes(result['bytes_per_s'] or 0)}/s  "
+              f"{result['files_per_s'] or 0:10.0f} files/s  peak RSS {blsm_core.format_bytes(rss.peak or 0)}")
+        return result
+
+    def run_all(self):
+        size_a, files_a = self.sizes["A"]
+        size_b, files_b = self.sizes["B"]
+
+        extracted = os.path.join(self.work, "extracted")
+        for run in ("cold", "warm"):
+            self.measure("extract", run, lambda: blsm_core.extract_zip_autofix(self.zip, extracted), size_a, files_a)
+
+        self.measure("import", "cold", lambda: self.mgr.import_paths("Z1", [self.zip]), size_a, files_a)
+        self.measure("import", "warm", lambda: self.mgr.import_paths("Z2", [self.zip]), size_a, files_a)
+
+        for run in ("cold", "warm"):
+            self.measure("activate", run, lambda: self.mgr.activate("A"), size_a, files_a)
+        self.measure("switch", "cold", lambda: self.mgr.activate("B"), size_b, files_b)
+        self.measure("switch", "warm", lambda: self.mgr.activate("A"), size_a, files_a)
+        self.measure("verify", "warm", lambda: self.mgr.verify("A"), size_a, files_a)
+        self.measure("verify", "deep", lambda: self.mgr.verify("A", deep=True), size_a, files_a)
+
+        dest = os.path.join(self.work, "export.zip")
+        for run in ("cold", "warm"):
+            self.measure("export", run, lambda: self.mgr.export("A", dest), size_a, files_a)
+
+        self.measure("create", "cold", lambda: self.mgr.create_from_mods("C1"), size_a, files_a)
+        self.measure("create", "warm", lambda: self.mgr.create_from_mods("C2"), size_a, files_a)
+
+        self.measure("pack", "cold", lambda: self.mgr.pack("B"), size_b, files_b)
+        self.measure("switch", "packed", lambda: self.mgr.activate("B"), size_b, files_b)
+        self.measure("export", "packed", lambda: self.mgr.export("B", dest), size_b, files_b)
+        self.measure("unpack", "cold", lambda: self.mgr.unpack("B"), size_b, files_b)
+        self.mgr.close()
+
+
+# --- Reporting ---
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Prints each op/run against the baseline. Returns the ones that got slower by more than threshold percent.
+    """
+    base = {(r["op"], r["run"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nvs. baseline ({baseline['meta'].get('timestamp', '?')}):")
+    for r in results["results"]:
+        old = base.get((r["op"], r["run"]))
+        if not old or not old["seconds"]:
+            print(f"{r['op']:9s} {r['run']:5s}  (not in baseline)")
+            continue
+        change = (r["seconds"] - old["seconds"]) / old["seconds"] * 100
+        flag = ""
+        if change > threshold:
+            flag = "  <-- slower"
+            regressions.append(dict(r, baseline_seconds=old["seconds"], change_percent=round(change, 1)))
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{r['op']:9s} {r['run']:5s} {old['seconds']:9.3f} s -> {r['seconds']:9.3f} s  {change:+6.1f}%{flag}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--pallets", type=int, default=40, help="pallets per profile")
+    ap.add_argument("--files-per-pallet", type=int, default=60, help="small .json/.png files per pallet")
+    ap.add_argument("--small-kb", type=int, default=8, help="average size of a small file in KB")
+    ap.add_argument("--bundles", type=int, default=3, help="number of .bundle files")
+    ap.add_argument("--bundle-mb", type=int, default=64, help="size of each .bundle in MB (2048+ for a realistic level)")
+    ap.add_argument("--overlap", type=float, default=50, help="percent of pallets profile A and B share")
+    ap.add_argument("--mode", choices=blsm_core.ACTIVATION_MODES, default="link", help="activation mode")
+    ap.add_argument("--seed", type=int, default=1, help="random seed for the generated library")
+    ap.add_argument("--drop-caches", action="store_true", help="drop the OS page cache before cold runs (Linux, root)")
+    ap.add_argument("--dir", default=None, help="scratch directory (default: system temp)")
+    ap.add_argument("--out", default="bench_results.json", help="results file")
+    ap.add_argument("--baseline", help="compare against this results file")
+    ap.add_argument("--save-baseline", metavar="PATH", help="also write the results here as the new baseline")
+    ap.add_argument("--threshold", type=float, default=10, help="percent slower that counts as a regression")
+    args = ap.parse_args()
+
+    work = tempfile.mkdtemp(prefix="blsm-suite-", dir=args.dir)
+    try:
+        t0 = time.perf_counter()
+        suite = Suite(work, args)
+        print(f"library: profile A {blsm_core.format_bytes(suite.sizes['A'][0])} / {suite.sizes['A'][1]} files, "
+              f"profile B {blsm_core.format_bytes(suite.sizes['B'][0])} / {suite.sizes['B'][1]} files, "
+              f"{args.overlap:.0f}% shared (generated in {time.perf_counter() - t0:.1f} s)")
+        suite.run_all()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "save_baseline", "dir")},
+        },
+        "results": suite.results,
+    }
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+    print(f"\nresults written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"].get("params") != results["meta"]["params"]:
+            print("warning: baseline was recorded with different parameters")
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
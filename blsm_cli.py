@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+blsm - command line interface for BLSM (works headless, never imports tkinter).
+
+    python blsm_cli.py list [--contents PROFILE [--path FOLDER]]
+    python blsm_cli.py activate PROFILE [--mods PATH] [--copy] [--staged]
+    python blsm_cli.py stage PROFILE
+    python blsm_cli.py unload
+    python blsm_cli.py import PROFILE PATH... [--to-mods]
+    python blsm_cli.py bulk-import PROFILE SOURCE [--workers N]
+    python blsm_cli.py export PROFILE DEST.zip [--level 0-9] [--split-mb N]
+    python blsm_cli.py create-from-mods NAME
+    python blsm_cli.py update-from-mods [PROFILE] [--deep] [--apply]
+    python blsm_cli.py verify [PROFILE] [--deep] [--repair]
+    python blsm_cli.py layers PROFILE [--parents NAME... | --plain] [--remove PATH...]
+    python blsm_cli.py pack PROFILE [--level 0-9] | unpack PROFILE
+    python blsm_cli.py dedupe
+    python blsm_cli.py search TEXT | where BARCODE | conflicts | missing-deps [BARCODE]
+    python blsm_cli.py cache show|prune [--max-gb N | --all]
+    python blsm_cli.py stats [--last N]
+
+Operations are logged to blsm_ops.log; --profile-run also saves a cProfile / tracemalloc report.
+
+Mods folder and activation mode default to the GUI's blsm_config.json.
+Every command prints one JSON object: {"command", "ok", "seconds", "result"} or {..., "error"}.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict
+
+import blsm_core as core
+
+
+def _failed_items(errors):
+    return [{"path": path, "error": f"{type(e).__name__}: {e}"} for path, e in errors]
+
+
+def cmd_list(mgr, args):
+    if args.contents:
+        mgr.index.sync([args.contents])
+        if args.path:
+            nodes = mgr.list_children(args.contents, args.path.strip("/"))
+            return {"profile": args.contents, "path": args.path, "entries": [asdict(n) for n in nodes]}
+        return {"profile": args.contents, "entries": [asdict(e) for e in mgr.list_contents(args.contents)]}
+    return {"active": mgr.active_profile(), "profiles": [asdict(p) for p in mgr.list_profiles()]}
+
+
+def cmd_activate(mgr, args):
+    return mgr.activate(args.profile, args.progress_obj)
+
+
+def cmd_stage(mgr, args):
+    return mgr.stage(args.profile, args.progress_obj)
+
+
+def cmd_unload(mgr, args):
+    mgr.unload(args.progress_obj)
+    return {"mods_folder": mgr.mods_folder}
+
+
+def cmd_import(mgr, args):
+    failed = _failed_items(mgr.import_paths(args.profile, args.paths, args.to_mods, args.progress_obj))
+    return {"profile": args.profile, "added": len(args.paths) - len(failed), "failed": failed}
+
+
+def cmd_bulk_import(mgr, args):
+    return mgr.bulk_import(args.profile, args.source, args.workers, args.progress_obj)
+
+
+def cmd_export(mgr, args):
+    paths = mgr.export(args.profile, args.dest, args.progress_obj, args.level, int(args.split_mb * 1024 * 1024))
+    return {"profile": args.profile, "files": paths, "bytes": sum(os.path.getsize(p) for p in paths)}
+
+
+def cmd_create_from_mods(mgr, args):
+    mgr.create_from_mods(args.name, args.progress_obj)
+    return {"profile": args.name}
+
+
+def cmd_update_from_mods(mgr, args):
+    changes = mgr.changes_from_mods(args.profile, args.deep, args.progress_obj)
+    result = dict(asdict(changes), empty=changes.empty)
+    if args.apply and (changes.touched or not changes.empty):
+        result["updated"] = mgr.update_from_mods(changes.profile, changes, args.progress_obj)
+    return result
+
+
+def cmd_verify(mgr, args):
+    report = mgr.verify(args.profile, args.deep, args.progress_obj)
+    result = dict(asdict(report), ok=report.ok)
+    if args.repair and (report.touched or not report.ok):
+        result.update(repaired=mgr.repair(report.profile, report, args.progress_obj), ok=True)
+    return result
+
+
+def cmd_layers(mgr, args):
+    if args.plain:
+        mgr.set_layers(args.profile, [], [])
+    elif args.parents is not None or args.remove is not None:
+        spec = mgr.layers(args.profile)
+        mgr.set_layers(args.profile, spec["parents"] if args.parents is None else args.parents,
+                       spec["remove"] if args.remove is None else args.remove)
+    resolved = mgr.resolve(args.profile)
+    manifest = resolved["manifest"]
+    return dict(mgr.layers(args.profile), profile=args.profile, files=len(manifest),
+                bytes=sum(e[0] for e in manifest.values()), conflicts=resolved["conflicts"], cached=resolved["cached"])
+
+
+def cmd_pack(mgr, args):
+    return dict(mgr.pack(args.profile, args.progress_obj, args.level), profile=args.profile)
+
+
+def cmd_unpack(mgr, args):
+    return dict(mgr.unpack(args.profile, args.progress_obj), profile=args.profile)
+
+
+def cmd_search(mgr, args):
+    return {"query": args.text, "hits": [asdict(h) for h in mgr.search(args.text)]}
+
+
+def cmd_where(mgr, args):
+    hits = mgr.find_barcode(args.barcode)
+    return {"barcode": args.barcode, "profiles": sorted({h.profile for h in hits}), "hits": [asdict(h) for h in hits]}
+
+
+def cmd_conflicts(mgr, args):
+    return {"conflicts": mgr.version_conflicts()}
+
+
+def cmd_missing_deps(mgr, args):
+    return {"missing": mgr.missing_dependencies(args.barcode)}
+
+
+def cmd_dedupe(mgr, args):
+    return mgr.deduplicate(args.progress_obj)
+
+
+def cmd_cache(mgr, args):
+    cache = core.ImportCache(mgr.store_dir)
+    if args.action == "prune":
+        before = cache.total_bytes()
+        dropped = cache.evict(0 if args.all else int(args.max_gb * 1024 ** 3))
+        cache.save()
+        return {"dropped": len(dropped), "freed_bytes": before - cache.total_bytes()}
+    entries = sorted(cache.entries.items(), key=lambda kv: kv[1]["last_used"], reverse=True)
+    return {
+        "archives": len(entries),
+        "bytes": cache.total_bytes(),
+        "entries": [{"fingerprint": fp, "archive": e["archive"], "files": len(e["files"]), "bytes": e["bytes"],
+                     "last_used": e["last_used"]} for fp, e in entries],
+    }
+
+
+def cmd_stats(mgr, args):
+    ops = [e for e in mgr.ops.recent() if e.get("op") != "ui"][-args.last:]
+    return {"log": mgr.ops.path, "operations": ops[::-1]}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--mods", help="Mods folder (default: from blsm_config.json)")
+    common.add_argument("--copy", action="store_true", help="copy files instead of hardlinking")
+    common.add_argument("--pretty", action="store_true", help="indent the JSON output")
+    common.add_argument("--progress", action="store_true", help="show progress on stderr")
+    common.add_argument("--profile-run", action="store_true",
+                        help="run under cProfile and tracemalloc and save a report next to the log")
+
+    parser = argparse.ArgumentParser(prog="blsm", description="BLSM — Bonelab Mod Manager, command line")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", parents=[common], help="list profiles (or one profile's contents)")
+    p.add_argument("--contents", metavar="PROFILE")
+    p.add_argument("--path", help="with --contents: list this folder inside the profile")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("activate", parents=[common], help="make the Mods folder match a profile")
+    p.add_argument("profile")
+    p.add_argument("--staged", action="store_true", default=None,
+                   help="build the profile next to the Mods folder and swap it in (default: from blsm_config.json)")
+    p.set_defaults(func=cmd_activate)
+
+    p = sub.add_parser("stage", parents=[common], help="pre-build a profile next to the Mods folder for an instant switch")
+    p.add_argument("profile")
+    p.set_defaults(func=cmd_stage)
+
+    p = sub.add_parser("unload", parents=[common], help="clear the Mods folder")
+    p.set_defaults(func=cmd_unload)
+
+    p = sub.add_parser("import", parents=[common], help="add ZIPs / folders / files to a profile")
+    p.add_argument("profile")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--to-mods", action="store_true", help="extract ZIPs into the Mods folder instead")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("bulk-import", parents=[common], help="import every ZIP in a directory or glob")
+    p.add_argument("profile")
+    p.add_argument("source", help="directory (searched recursively) or glob, e.g. 'Downloads/*.zip'")
+    p.add_argument("--workers", type=int, default=core.BULK_IMPORT_WORKERS, help="archives extracted at once")
+    p.set_defaults(func=cmd_bulk_import)
+
+    p = sub.add_parser("export", parents=[common], help="export a profile as ZIP")
+    p.add_argument("profile")
+    p.add_argument("dest")
+    p.add_argument("--level", type=int, choices=range(10), default=core.EXPORT_LEVEL, metavar="0-9",
+                   help="deflate level, 0 stores everything (already compressed files are always stored)")
+    p.add_argument("--split-mb", type=float, default=0, help="split into DEST.001, DEST.002, ... of this size")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("create-from-mods", parents=[common], help="new profile from the Mods folder")
+    p.add_argument("name")
+    p.set_defaults(func=cmd_create_from_mods)
+
+    p = sub.add_parser("update-from-mods", parents=[common],
+                       help="show (and with --apply copy) what changed in the Mods folder into a profile")
+    p.add_argument("profile", nargs="?", help="default: the active profile")
+    p.add_argument("--deep", action="store_true", help="compare the contents of every file, not only suspect ones")
+    p.add_argument("--apply", action="store_true", help="update the profile; without it only the changes are listed")
+    p.set_defaults(func=cmd_update_from_mods)
+
+    p = sub.add_parser("verify", parents=[common], help="compare the Mods folder with a profile")
+    p.add_argument("profile", nargs="?", help="default: the active profile")
+    p.add_argument("--deep", action="store_true", help="compare the contents of every file, not only suspect ones")
+    p.add_argument("--repair", action="store_true", help="fix the files found missing, extra or modified")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("layers", parents=[common], help="show or set the parent profiles a profile builds on")
+    p.add_argument("profile")
+    p.add_argument("--parents", nargs="*", metavar="NAME", help="parent profiles, later ones win on conflicts")
+    p.add_argument("--remove", nargs="*", metavar="PATH", help="paths of the parents this profile leaves out")
+    p.add_argument("--plain", action="store_true", help="make it a plain profile again")
+    p.set_defaults(func=cmd_layers)
+
+    p = sub.add_parser("pack", parents=[common], help="keep a profile's files compressed in one pack")
+    p.add_argument("profile")
+    p.add_argument("--level", type=int, choices=range(10), default=core.PACK_LEVEL, metavar="0-9",
+                   help="deflate level, 0 stores everything (already compressed files are always stored)")
+    p.set_defaults(func=cmd_pack)
+
+    p = sub.add_parser("unpack", parents=[common], help="turn a packed profile back into a plain folder")
+    p.add_argument("profile")
+    p.set_defaults(func=cmd_unpack)
+
+    p = sub.add_parser("search", parents=[common], help="find pallets / crates by title, barcode or author words")
+    p.add_argument("text")
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("where", parents=[common], help="which profiles contain a pallet or crate barcode")
+    p.add_argument("barcode")
+    p.set_defaults(func=cmd_where)
+
+    p = sub.add_parser("conflicts", parents=[common], help="pallets present in several versions or twice in a profile")
+    p.set_defaults(func=cmd_conflicts)
+
+    p = sub.add_parser("missing-deps", parents=[common], help="profiles missing pallets their mods depend on")
+    p.add_argument("barcode", nargs="?", help="only this dependency")
+    p.set_defaults(func=cmd_missing_deps)
+
+    p = sub.add_parser("dedupe", parents=[common], help="deduplicate all profiles into the blob store")
+    p.set_defaults(func=cmd_dedupe)
+
+    p = sub.add_parser("cache", parents=[common], help="show or prune the import cache")
+    p.add_argument("action", choices=["show", "prune"])
+    p.add_argument("--max-gb", type=float, default=core.IMPORT_CACHE_MAX_BYTES / 1024 ** 3,
+                   help="prune: keep at most this much (least recently used go first)")
+    p.add_argument("--all", action="store_true", help="prune: empty the cache")
+    p.set_defaults(func=cmd_cache)
+
+    p = sub.add_parser("stats", parents=[common], help="recent operations from the operation log")
+    p.add_argument("--last", type=int, default=20)
+    p.set_defaults(func=cmd_stats)
+    return parser
+
+
+def _report_progress(progress: core.Progress, stop: threading.Event):
+    while not stop.wait(1.0):
+        sys.stderr.write(f"\r{progress.phase} {progress.describe()}\033[K")
+        sys.stderr.flush()
+    sys.stderr.write("\n")
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    config = core.load_config()
+    mode = "copy" if args.copy else config.get("activation_mode", "link")
+    args.progress_obj = core.Progress()
+    stop = threading.Event()
+    if args.progress:
+        threading.Thread(target=_report_progress, args=(args.progress_obj, stop), daemon=True).start()
+    out = {"command": args.command}
+    t0 = time.perf_counter()
+    mgr = None
+    try:
+        staged = getattr(args, "staged", None)
+        mgr = core.ModManager(mods_folder=args.mods or config.get("mods_folder", ""), mode=mode,
+                              staged=config.get("staged_activation", False) if staged is None else staged)
+        core.attach_log(mgr.ops.path)
+        mgr.ops.profiling = args.profile_run
+        mgr.recover()
+        result = args.func(mgr, args)
+        ok = not (isinstance(result, dict) and (result.get("failed") or result.get("ok") is False))
+        out.update(ok=ok, result=result)
+    except KeyboardInterrupt:
+        ok = False
+        out.update(ok=False, error="cancelled")
+    except Exception as e:
+        ok = False
+        out.update(ok=False, error=f"{type(e).__name__}: {e}")
+    finally:
+        stop.set()
+        if mgr is not None:
+            mgr.close()
+    out["seconds"] = round(time.perf_counter() - t0, 4)
+    if mgr is not None and mgr.ops.last_report:
+        out["profile_report"] = mgr.ops.last_report
+    print(json.dumps(out, indent=2 if args.pretty else None, default=str))
+    sys.stdout.flush()
+    # the result is out; finish deleting what unload / activate moved to the trash
+    core.TRASH.wait()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    # needed for the bulk-import process pool in a frozen EXE
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,4122 @@
+#!/usr/bin/env python3
+"""
+BLSM core - everything BLSM does to profiles and the Mods folder, without any UI.
+- ModManager: typed API (list / create / import / activate / unload / export / verify / pack / update from Mods)
+- Content-addressed blob store, import cache, packed profiles, incremental activation, profile index
+- Progress / cancel / rollback primitives shared by the Tk app (BLSM.py) and the CLI (blsm_cli.py)
+Importing this module has no side effects and never imports tkinter.
+"""
+
+import os
+import sys
+import shutil
+import contextlib
+import functools
+import logging
+import zipfile
+import json
+import glob
+import hashlib
+import mmap
+import zlib
+import re
+import errno
+import struct
+import sqlite3
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# --- Locations: always next to the script/executable, independent of the working directory ---
+if getattr(sys, "frozen", False):
+    # Running as EXE
+    APP_DIR = os.path.dirname(sys.executable)
+else:
+    # Running as script
+    APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --- Constants ---
+CONFIG_FILE = os.path.join(APP_DIR, "blsm_config.json")
+INDEX_FILE = os.path.join(APP_DIR, "blsm_index.sqlite")
+PROFILES_DIR = os.path.join(APP_DIR, "profiles")
+# Anything under PROFILES_DIR (or inside a profile) starting with this prefix belongs to BLSM itself
+INTERNAL_PREFIX = ".blsm"
+STORE_DIR = os.path.join(PROFILES_DIR, ".blsm_store")
+HASH_CHUNK = 1024 * 1024
+# files at least this big are hashed through mmap
+HASH_MMAP_MIN = 4 * 1024 * 1024
+# Activation modes: "link" tries hardlink -> reflink -> copy, "copy" always copies
+ACTIVATION_MODES = ("link", "copy")
+# Manifest of what BLSM last put into the Mods folder (saves a rescan on the next switch)
+ACTIVE_STATE_FILE = os.path.join(PROFILES_DIR, ".blsm_active.json")
+# inside a profile: the parent profiles it builds on and what it removes from them
+LAYERS_FILE = f"{INTERNAL_PREFIX}_layers.json"
+# ZIP extraction: worker threads, and files from LARGE_FILE up are streamed with the big buffer
+EXTRACT_WORKERS = min(8, os.cpu_count() or 2)
+# suspect files hashed at once by verify (hashlib releases the GIL)
+VERIFY_WORKERS = min(8, os.cpu_count() or 2)
+LARGE_FILE = 16 * 1024 * 1024
+SMALL_COPY_BUFFER = 256 * 1024
+LARGE_COPY_BUFFER = 8 * 1024 * 1024
+# Copy engine: files below COPY_SMALL_MAX are copied on COPY_WORKERS threads, bigger ones streamed one at a time;
+# kernel-side copies go in KERNEL_COPY_CHUNK steps so cancelling stays responsive
+COPY_WORKERS = min(16, (os.cpu_count() or 2) * 2)
+COPY_SMALL_MAX = 4 * 1024 * 1024
+KERNEL_COPY_CHUNK = 64 * 1024 * 1024
+# Bulk import: archives extracted concurrently (one process each)
+BULK_IMPORT_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+# Import cache (inside STORE_DIR): archive fingerprint -> stored files, least recently used evicted first
+IMPORT_CACHE_FILE = "import_cache.json"
+IMPORT_CACHE_MAX_BYTES = 20 * 1024 ** 3
+# Undo journal inside a Transaction's backup dir (original path -> moved-aside name, one JSON list per line)
+TXN_JOURNAL = "journal"
+# Staged activation: profiles pre-built next to the Mods folder, how many to keep, and the swap journal
+STAGE_KEEP = 3
+SWAP_JOURNAL = f"{INTERNAL_PREFIX}_swap.json"
+# Export: default deflate level, compression threads, and how much file data they may hold at once.
+# Files bigger than EXPORT_IN_MEMORY are streamed by the writer instead.
+EXPORT_LEVEL = 6
+EXPORT_WORKERS = min(8, os.cpu_count() or 2)
+EXPORT_IN_MEMORY = 32 * 1024 * 1024
+EXPORT_WINDOW = 256 * 1024 * 1024
+# Stored as-is when exporting: already compressed formats, and anything whose sample doesn't shrink
+INCOMPRESSIBLE_EXTENSIONS = {".bundle", ".png", ".jpg", ".jpeg", ".ogg", ".mp3", ".mp4", ".webm", ".zip", ".7z",
+                             ".rar", ".gz", ".xz", ".ktx2"}
+EXPORT_SAMPLE = 64 * 1024
+EXPORT_STORE_RATIO = 0.95
+# Packed profile: all of its files in one archive inside the profile folder (header, file data, then the
+# compressed table of contents), deflated at PACK_LEVEL except where that doesn't pay
+PACK_FILE = f"{INTERNAL_PREFIX}_pack"
+PACK_MAGIC = b"BLSMPACK"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<8sH6xQQ")  # magic, version, TOC offset, TOC size
+PACK_LEVEL = 6
+
+# operation log: one JSON line per operation next to the index, rotated at OPS_LOG_MAX_BYTES
+OPS_LOG = "blsm_ops.log"
+OPS_LOG_MAX_BYTES = 2 * 1024 * 1024
+OPS_LOG_BACKUPS = 3
+OPS_RECENT = 200
+# opt-in cProfile / tracemalloc reports go into this folder next to the log
+PROFILE_REPORTS = "blsm_reports"
+# distinct phases kept per operation (bulk imports name a phase per archive)
+OPS_MAX_PHASES = 100
+
+# --- Jobs / progress ---
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def format_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
+
+
+class Progress:
+    """
+    Byte/file counters shared between a running operation and whoever displays it.
+    Operations call add_total/advance and check() (raises JobCancelled once cancel() was called).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self.started = time.monotonic()
+        self.phase = ""
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.files_total = 0
+        # time, bytes and files per phase (and per span), summed over repeats, in first-seen order
+        self._timeline = {}
+        self._phase_mark = None
+
+    def set_phase(self, phase: str):
+        now = time.monotonic()
+        with self._lock:
+            self._close_phase(now)
+            self.phase = phase
+            self._phase_mark = (phase, now, self.bytes_done, self.files_done)
+
+    def _close_phase(self, now: float):
+        if self._phase_mark is not None:
+            phase, t0, b0, f0 = self._phase_mark
+            self._add_timing(phase, now - t0, self.bytes_done - b0, self.files_done - f0)
+
+    def _add_timing(self, name: str, seconds: float, nbytes: int, files: int):
+        if name not in self._timeline and len(self._timeline) >= OPS_MAX_PHASES:
+            name = "(other)"
+        t = self._timeline.setdefault(name, {"seconds": 0.0, "bytes": 0, "files": 0, "count": 0})
+        t["seconds"] += seconds
+        t["bytes"] += nbytes
+        t["files"] += files
+        t["count"] += 1
+
+    @contextlib.contextmanager
+    def span(self, name: str):
+        """
+        Time a step inside the current phase without changing what the UI shows.
+        """
+        phase = self.phase
+        t0 = time.monotonic()
+        b0, f0 = self.bytes_done, self.files_done
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._add_timing(f"{phase}/{name}" if phase else name, time.monotonic() - t0,
+                                 self.bytes_done - b0, self.files_done - f0)
+
+    def timings(self) -> list:
+        """
+        [{"phase", "seconds", "bytes", "files", "count"}]; the running phase counts up to now.
+        """
+        with self._lock:
+            timeline = {k: dict(v) for k, v in self._timeline.items()}
+            if self._phase_mark is not None:
+                phase, t0, b0, f0 = self._phase_mark
+                t = timeline.setdefault(phase, {"seconds": 0.0, "bytes": 0, "files": 0, "count": 0})
+                t["seconds"] += time.monotonic() - t0
+                t["bytes"] += self.bytes_done - b0
+                t["files"] += self.files_done - f0
+                t["count"] += 1
+        return [dict(v, phase=k, seconds=round(v["seconds"], 4)) for k, v in timeline.items()]
+
+    def add_total(self, nbytes: int = 0, files: int = 0):
+        with self._lock:
+            self.bytes_total += nbytes
+            self.files_total += files
+
+    def advance(self, nbytes: int = 0, files: int = 1):
+        with self._lock:
+            self.bytes_done += nbytes
+            self.files_done += files
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def describe(self) -> str:
+        with self._lock:
+            done, total = self.bytes_done, self.bytes_total
+            files, files_total = self.files_done, self.files_total
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        rate = done / elapsed
+        text = f"{format_bytes(done)}"
+        if total:
+            text += f" / {format_bytes(total)}"
+        text += f", {files}" + (f"/{files_total}" if files_total else "") + " files"
+        text += f" — {format_bytes(rate)}/s"
+        if total and rate > 0 and done < total:
+            text += f", ETA {format_duration((total - done) / rate)}"
+        return text
+
+
+class Job:
+    def __init__(self, name: str, func, on_done=None, on_error=None):
+        self.name = name
+        self.func = func
+        self.on_done = on_done
+        self.on_error = on_error
+        self.progress = Progress()
+        self.result = None
+        self.error = None
+
+
+class JobQueue:
+    """
+    Runs jobs one at a time on a single worker thread, so only one operation
+    touches the profiles / Mods folder at any moment. Finished jobs are handed
+    back through poll(), which the UI calls from the Tk thread.
+    """
+
+    def __init__(self):
+        self._pending = queue.Queue()
+        self._finished = queue.Queue()
+        self.current = None
+        self._worker = threading.Thread(target=self._run, name="blsm-jobs", daemon=True)
+        self._worker.start()
+
+    def submit(self, name: str, func, on_done=None, on_error=None) -> Job:
+        job = Job(name, func, on_done, on_error)
+        self._pending.put(job)
+        return job
+
+    def _run(self):
+        while True:
+            job = self._pending.get()
+            self.current = job
+            try:
+                # a job cancelled while still queued never starts
+                job.progress.check()
+                job.result = job.func(job.progress)
+            except BaseException as e:
+                job.error = e
+            self.current = None
+            self._finished.put(job)
+
+    def pending_count(self) -> int:
+        return self._pending.qsize()
+
+    def busy(self) -> bool:
+        return self.current is not None or not self._pending.empty()
+
+    def poll(self) -> list:
+        done = []
+        while True:
+            try:
+                done.append(self._finished.get_nowait())
+            except queue.Empty:
+                return done
+
+    def cancel_all(self):
+        job = self.current
+        if job:
+            job.progress.cancel()
+        for job in list(self._pending.queue):
+            job.progress.cancel()
+
+
+def _lower_thread_priority():
+    """
+    Make the calling thread background priority (CPU and, where the OS ties them together, I/O).
+    """
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_MODE_BACKGROUND_BEGIN)
+        elif sys.platform.startswith("linux"):
+            # per-thread on Linux; the default I/O priority follows the nice value
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (OSError, AttributeError):
+        pass
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION, STILL_ACTIVE = 0x1000, 259
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        try:
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Trash:
+    """
+    Deletes directory trees without making anyone wait. discard() renames the tree into a
+    trash folder next to it (same volume, so that's instant) and a low-priority background
+    thread deletes it. Whatever is left when the process ends is purged on the next start.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._count = 0
+
+    def discard(self, path: str, trash_root: str):
+        with self._lock:
+            self._count += 1
+            os.makedirs(trash_root, exist_ok=True)
+            dest = os.path.join(trash_root, f"{os.getpid()}-{time.time_ns()}-{self._count}")
+        os.replace(path, dest)
+        self._enqueue(dest)
+
+    def purge(self, trash_root: str) -> int:
+        """
+        Queue everything already in trash_root (left over from earlier runs) for deletion.
+        """
+        try:
+            names = os.listdir(trash_root)
+        except OSError:
+            return 0
+        for name in names:
+            self._enqueue(os.path.join(trash_root, name))
+        return len(names)
+
+    def _enqueue(self, path: str):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="blsm-trash", daemon=True)
+                self._thread.start()
+        self._queue.put(path)
+
+    def _run(self):
+        _lower_thread_priority()
+        while True:
+            path = self._queue.get()
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+                # drop the trash folder itself once it's empty
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+            self._queue.task_done()
+
+    def pending(self) -> int:
+        return self._queue.unfinished_tasks
+
+    def wait(self):
+        """
+        Block until everything discarded so far is deleted (the CLI calls this before exiting).
+        """
+        self._queue.join()
+
+
+TRASH = Trash()
+
+
+class Transaction:
+    """
+    Undo log for a file operation. Files the operation creates are recorded with
+    created(); files it would overwrite or delete are moved aside with displace()
+    instead. rollback() puts everything back, commit() hands the moved files to TRASH.
+    backup_root must be on the same volume as the files being displaced.
+    Moves are journaled, so recover_work_dirs() can put them back after a crash.
+    Safe to use from several worker threads of one operation.
+    """
+
+    def __init__(self, backup_root: str):
+        self.backup_root = backup_root
+        self.backup_dir = os.path.join(backup_root, f"{os.getpid()}-{time.time_ns()}")
+        self._lock = threading.Lock()
+        self._created = []
+        self._displaced = []
+        self._journal = None
+
+    def created(self, path: str):
+        with self._lock:
+            self._created.append(path)
+
+    def makedirs(self, path: str):
+        # record the outermost directory that doesn't exist yet, rollback removes it as a whole
+        top = None
+        p = os.path.abspath(path)
+        while not os.path.isdir(p):
+            top = p
+            parent = os.path.dirname(p)
+            if parent == p:
+                break
+            p = parent
+        os.makedirs(path, exist_ok=True)
+        if top is not None:
+            self.created(top)
+
+    def displace(self, path: str):
+        if not os.path.lexists(path):
+            return
+        with self._lock:
+            if self._journal is None:
+                os.makedirs(self.backup_dir, exist_ok=True)
+                self._journal = open(os.path.join(self.backup_dir, TXN_JOURNAL), "a", encoding="utf-8")
+            aside = os.path.join(self.backup_dir, str(len(self._displaced)))
+            self._journal.write(json.dumps([os.path.abspath(path), os.path.basename(aside)]) + "\n")
+            self._journal.flush()
+            os.replace(path, aside)
+            self._displaced.append((path, aside))
+
+    def rollback(self):
+        for path in reversed(self._created):
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                pass
+        for path, aside in reversed(self._displaced):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(aside, path)
+            except OSError:
+                pass
+        self._created = []
+        self._displaced = []
+        self.commit()
+
+    def commit(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if os.path.isdir(self.backup_dir):
+            try:
+                TRASH.discard(self.backup_dir, trash_dir_for(self.backup_root))
+            except OSError:
+                shutil.rmtree(self.backup_dir, ignore_errors=True)
+        try:
+            os.rmdir(self.backup_root)
+        except OSError:
+            pass
+
+
+def sibling_work_dir(folder: str, name: str) -> str:
+    """
+    BLSM scratch directory next to `folder` (same volume, so renames into it are instant).
+    """
+    folder = os.path.abspath(folder)
+    return os.path.join(os.path.dirname(folder), f"{INTERNAL_PREFIX}_{name}")
+
+
+def trash_dir_for(work_root: str) -> str:
+    """
+    The trash folder that sits next to a BLSM scratch directory.
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(work_root)), f"{INTERNAL_PREFIX}_trash")
+
+
+def recover_work_dirs(rollback_root: str) -> dict:
+    """
+    Clean up after BLSM processes that died mid-operation: files a Transaction under rollback_root
+    had moved aside are put back where nothing has replaced them, the rest is purged in the
+    background together with any leftover trash. Work dirs of running processes are left alone.
+    """
+    restored = 0
+    trash_root = trash_dir_for(rollback_root)
+    purging = TRASH.purge(trash_root)
+    try:
+        runs = os.listdir(rollback_root)
+    except OSError:
+        runs = []
+    for run in runs:
+        run_dir = os.path.join(rollback_root, run)
+        try:
+            if _pid_alive(int(run.split("-")[0])):
+                continue
+        except ValueError:
+            pass
+        try:
+            with open(os.path.join(run_dir, TXN_JOURNAL), encoding="utf-8") as f:
+                moves = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            moves = []
+        for path, aside in reversed(moves):
+            aside = os.path.join(run_dir, aside)
+            if os.path.lexists(aside) and not os.path.lexists(path):
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(aside, path)
+                    restored += 1
+                except OSError:
+                    pass
+        try:
+            TRASH.discard(run_dir, trash_root)
+            purging += 1
+        except OSError:
+            pass
+    try:
+        os.rmdir(rollback_root)
+    except OSError:
+        pass
+    return {"restored": restored, "purging": purging}
+
+
+# --- Operation log ---
+
+log = logging.getLogger("blsm")
+
+
+class _JsonLineFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {"time": round(record.created, 3), "level": record.levelname}
+        fields = getattr(record, "fields", None)
+        if fields is not None:
+            data.update(fields)
+        else:
+            data.update(logger=record.name, message=record.getMessage())
+        if record.exc_info:
+            data["traceback"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+_LOG_HANDLERS = {}
+_LOG_HANDLERS_LOCK = threading.Lock()
+
+
+def _log_handler(path: str) -> logging.Handler:
+    # one rotating handler per file, however many OpLogs / loggers write to it
+    key = os.path.normcase(os.path.abspath(path))
+    with _LOG_HANDLERS_LOCK:
+        handler = _LOG_HANDLERS.get(key)
+        if handler is None:
+            import logging.handlers
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=OPS_LOG_MAX_BYTES, backupCount=OPS_LOG_BACKUPS,
+                                                           encoding="utf-8", delay=True)
+            handler.setFormatter(_JsonLineFormatter())
+            _LOG_HANDLERS[key] = handler
+        return handler
+
+
+def attach_log(path: str):
+    """
+    Send warnings and errors of the "blsm" logger (UI and core) to the operation log file too.
+    """
+    handler = _log_handler(path)
+    if handler not in log.handlers:
+        log.addHandler(handler)
+    if log.level == logging.NOTSET or log.level > logging.INFO:
+        log.setLevel(logging.INFO)
+
+
+def _result_summary(result):
+    # the countable part of an operation's result (numbers, and lengths of lists), for the log
+    if hasattr(result, "__dataclass_fields__"):
+        result = asdict(result)
+    if isinstance(result, (list, tuple)):
+        return {"items": len(result)}
+    if not isinstance(result, dict):
+        return {}
+    summary = {}
+    for k, v in result.items():
+        if isinstance(v, (int, float)) and not isinstance(v, bool):
+            summary[k] = v
+        elif isinstance(v, list):
+            summary[k] = len(v)
+    return summary
+
+
+class OpLog:
+    """
+    Structured record of operations: one JSON line each (duration, bytes, files, per-phase
+    timings from the Progress, result counts, error) in a size-rotated log file, and the most
+    recent ones in memory for the UI. With profiling on, operations also run under cProfile
+    and tracemalloc and leave a report in PROFILE_REPORTS next to the log.
+    """
+
+    def __init__(self, path: str, profiling: bool = False):
+        self.path = path
+        self.profiling = profiling
+        self.last_report = None
+        self._recent = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._logger = logging.getLogger(f"blsm.ops.{hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        if _log_handler(path) not in self._logger.handlers:
+            self._logger.addHandler(_log_handler(path))
+
+    def write(self, entry: dict):
+        # read the file's tail first, before this entry lands in it
+        self.recent()
+        with self._lock:
+            self._recent.append(entry)
+        self._logger.info(entry.get("op", ""), extra={"fields": entry})
+
+    def recent(self) -> list:
+        """
+        Latest operations, oldest first; on first use read back from the end of the log file.
+        """
+        with self._lock:
+            if self._recent is None:
+                self._recent = deque(maxlen=OPS_RECENT)
+                try:
+                    with open(self.path, "rb") as f:
+                        offset = max(0, os.fstat(f.fileno()).st_size - 256 * 1024)
+                        f.seek(offset)
+                        # past the start, the first line is cut off
+                        lines = f.read().splitlines()[1 if offset else 0:]
+                except OSError:
+                    lines = []
+                for line in lines:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if "op" in entry:
+                        self._recent.append(entry)
+            return list(self._recent)
+
+    @contextlib.contextmanager
+    def record(self, op: str, progress: Progress, **fields):
+        """
+        Log one operation around the with-block; the block may set entry["result"]. Nested
+        operations (repair verifying first, ...) are part of the outer one's record.
+        """
+        if getattr(self._local, "active", False):
+            yield {}
+            return
+        self._local.active = True
+        entry = dict(op=op, **fields)
+        started = time.time()
+        t0 = time.perf_counter()
+        b0, f0 = progress.bytes_done, progress.files_done
+        profiler = self._start_profiling() if self.profiling else None
+        try:
+            yield entry
+            entry["ok"] = True
+        except BaseException as e:
+            entry["ok"] = False
+            entry["error"] = "cancelled" if isinstance(e, JobCancelled) else f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self._local.active = False
+            seconds = time.perf_counter() - t0
+            nbytes = progress.bytes_done - b0
+            entry.update(
+                started=round(started, 3),
+                seconds=round(seconds, 4),
+                bytes=nbytes,
+                files=progress.files_done - f0,
+                bytes_per_s=round(nbytes / seconds) if seconds else None,
+                phases=progress.timings(),
+                result=_result_summary(entry.get("result")),
+            )
+            if profiler is not None:
+                entry.update(self._finish_profiling(op, profiler))
+            try:
+                self.write(entry)
+            except Exception:
+                log.exception("could not write the operation log")
+
+    def event(self, op: str, seconds: float, **fields):
+        """
+        A timed step that isn't a core operation (e.g. the UI redrawing after one).
+        """
+        self.write(dict(op=op, started=round(time.time() - seconds, 3), seconds=round(seconds, 4), ok=True, **fields))
+
+    def _start_profiling(self):
+        import cProfile
+        import tracemalloc
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is active (e.g. the whole app runs under one)
+            return None
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        return profiler, was_tracing
+
+    def _finish_profiling(self, op: str, state) -> dict:
+        import pstats
+        import tracemalloc
+        profiler, was_tracing = state
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if not was_tracing:
+            tracemalloc.stop()
+        folder = os.path.join(os.path.dirname(os.path.abspath(self.path)), PROFILE_REPORTS)
+        os.makedirs(folder, exist_ok=True)
+        base = os.path.join(folder, f"{time.strftime('%Y%m%d-%H%M%S')}_{re.sub(r'[^0-9A-Za-z_-]+', '_', op)}")
+        profiler.dump_stats(base + ".prof")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"{op}: peak traced memory {format_bytes(peak)}\n")
+            f.write("(cProfile sees the calling thread only; copy / extract / hash workers show up as waits)\n\n")
+            pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(40)
+            f.write("\nTop allocations (still held at the end):\n")
+            for stat in snapshot.statistics("lineno")[:25]:
+                f.write(f"{stat}\n")
+        self.last_report = base + ".txt"
+        return {"report": self.last_report, "peak_traced_bytes": peak}
+
+
+# --- Utility functions ---
+
+
+def safe_member_path(target_dir: str, member: str) -> str:
+    """
+    Destination path of a zip member inside target_dir (prevents ZipSlip).
+    """
+    # Normalize path and ensure it stays inside target_dir
+    base = os.path.abspath(target_dir)
+    dest_path = os.path.normpath(os.path.join(base, member))
+    if os.path.commonpath([base, dest_path]) != base or dest_path == base:
+        raise Exception("Illegal file path in zip (ZipSlip attempt)")
+    return dest_path
+
+
+def zip_strip_prefix(names) -> str:
+    """
+    Auto-fix for zips that wrap everything in one extra folder: returns "Folder/" when every
+    entry lives under a single top-level folder, so it can be stripped while extracting.
+    A folder that is itself a pallet (has pallet.json directly inside) is the mod and is kept.
+    """
+    top_levels = set()
+    for n in names:
+        part = n.split("/", 1)[0]
+        if part:
+            top_levels.add(part)
+    if len(top_levels) != 1:
+        return ""
+    root = top_levels.pop()
+    prefix = root + "/"
+    # only a real folder is a wrapper: a lone top-level file (e.g. "mod.json") must be kept
+    if not all(n.startswith(prefix) for n in names) or not any(len(n) > len(prefix) for n in names):
+        return ""
+    if (prefix + "pallet.json") in names:
+        return ""
+    return prefix
+
+
+def extract_zip_autofix(zip_path: str, dest: str, progress: Progress = None, txn: Transaction = None,
+                        workers: int = EXTRACT_WORKERS) -> dict:
+    """
+    Extract zip to dest in a single pass, stripping a wrapper folder on the fly (see zip_strip_prefix).
+    Members are written in parallel, each worker thread reading through its own ZipFile handle.
+    """
+    progress = progress or Progress()
+    with progress.span("read"):
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            infos = zf.infolist()
+        names = [i.filename.replace("\\", "/") for i in infos]
+        prefix = zip_strip_prefix(names)
+        # plan: (info, destination) for every file member, biggest first so the pool stays busy
+        plan = []
+        dirs = set()
+        for info, name in zip(infos, names):
+            if name.endswith("/"):
+                continue
+            rel = name[len(prefix):] if prefix else name
+            # skip empty names
+            if not rel:
+                continue
+            dest_path = safe_member_path(dest, rel)
+            plan.append((info, dest_path))
+            dirs.add(os.path.dirname(dest_path))
+        plan.sort(key=lambda p: p[0].file_size, reverse=True)
+        progress.add_total(sum(i.file_size for i, _ in plan), len(plan))
+    with progress.span("mkdirs"):
+        # directories up front, so workers only ever write files
+        for d in sorted(dirs):
+            if txn is not None:
+                txn.makedirs(d)
+            else:
+                os.makedirs(d, exist_ok=True)
+
+    local = threading.local()
+    handles = []
+    lock = threading.Lock()
+    failed = threading.Event()
+    stats = {"written": 0}
+
+    def extract_one(info: zipfile.ZipInfo, dest_path: str):
+        if failed.is_set():
+            return
+        progress.check()
+        zf = getattr(local, "zf", None)
+        if zf is None:
+            zf = local.zf = zipfile.ZipFile(zip_path, "r")
+            with lock:
+                handles.append(zf)
+        if txn is not None:
+            txn.displace(dest_path)
+        bufsize = LARGE_COPY_BUFFER if info.file_size >= LARGE_FILE else SMALL_COPY_BUFFER
+        with zf.open(info) as src, open(dest_path, "wb" if txn is None else "xb") as dst:
+            if txn is not None:
+                txn.created(dest_path)
+            while True:
+                chunk = src.read(bufsize)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                progress.advance(len(chunk), files=0)
+                progress.check()
+                if failed.is_set():
+                    return
+        progress.advance(files=1)
+        # keep the archive's timestamp so re-imports compare equal in manifests
+        try:
+            ts = time.mktime(info.date_time + (0, 0, -1))
+            os.utime(dest_path, (ts, ts))
+        except (OverflowError, ValueError, OSError):
+            pass
+        with lock:
+            stats["written"] += 1
+
+    with progress.span("write"):
+        try:
+            if workers <= 1 or len(plan) <= 1:
+                for info, dest_path in plan:
+                    extract_one(info, dest_path)
+            else:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blsm-unzip") as ex:
+                    futures = [ex.submit(extract_one, info, dest_path) for info, dest_path in plan]
+                    try:
+                        for fut in as_completed(futures):
+                            fut.result()
+                    except BaseException:
+                        # stop the other workers before their next member
+                        failed.set()
+                        ex.shutdown(wait=True, cancel_futures=True)
+                        raise
+        finally:
+            for zf in handles:
+                zf.close()
+    return stats
+
+
+# --- Content-addressed store ---
+
+
+def is_internal_name(name: str) -> bool:
+    return name.startswith(INTERNAL_PREFIX)
+
+
+def hash_file(path: str, progress: Progress = None) -> str:
+    """
+    SHA-256 of a file's contents (hex). Big files are hashed straight from an mmap
+    instead of being read into buffers first.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= HASH_MMAP_MIN:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m, memoryview(m) as view:
+                for pos in range(0, len(view), HASH_CHUNK):
+                    if progress is not None:
+                        progress.check()
+                    chunk = view[pos:pos + HASH_CHUNK]
+                    h.update(chunk)
+                    if progress is not None:
+                        progress.advance(len(chunk), 0)
+                    chunk.release()
+            return h.hexdigest()
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+            if progress is not None:
+                progress.advance(len(chunk), 0)
+    return h.hexdigest()
+
+
+def try_reflink(src: str, dst: str) -> bool:
+    """
+    Copy-on-write clone of src to dst (Linux FICLONE: btrfs, xfs, ...).
+    Returns False when the platform or filesystem doesn't support it.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    FICLONE = 0x40049409
+    try:
+        with open(src, "rb") as fs, open(dst, "xb") as fd:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+    except OSError:
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+# --- Copy engine ---
+
+
+def _copy_data(fsrc, fdst, size: int, buffer: int) -> int:
+    """
+    Copy size bytes between two unbuffered files: kernel-side (copy_file_range, then sendfile)
+    where the OS allows it, otherwise a readinto loop over one reused buffer, which also finishes
+    a kernel copy that stopped early. A source shorter than size raises OSError.
+    """
+    done = 0
+    infd, outfd = fsrc.fileno(), fdst.fileno()
+    for method in ("copy_file_range", "sendfile"):
+        if not _kernel_copy[method]:
+            continue
+        try:
+            while done < size:
+                if method == "copy_file_range":
+                    n = os.copy_file_range(infd, outfd, min(size - done, KERNEL_COPY_CHUNK))
+                else:
+                    n = os.sendfile(outfd, infd, done, min(size - done, KERNEL_COPY_CHUNK))
+                if not n:
+                    break
+                done += n
+            if done >= size:
+                return done
+            break
+        except OSError as e:
+            if done:
+                raise
+            # not supported here at all -> don't try again; otherwise (other fs, ...) just not for this file
+            if e.errno in (errno.ENOSYS, errno.EOPNOTSUPP, errno.EPERM):
+                _kernel_copy[method] = False
+    if done:
+        # sendfile leaves the source position alone; continue both files where the kernel stopped
+        fsrc.seek(done)
+        fdst.seek(done)
+    view = memoryview(bytearray(min(buffer, max(size, 1))))
+    while True:
+        n = fsrc.readinto(view)
+        if not n:
+            break
+        chunk = view[:n]
+        while chunk.nbytes:
+            written = fdst.write(chunk)
+            chunk = chunk[written:]
+        done += n
+    if done < size:
+        raise OSError(errno.EIO, f"Short copy: {done} of {size} bytes", getattr(fsrc, "name", None))
+    return done
+
+
+_kernel_copy = {
+    "copy_file_range": hasattr(os, "copy_file_range"),
+    "sendfile": sys.platform.startswith("linux") and hasattr(os, "sendfile"),
+}
+
+
+def copy_file(src: str, dst: str, buffer: int = SMALL_COPY_BUFFER, created=None) -> int:
+    """
+    copy2 replacement: copies data, mode and timestamps (what manifests compare) without the
+    extra stat / xattr calls. dst must not exist yet; created(dst) is called once it does.
+    Returns the bytes copied.
+    """
+    with open(src, "rb", buffering=0) as fsrc:
+        st = os.fstat(fsrc.fileno())
+        with open(dst, "xb", buffering=0) as fdst:
+            if created is not None:
+                created(dst)
+            n = _copy_data(fsrc, fdst, st.st_size, buffer)
+            if os.utime in os.supports_fd:
+                os.utime(fdst.fileno(), ns=(st.st_atime_ns, st.st_mtime_ns))
+    if os.utime not in os.supports_fd:
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.chmod(dst, st.st_mode & 0o7777)
+    return n
+
+
+class CopyEngine:
+    """
+    Shared file copier. Files below small_max go to a thread pool (many small pallet files keep
+    an NVMe drive busy that way), bigger ones are streamed on the calling thread with large_buffer.
+    Errors and cancellation surface from wait(); stats() is the throughput of everything copied.
+    """
+
+    def __init__(self, progress: Progress = None, workers: int = COPY_WORKERS, small_max: int = COPY_SMALL_MAX,
+                 buffer: int = SMALL_COPY_BUFFER, large_buffer: int = LARGE_COPY_BUFFER):
+        self.progress = progress or Progress()
+        self.workers = workers
+        self.small_max = small_max
+        self.buffer = buffer
+        self.large_buffer = large_buffer
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._futures = []
+        self._started = None
+
+    def _copy(self, func, args, buffer: int):
+        self.progress.check()
+        n = func(*args, buffer)
+        with self._lock:
+            self.files += 1
+            self.bytes += n
+        self.progress.advance(n)
+
+    def copy(self, src: str, dst: str, size: int = None, created=None):
+        """
+        Copy src to dst, possibly in the background. size saves a stat when the caller knows it;
+        created(dst) is called as soon as the copy has created dst.
+        """
+        if size is None:
+            size = os.path.getsize(src)
+        self._run(size, functools.partial(copy_file, created=created), src, dst)
+
+    def unpack(self, pack: "PackReader", rel: str, dst: str, created=None):
+        """
+        Extract one file of a pack to dst, possibly in the background.
+        """
+        self._run(pack.size(rel), functools.partial(pack.extract, created=created), rel, dst)
+
+    def _run(self, size: int, func, *args):
+        if self._started is None:
+            self._started = time.perf_counter()
+        if size >= self.small_max or self.workers <= 1:
+            self._copy(func, args, self.large_buffer)
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="blsm-copy")
+        # bounded queue: a failure shows up early and memory stays flat on huge trees
+        if len(self._futures) >= self.workers * 8:
+            self._futures.pop(0).result()
+        self._futures.append(self._pool.submit(self._copy, func, args, self.buffer))
+
+    def wait(self):
+        """
+        Block until every copy finished; re-raises the first error.
+        """
+        try:
+            first = None
+            for fut in self._futures:
+                try:
+                    fut.result()
+                except BaseException as e:
+                    first = first or e
+            if first is not None:
+                raise first
+        finally:
+            self._futures = []
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+            if self._started is not None:
+                self.seconds += time.perf_counter() - self._started
+                self._started = None
+
+    def abort(self):
+        """
+        Let running copies end (so a rollback doesn't race them) and drop their errors.
+        """
+        for fut in self._futures:
+            fut.cancel()
+        try:
+            self.wait()
+        except BaseException:
+            pass
+
+    def stats(self) -> dict:
+        seconds = self.seconds
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "seconds": round(seconds, 4),
+            "bytes_per_s": round(self.bytes / seconds) if seconds else None,
+            "files_per_s": round(self.files / seconds, 1) if seconds else None,
+        }
+
+
+class Materializer:
+    """
+    Places single files at a destination using the cheapest method available.
+    A hardlink that fails once (other volume, FAT32, ...) is not retried for the rest
+    of the operation; same for reflink. Real copies go through a CopyEngine, so call
+    finish() (or abort() before a rollback) once everything is placed.
+    Counts how each file ended up being placed.
+    """
+
+    def __init__(self, mode: str = "link", progress: Progress = None, txn: Transaction = None):
+        self.progress = progress or Progress()
+        self.txn = txn
+        self.use_link = mode == "link"
+        self.use_reflink = mode == "link"
+        self.counts = {"link": 0, "reflink": 0, "copy": 0, "unpack": 0}
+        self.bytes = 0
+        self.copier = CopyEngine(self.progress)
+        self.started = time.perf_counter()
+        self.seconds = None
+
+    def place(self, src: str, dst: str, size: int = None) -> str:
+        self.progress.check()
+        created = None
+        if self.txn is not None:
+            # a file already there is moved aside (rollback puts it back); dst is recorded
+            # only once this operation has actually created it
+            self.txn.displace(dst)
+            created = self.txn.created
+        how = "copy"
+        if self.use_link:
+            try:
+                os.link(src, dst)
+                how = "link"
+            except FileExistsError:
+                raise
+            except OSError:
+                self.use_link = False
+        if how == "copy" and self.use_reflink:
+            if try_reflink(src, dst):
+                how = "reflink"
+            else:
+                self.use_reflink = False
+        self.counts[how] += 1
+        if size is None:
+            size = os.path.getsize(src)
+        self.bytes += size
+        if how == "copy":
+            self.copier.copy(src, dst, size, created)
+        else:
+            if created is not None:
+                created(dst)
+            self.progress.advance(size)
+        return how
+
+    def unpack(self, pack: "PackReader", rel: str, dst: str) -> str:
+        """
+        Place a file of a packed profile: from the blob store like any other file while the store
+        still holds it, otherwise extracted from the pack.
+        """
+        size = pack.size(rel)
+        blob = pack.blob(rel)
+        if blob is not None:
+            return self.place(blob, dst, size)
+        self.progress.check()
+        created = None
+        if self.txn is not None:
+            self.txn.displace(dst)
+            created = self.txn.created
+        self.counts["unpack"] += 1
+        self.bytes += size
+        self.copier.unpack(pack, rel, dst, created)
+        return "unpack"
+
+    def finish(self):
+        self.copier.wait()
+        self.seconds = time.perf_counter() - self.started
+
+    def abort(self):
+        self.copier.abort()
+
+    def stats(self) -> dict:
+        """
+        Throughput of the whole operation, plus how the files were placed and the copy engine's own numbers.
+        """
+        seconds = self.seconds if self.seconds is not None else time.perf_counter() - self.started
+        return {
+            "placed": dict(self.counts),
+            "bytes": self.bytes,
+            "seconds": round(seconds, 4),
+            "bytes_per_s": round(self.bytes / seconds) if seconds else None,
+            "files_per_s": round(sum(self.counts.values()) / seconds, 1) if seconds else None,
+            "copy": self.copier.stats(),
+        }
+
+
+def materialize_tree(src_root: str, dst_root: str, mode: str = "link", progress: Progress = None,
+                     txn: Transaction = None) -> Materializer:
+    """
+    Recreate the file tree of src_root inside dst_root (hardlinks when possible).
+    BLSM-internal files are skipped. Existing destination files are replaced.
+    """
+    m = Materializer(mode, progress, txn)
+    manifest = scan_manifest(src_root)
+    m.progress.add_total(sum(e[0] for e in manifest.values()), len(manifest))
+    try:
+        _make_dirs(dst_root, manifest, txn)
+        for rel, (size, _, _) in manifest.items():
+            d = _native(dst_root, rel)
+            if txn is not None:
+                txn.displace(d)
+            elif os.path.lexists(d):
+                os.remove(d)
+            m.place(_native(src_root, rel), d, size)
+        m.finish()
+    except BaseException:
+        m.abort()
+        raise
+    return m
+
+
+def _make_dirs(root: str, rels, txn: Transaction = None):
+    """
+    Create every directory the files in rels need, in one pass up front, parents first.
+    """
+    dirs = {""}
+    for rel in rels:
+        parts = rel.split("/")[:-1]
+        for i in range(1, len(parts) + 1):
+            dirs.add("/".join(parts[:i]))
+    for d in sorted(dirs, key=lambda x: (x.count("/"), x)):
+        path = _native(root, d) if d else root
+        if os.path.isdir(path):
+            continue
+        if txn is not None:
+            txn.makedirs(path)
+        else:
+            os.makedirs(path, exist_ok=True)
+
+
+def scan_children(folder: str) -> list:
+    """
+    [(name, is_dir, files, bytes)] for the entries of one folder, sizes summed over subtrees
+    (the slow path for folders the index doesn't know).
+    """
+    rows = []
+    with os.scandir(folder) as it:
+        for e in it:
+            if is_internal_name(e.name):
+                continue
+            if e.is_dir(follow_symlinks=False):
+                size, files = tree_size(e.path)
+                rows.append((e.name, True, files, size))
+            else:
+                rows.append((e.name, False, 1, e.stat(follow_symlinks=False).st_size))
+    return rows
+
+
+def tree_size(root: str):
+    """
+    (total bytes, file count) of a tree, BLSM-internal files excluded.
+    """
+    manifest = scan_manifest(root)
+    return sum(e[0] for e in manifest.values()), len(manifest)
+
+
+def _blob_path(store_dir: str, digest: str) -> str:
+    return os.path.join(store_dir, "objects", digest[:2], digest[2:])
+
+
+def _load_inode_catalog(store_dir: str) -> dict:
+    try:
+        with open(os.path.join(store_dir, "inodes.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_inode_catalog(store_dir: str, catalog: dict):
+    path = os.path.join(store_dir, "inodes.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(catalog, f)
+    os.replace(tmp, path)
+
+
+def _inode_key(st) -> str:
+    return f"{st.st_dev}:{st.st_ino}"
+
+
+def store_put(path: str, store_dir: str = STORE_DIR, catalog: dict = None) -> str:
+    """
+    Put one file into the store and make `path` a hardlink to the stored blob.
+    If the volume doesn't support hardlinks the blob is a copy and `path` is left alone.
+    Returns the content digest.
+    """
+    st = os.stat(path)
+    key = _inode_key(st)
+    if catalog is not None and key in catalog and os.path.exists(_blob_path(store_dir, catalog[key])):
+        return catalog[key]
+    digest = hash_file(path)
+    blob = _blob_path(store_dir, digest)
+    if not os.path.exists(blob):
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        tmp = f"{blob}.{os.getpid()}.tmp"
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)  # left by a crashed run with the same pid
+        try:
+            os.link(path, tmp)
+        except OSError:
+            copy_file(path, tmp)
+        os.replace(tmp, blob)
+    else:
+        # same content already stored: swap the file for a link to the blob
+        tmp = f"{path}.{os.getpid()}.blsmtmp"
+        try:
+            os.link(blob, tmp)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    if catalog is not None:
+        catalog[_inode_key(os.stat(path))] = digest
+    return digest
+
+
+def ingest_tree(root: str, store_dir: str = STORE_DIR, progress: Progress = None) -> dict:
+    """
+    Deduplicate every file under root into the store.
+    Files already known to the store (same inode) are not re-hashed.
+    """
+    progress = progress or Progress()
+    catalog = _load_inode_catalog(store_dir)
+    stats = {"files": 0, "hashed": 0}
+    try:
+        for r, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if not is_internal_name(d)]
+            for f in files:
+                if is_internal_name(f):
+                    continue
+                progress.check()
+                p = os.path.join(r, f)
+                before = len(catalog)
+                store_put(p, store_dir, catalog)
+                stats["files"] += 1
+                if len(catalog) != before:
+                    stats["hashed"] += 1
+    finally:
+        os.makedirs(store_dir, exist_ok=True)
+        _save_inode_catalog(store_dir, catalog)
+    return stats
+
+
+def store_gc(store_dir: str = STORE_DIR) -> int:
+    """
+    Remove blobs no profile links to any more (link count 1) and the import cache doesn't
+    reference. Returns freed bytes.
+    """
+    freed = 0
+    objects = os.path.join(store_dir, "objects")
+    if not os.path.isdir(objects):
+        return 0
+    catalog = _load_inode_catalog(store_dir)
+    cached = ImportCache(store_dir).referenced_digests()
+    live = set()
+    for r, dirs, files in os.walk(objects):
+        for f in files:
+            p = os.path.join(r, f)
+            try:
+                st = os.stat(p)
+                if st.st_nlink == 1 and os.path.basename(r) + f not in cached:
+                    os.remove(p)
+                    freed += st.st_size
+                else:
+                    live.add(_inode_key(st))
+            except OSError:
+                pass
+    _save_inode_catalog(store_dir, {k: v for k, v in catalog.items() if k in live})
+    return freed
+
+
+# --- Import cache ---
+
+
+def archive_fingerprint(zip_path: str) -> str:
+    """
+    Identity of an archive's contents from its central directory alone (names, CRCs, sizes),
+    so it costs milliseconds even for multi-GB ZIPs.
+    """
+    h = hashlib.sha256()
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for info in sorted(zf.infolist(), key=lambda i: i.filename):
+            h.update(f"{info.filename}\0{info.CRC}\0{info.file_size}\n".encode("utf-8", "surrogateescape"))
+    return h.hexdigest()
+
+
+class ImportCache:
+    """
+    Remembers what each imported archive extracted to: fingerprint -> files as
+    [relative path, blob digest, size]. The blobs live in the store, so adding a
+    known archive again just links them into place.
+    """
+
+    def __init__(self, store_dir: str = STORE_DIR):
+        self.store_dir = store_dir
+        self.path = os.path.join(store_dir, IMPORT_CACHE_FILE)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+    def lookup(self, fp: str):
+        entry = self.entries.get(fp)
+        if entry is None:
+            return None
+        if not entry["files"] or not all(os.path.exists(_blob_path(self.store_dir, d)) for _, d, _ in entry["files"]):
+            # a blob went missing (store wiped by hand?), or nothing was extracted (e.g. by an older
+            # BLSM that dropped single-file archives) -> treat as unknown and extract again
+            del self.entries[fp]
+            return None
+        entry["last_used"] = time.time()
+        return entry
+
+    def add_tree(self, fp: str, root: str, archive: str) -> dict:
+        """
+        Store every file extracted under root and record them for fingerprint fp.
+        """
+        catalog = _load_inode_catalog(self.store_dir)
+        files = []
+        for rel, (size, _, _) in scan_manifest(root).items():
+            files.append([rel, store_put(_native(root, rel), self.store_dir, catalog), size])
+        _save_inode_catalog(self.store_dir, catalog)
+        now = time.time()
+        entry = {"archive": archive, "files": files, "bytes": sum(f[2] for f in files),
+                 "created": now, "last_used": now}
+        self.entries[fp] = entry
+        return entry
+
+    def place(self, entry: dict, dest: str, mode: str = "link", progress: Progress = None,
+              txn: Transaction = None) -> Materializer:
+        m = Materializer(mode, progress, txn)
+        m.progress.add_total(entry["bytes"], len(entry["files"]))
+        try:
+            _make_dirs(dest, [rel for rel, _, _ in entry["files"]], txn)
+            for rel, digest, size in entry["files"]:
+                d = _native(dest, rel)
+                if txn is not None:
+                    txn.displace(d)
+                elif os.path.lexists(d):
+                    os.remove(d)
+                m.place(_blob_path(self.store_dir, digest), d, size)
+            m.finish()
+        except BaseException:
+            m.abort()
+            raise
+        return m
+
+    def referenced_digests(self) -> set:
+        return {d for e in self.entries.values() for _, d, _ in e["files"]}
+
+    def total_bytes(self) -> int:
+        return sum(e["bytes"] for e in self.entries.values())
+
+    def evict(self, max_bytes: int = IMPORT_CACHE_MAX_BYTES) -> list:
+        """
+        Drop least recently used entries until the cache fits in max_bytes, then free
+        their blobs unless a profile still links them. Returns the dropped fingerprints.
+        """
+        dropped = []
+        total = self.total_bytes()
+        for fp, entry in sorted(self.entries.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= max_bytes:
+                break
+            total -= entry["bytes"]
+            dropped.append(fp)
+        if not dropped:
+            return dropped
+        candidates = set()
+        for fp in dropped:
+            candidates.update(d for _, d, _ in self.entries.pop(fp)["files"])
+        candidates -= self.referenced_digests()
+        for digest in candidates:
+            blob = _blob_path(self.store_dir, digest)
+            try:
+                if os.stat(blob).st_nlink == 1:
+                    os.remove(blob)
+            except OSError:
+                pass
+        return dropped
+
+
+def import_archive(zip_path: str, dest: str, mode: str = "link", progress: Progress = None,
+                   txn: Transaction = None, cache: ImportCache = None) -> dict:
+    """
+    Add an archive's files to dest through the import cache: known archives are linked from
+    the store, new ones are extracted once into the store first.
+    """
+    own_cache = cache is None
+    cache = cache or ImportCache()
+    fp = archive_fingerprint(zip_path)
+    entry = cache.lookup(fp)
+    hit = entry is not None
+    if not hit:
+        staging = os.path.join(cache.store_dir, "tmp", fp)
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            extract_zip_autofix(zip_path, staging, progress)
+            entry = cache.add_tree(fp, staging, os.path.basename(zip_path))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    cache.place(entry, dest, mode, progress, txn)
+    if own_cache:
+        cache.evict()
+        cache.save()
+    return {"cached": hit, "files": len(entry["files"]), "bytes": entry["bytes"]}
+
+
+# --- Manifests / incremental activation ---
+# A manifest maps a relative path ("/"-separated) to [size, mtime_ns, sha256-or-None].
+
+
+def scan_manifest(root: str, with_hash: bool = False) -> dict:
+    """
+    Walk root and build its manifest. BLSM-internal files are skipped.
+    """
+    manifest = {}
+    root_len = len(os.path.join(root, ""))
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except FileNotFoundError:
+            continue
+        with it:
+            for e in it:
+                if is_internal_name(e.name):
+                    continue
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.is_file():
+                    st = e.stat()
+                    rel = e.path[root_len:].replace(os.sep, "/")
+                    manifest[rel] = [st.st_size, st.st_mtime_ns, hash_file(e.path) if with_hash else None]
+    return manifest
+
+
+def _newest_dir_mtime(root: str) -> int:
+    # newest mtime among the directories below root (0 if there are none)
+    newest = 0
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False) and not is_internal_name(e.name):
+                    newest = max(newest, e.stat(follow_symlinks=False).st_mtime_ns)
+                    stack.append(e.path)
+    return newest
+
+
+def same_entry(a, b) -> bool:
+    # prefer content hashes when both sides have one, otherwise size + mtime
+    if a[2] and b[2]:
+        return a[2] == b[2]
+    return a[0] == b[0] and a[1] == b[1]
+
+
+def diff_manifests(target: dict, current: dict):
+    """
+    Returns (remove, add, replace): paths only in current, only in target, and in both but different.
+    """
+    remove = [rel for rel in current if rel not in target]
+    add = []
+    replace = []
+    for rel, entry in target.items():
+        cur = current.get(rel)
+        if cur is None:
+            add.append(rel)
+        elif not same_entry(entry, cur):
+            replace.append(rel)
+    return remove, add, replace
+
+
+def _native(root: str, rel: str) -> str:
+    return os.path.join(root, *rel.split("/"))
+
+
+def _folder_stamp(folder: str) -> dict:
+    # mtimes of every directory and of the top-level files: adding, removing or renaming a file
+    # at any depth changes its directory's mtime, a mod re-extracted in-game changes the top level
+    stamp = {".": os.stat(folder).st_mtime_ns}
+    root_len = len(os.path.join(folder, ""))
+    stack = [folder]
+    while stack:
+        d = stack.pop()
+        with os.scandir(d) as it:
+            for e in it:
+                if is_internal_name(e.name):
+                    continue
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif d != folder:
+                    continue
+                stamp[e.path[root_len:].replace(os.sep, "/")] = e.stat(follow_symlinks=False).st_mtime_ns
+    return stamp
+
+
+def load_active_manifest(mods_folder: str, state_file: str = ACTIVE_STATE_FILE):
+    """
+    Persisted manifest of the Mods folder, or None if missing or the folder changed since.
+    """
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if os.path.normcase(os.path.abspath(state.get("mods_folder", ""))) != os.path.normcase(os.path.abspath(mods_folder)):
+            return None
+        if state.get("stamp") != _folder_stamp(mods_folder):
+            return None
+        return state.get("files")
+    except (OSError, ValueError):
+        return None
+
+
+def load_active_profile(state_file: str = ACTIVE_STATE_FILE):
+    """
+    Name of the profile BLSM last activated (None after unload or if unknown).
+    """
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f).get("profile")
+    except (OSError, ValueError):
+        return None
+
+
+def save_active_state(mods_folder: str, profile, manifest: dict, state_file: str = ACTIVE_STATE_FILE):
+    state = {
+        "mods_folder": os.path.abspath(mods_folder),
+        "profile": profile,
+        "stamp": _folder_stamp(mods_folder),
+        "files": manifest,
+    }
+    tmp = state_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, state_file)
+
+
+def clear_active_state(state_file: str = ACTIVE_STATE_FILE):
+    try:
+        os.remove(state_file)
+    except FileNotFoundError:
+        pass
+
+
+def _prune_empty_dirs(root: str, rels):
+    # remove directories left empty after deleting rels (deepest first, never root itself)
+    dirs = set()
+    for rel in rels:
+        parts = rel.split("/")[:-1]
+        for i in range(len(parts), 0, -1):
+            dirs.add("/".join(parts[:i]))
+    for d in sorted(dirs, key=lambda x: x.count("/"), reverse=True):
+        try:
+            os.rmdir(_native(root, d))
+        except OSError:
+            pass
+
+
+def apply_diff(prof_path: str, mods_folder: str, target: dict, remove, add, replace, mode: str = "link",
+               progress: Progress = None, sources: dict = None) -> Materializer:
+    """
+    Delete `remove`, place `add` and swap out `replace` (paths relative to both trees) in one
+    transaction: cancelling or any error puts the Mods folder back. Returns the finished Materializer.
+    `sources` maps paths of a layered profile to the profile folder they come from. The profile (or
+    a source) may also be the PackReader of a packed profile; its files are then streamed from the pack.
+    """
+    progress = progress or Progress()
+    progress.add_total(sum(target[rel][0] for rel in add + replace), len(add) + len(replace))
+    txn = Transaction(sibling_work_dir(mods_folder, "rollback"))
+    m = Materializer(mode, progress, txn)
+    try:
+        progress.set_phase("Removing")
+        for rel in remove + replace:
+            progress.check()
+            txn.displace(_native(mods_folder, rel))
+        _prune_empty_dirs(mods_folder, remove)
+        progress.set_phase("Placing")
+        _make_dirs(mods_folder, add + replace, txn)
+        for rel in add + replace:
+            src_root = sources.get(rel, prof_path) if sources else prof_path
+            if isinstance(src_root, PackReader):
+                m.unpack(src_root, rel, _native(mods_folder, rel))
+            else:
+                m.place(_native(src_root, rel), _native(mods_folder, rel), target[rel][0])
+        m.finish()
+    except BaseException:
+        m.abort()
+        txn.rollback()
+        raise
+    txn.commit()
+    return m
+
+
+def activate_incremental(prof_path: str, mods_folder: str, mode: str = "link", profile_name=None,
+                         progress: Progress = None, target: dict = None,
+                         state_file: str = ACTIVE_STATE_FILE, sources: dict = None) -> dict:
+    """
+    Make mods_folder match the profile by touching only the entries that differ.
+    `target` is the profile's manifest if already known (e.g. from the ProfileIndex),
+    `sources` the parent folders of a layered profile's files (see resolve_layers).
+    Cancelling (or any error) rolls the Mods folder back to what it was.
+    """
+    progress = progress or Progress()
+    progress.set_phase("Scanning")
+    if target is None:
+        target = scan_manifest(prof_path)
+    current = load_active_manifest(mods_folder, state_file)
+    if current is None:
+        current = scan_manifest(mods_folder)
+    remove, add, replace = diff_manifests(target, current)
+    # the persisted state is only valid again once everything went through
+    clear_active_state(state_file)
+    m = apply_diff(prof_path, mods_folder, target, remove, add, replace, mode, progress, sources)
+    save_active_state(mods_folder, profile_name, target, state_file)
+    return {
+        "removed": len(remove),
+        "added": len(add),
+        "replaced": len(replace),
+        "kept": len(target) - len(add) - len(replace),
+        "placed": m.counts,
+        "throughput": m.stats(),
+    }
+
+
+def clear_mods_folder(mods_folder: str, progress: Progress = None, state_file: str = ACTIVE_STATE_FILE):
+    """
+    Empty the Mods folder and record it as empty. Entries are only renamed aside (cancelling
+    puts them back); the actual deletion happens later on the background TRASH thread.
+    """
+    progress = progress or Progress()
+    clear_active_state(state_file)
+    items = os.listdir(mods_folder)
+    progress.add_total(files=len(items))
+    txn = Transaction(sibling_work_dir(mods_folder, "rollback"))
+    try:
+        progress.set_phase("Moving aside")
+        for item in items:
+            progress.check()
+            txn.displace(os.path.join(mods_folder, item))
+            progress.advance()
+    except BaseException:
+        txn.rollback()
+        raise
+    txn.commit()
+    save_active_state(mods_folder, None, {}, state_file)
+
+
+# --- Verify / repair ---
+
+
+def _same_file(a: str, b: str) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def verify_tree(prof_path: str, mods_folder: str, target: dict, progress: Progress = None, deep: bool = False,
+                workers: int = VERIFY_WORKERS, sources: dict = None) -> dict:
+    """
+    Compare mods_folder with a profile's manifest in tiers. One stat walk finds missing and
+    extra files and files whose size differs. Files whose size matches but mtime doesn't are
+    suspects unless they are a hardlink to the profile's own file; with deep every file is one,
+    links included, since a link's contents can have been edited in place. Suspects are hashed
+    on a thread pool and compared with the profile's digest (hashing the profile side too when
+    the index doesn't know it; a pack's table of contents always does).
+    Suspects with equal contents are "touched": only their timestamp differs.
+    """
+    progress = progress or Progress()
+    progress.set_phase("Checking")
+    current = scan_manifest(mods_folder)
+    missing = sorted(rel for rel in target if rel not in current)
+    extra = sorted(rel for rel in current if rel not in target)
+    modified = []
+    suspects = []
+
+    def source(rel):
+        # the file to compare against; for a packed profile only its blob in the store (if any)
+        root = sources.get(rel, prof_path) if sources else prof_path
+        return root.blob(rel) if isinstance(root, PackReader) else _native(root, rel)
+
+    for rel, want in target.items():
+        have = current.get(rel)
+        if have is None:
+            continue
+        if have[0] != want[0]:
+            modified.append(rel)
+        elif deep:
+            suspects.append(rel)
+        elif have[1] != want[1]:
+            progress.check()
+            src = source(rel)
+            if src is None or not _same_file(src, _native(mods_folder, rel)):
+                suspects.append(rel)
+
+    def contents_equal(rel):
+        digest = target[rel][2] or hash_file(source(rel), progress)
+        return hash_file(_native(mods_folder, rel), progress) == digest
+
+    touched = []
+    hashed_bytes = sum(target[rel][0] * (1 if target[rel][2] else 2) for rel in suspects)
+    if suspects:
+        progress.set_phase("Hashing")
+        progress.add_total(hashed_bytes, len(suspects))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {pool.submit(contents_equal, rel): rel for rel in suspects}
+            for fut in as_completed(futures):
+                rel = futures[fut]
+                try:
+                    same = fut.result()
+                except OSError:
+                    same = False
+                if not same:
+                    modified.append(rel)
+                elif current[rel][1] != target[rel][1]:
+                    touched.append(rel)
+                progress.advance(0)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    return {
+        "missing": missing,
+        "extra": extra,
+        "modified": sorted(modified),
+        "touched": sorted(touched),
+        "checked": len(current),
+        "hashed": len(suspects),
+        "hashed_bytes": hashed_bytes,
+    }
+
+
+def repair_tree(prof_path: str, mods_folder: str, target: dict, missing, extra, modified, touched=(),
+                mode: str = "link", profile_name=None, progress: Progress = None,
+                state_file: str = ACTIVE_STATE_FILE, sources: dict = None) -> dict:
+    """
+    Fix what verify_tree found and nothing else: extra files go, missing and modified ones
+    are placed again from the profile, touched ones get the profile's timestamp back.
+    Afterwards the Mods folder is recorded as matching the profile.
+    """
+    progress = progress or Progress()
+    clear_active_state(state_file)
+    m = apply_diff(prof_path, mods_folder, target, list(extra), list(missing), list(modified), mode, progress, sources)
+    for rel in touched:
+        mtime = target[rel][1]
+        os.utime(_native(mods_folder, rel), ns=(mtime, mtime))
+    save_active_state(mods_folder, profile_name, target, state_file)
+    return {
+        "removed": len(extra),
+        "added": len(missing),
+        "replaced": len(modified),
+        "restamped": len(touched),
+        "throughput": m.stats(),
+    }
+
+
+def update_from_folder(folder: str, prof_path: str, remove, add, replace, touched=(), mode: str = "link",
+                       progress: Progress = None, store_dir: str = STORE_DIR) -> dict:
+    """
+    repair_tree the other way round: bring a profile in line with a folder (the Mods folder) by
+    removing, adding and replacing only the given paths, in one transaction. New files are linked
+    from the folder where possible and then put into the store (link mode); touched ones give the
+    folder's copy the profile's timestamp back instead of changing the profile's (possibly shared) file.
+    """
+    progress = progress or Progress()
+    add, replace = list(add), list(replace)
+    sizes = {rel: [os.path.getsize(_native(folder, rel)), None, None] for rel in add + replace}
+    m = apply_diff(folder, prof_path, sizes, list(remove), add, replace, mode, progress)
+    for rel in touched:
+        mtime = os.stat(_native(prof_path, rel)).st_mtime_ns
+        os.utime(_native(folder, rel), ns=(mtime, mtime))
+    if mode == "link" and (add or replace):
+        progress.set_phase("Deduplicating")
+        catalog = _load_inode_catalog(store_dir)
+        try:
+            for rel in add + replace:
+                progress.check()
+                store_put(_native(prof_path, rel), store_dir, catalog)
+        finally:
+            os.makedirs(store_dir, exist_ok=True)
+            _save_inode_catalog(store_dir, catalog)
+    return {
+        "removed": len(remove),
+        "added": len(add),
+        "replaced": len(replace),
+        "restamped": len(touched),
+        "throughput": m.stats(),
+    }
+
+
+# --- Layered profiles ---
+# A profile may build on parent profiles: its LAYERS_FILE lists them (later parents win) and
+# the parent paths it leaves out. Its own files come on top. Nothing is copied from the parents;
+# the effective manifest is resolved when the profile is activated, staged, verified or exported.
+
+
+def load_layers(prof_path: str) -> dict:
+    """
+    {"parents": [...], "remove": [...]} of a profile; both empty for a plain profile.
+    """
+    try:
+        with open(os.path.join(prof_path, LAYERS_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {"parents": [], "remove": []}
+    return {"parents": list(data.get("parents", [])), "remove": [p.strip("/") for p in data.get("remove", [])]}
+
+
+def save_layers(prof_path: str, parents, remove=()):
+    path = os.path.join(prof_path, LAYERS_FILE)
+    if not parents and not remove:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return
+    _write_json_atomic(path, {"parents": list(parents), "remove": [p.strip("/") for p in remove]})
+
+
+def resolve_layers(name: str, spec_of, manifest_of):
+    """
+    Effective manifest of a layered profile. spec_of(name) gives a profile's load_layers() dict,
+    manifest_of(name) its own manifest. Every profile is resolved once, however often it is
+    inherited. Returns (manifest, sources, conflicts): sources maps each path to the profile it
+    comes from; a conflict is a path two parents provide with different contents (the later one wins).
+    """
+    resolved = {}
+    conflicts = []
+
+    def resolve(n, chain):
+        if n in resolved:
+            return resolved[n]
+        if n in chain:
+            raise ValueError("Profile layers form a cycle: " + " -> ".join(chain + (n,)))
+        spec = spec_of(n)
+        manifest = {}
+        sources = {}
+        for parent in spec["parents"]:
+            p_manifest, p_sources = resolve(parent, chain + (n,))
+            for rel, entry in p_manifest.items():
+                have = manifest.get(rel)
+                if have is not None and sources[rel] != p_sources[rel] and not same_entry(have, entry):
+                    conflicts.append({"kind": "file", "profile": n, "path": rel,
+                                      "layers": [sources[rel], p_sources[rel]], "used": p_sources[rel]})
+                manifest[rel] = entry
+                sources[rel] = p_sources[rel]
+        if spec["remove"]:
+            removed = set(spec["remove"])
+            prefixes = tuple(p + "/" for p in removed)
+            for rel in [r for r in manifest if r in removed or r.startswith(prefixes)]:
+                del manifest[rel]
+                del sources[rel]
+        own = manifest_of(n)
+        manifest.update(own)
+        sources.update(dict.fromkeys(own, n))
+        resolved[n] = (manifest, sources)
+        return resolved[n]
+
+    manifest, sources = resolve(name, ())
+    return manifest, sources, conflicts
+
+
+# --- Staged activation ---
+
+
+def stage_paths(mods_folder: str, name: str):
+    """
+    (tree, state file) of a profile staged next to the Mods folder.
+    """
+    root = sibling_work_dir(mods_folder, "stage")
+    return os.path.join(root, name, "Mods"), os.path.join(root, name, "state.json")
+
+
+def can_swap(mods_folder: str) -> bool:
+    # a Mods folder that is a link to elsewhere has to stay one
+    isjunction = getattr(os.path, "isjunction", lambda p: False)
+    return os.path.isdir(mods_folder) and not os.path.islink(mods_folder) and not isjunction(mods_folder)
+
+
+def is_stage_current(mods_folder: str, name: str, target: dict) -> bool:
+    tree, state = stage_paths(mods_folder, name)
+    if not os.path.isdir(tree):
+        return False
+    staged = load_active_manifest(tree, state)
+    return staged is not None and not any(diff_manifests(target, staged))
+
+
+def stage_profile(prof_path: str, mods_folder: str, name: str, mode: str = "link", progress: Progress = None,
+                  target: dict = None, sources: dict = None) -> dict:
+    """
+    Build the profile's Mods tree next to the Mods folder (or bring an older one up to date),
+    ready for swap_in_stage. The live Mods folder is not touched.
+    """
+    sweep_stages(mods_folder)
+    tree, state = stage_paths(mods_folder, name)
+    os.makedirs(tree, exist_ok=True)
+    return activate_incremental(prof_path, tree, mode, name, progress, target, state, sources)
+
+
+def _write_json_atomic(path: str, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def swap_in_stage(mods_folder: str, name: str, target: dict, state_file: str = ACTIVE_STATE_FILE) -> str:
+    """
+    Replace the Mods folder with the staged tree of `name` by two renames, journaled so an
+    interrupted swap is rolled back by recover_swap(). The previous Mods folder becomes the
+    staged tree of the previously active profile when its manifest is known (so switching back
+    is instant too), otherwise it goes to the trash. Returns the previous profile it kept, if any.
+    """
+    sweep_stages(mods_folder)
+    root = sibling_work_dir(mods_folder, "stage")
+    tree, stage_state = stage_paths(mods_folder, name)
+    prev = load_active_profile(state_file)
+    prev_manifest = load_active_manifest(mods_folder, state_file)
+    if prev and prev != name and prev_manifest is not None:
+        prev_dir = os.path.dirname(stage_paths(mods_folder, prev)[0])
+        if os.path.exists(prev_dir):
+            TRASH.discard(prev_dir, trash_dir_for(root))
+        os.makedirs(prev_dir)
+        aside = os.path.join(prev_dir, "Mods")
+    else:
+        prev = None
+        aside = os.path.join(root, f"{INTERNAL_PREFIX}_previous-{time.time_ns()}")
+    journal = os.path.join(root, SWAP_JOURNAL)
+    _write_json_atomic(journal, {"mods": os.path.abspath(mods_folder), "staged": tree, "aside": aside})
+    clear_active_state(state_file)
+    os.replace(mods_folder, aside)
+    try:
+        os.replace(tree, mods_folder)
+    except BaseException:
+        os.replace(aside, mods_folder)
+        os.remove(journal)
+        raise
+    os.remove(journal)
+    save_active_state(mods_folder, name, target, state_file)
+    TRASH.discard(os.path.dirname(tree), trash_dir_for(root))
+    if prev:
+        save_active_state(aside, prev, prev_manifest, stage_paths(mods_folder, prev)[1])
+    else:
+        TRASH.discard(aside, trash_dir_for(root))
+    prune_stages(mods_folder)
+    return prev
+
+
+def prune_stages(mods_folder: str, keep: int = STAGE_KEEP):
+    """
+    Keep only the `keep` most recently staged profiles.
+    """
+    root = sibling_work_dir(mods_folder, "stage")
+    try:
+        names = [n for n in os.listdir(root) if not is_internal_name(n)]
+    except OSError:
+        return
+
+    def staged_at(n):
+        try:
+            return os.path.getmtime(stage_paths(mods_folder, n)[1])
+        except OSError:
+            return 0
+
+    for n in sorted(names, key=staged_at, reverse=True)[keep:]:
+        try:
+            TRASH.discard(os.path.join(root, n), trash_dir_for(root))
+        except OSError:
+            pass
+
+
+def sweep_stages(mods_folder: str):
+    """
+    Trash what interrupted swaps left in the stage folder: previous Mods folders nobody kept and
+    stage folders whose tree is gone. Nothing is touched while a swap journal awaits recover_swap().
+    """
+    root = sibling_work_dir(mods_folder, "stage")
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return
+    if SWAP_JOURNAL in names:
+        return
+    for n in names:
+        if n.startswith(f"{INTERNAL_PREFIX}_previous-") or \
+                (not is_internal_name(n) and not os.path.isdir(stage_paths(mods_folder, n)[0])):
+            try:
+                TRASH.discard(os.path.join(root, n), trash_dir_for(root))
+            except OSError:
+                pass
+
+
+def recover_swap(mods_folder: str) -> bool:
+    """
+    Finish a swap that was interrupted: between its two renames (the Mods folder is missing) the
+    previous Mods folder is put back; after both, the previous folder goes to the trash unless it
+    was kept as a stage. Returns True if there was a journal to process.
+    """
+    root = sibling_work_dir(mods_folder, "stage")
+    journal = os.path.join(root, SWAP_JOURNAL)
+    try:
+        with open(journal, "r", encoding="utf-8") as f:
+            swap = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if not os.path.lexists(swap["mods"]) and os.path.isdir(swap["aside"]):
+        os.replace(swap["aside"], swap["mods"])
+    elif os.path.basename(swap["aside"]).startswith(f"{INTERNAL_PREFIX}_previous-") and os.path.isdir(swap["aside"]):
+        TRASH.discard(swap["aside"], trash_dir_for(root))
+    os.remove(journal)
+    return True
+
+
+# --- Export ---
+
+
+class VolumeWriter:
+    """
+    Write-only file that rolls over to path.001, path.002, ... every volume_size bytes
+    (the split format 7-Zip / WinRAR open directly, or join with copy /b). volume_size 0 writes one file.
+    tell() is the offset in the joined stream, which is what the ZIP headers need.
+    """
+
+    def __init__(self, path: str, volume_size: int = 0):
+        self.path = path
+        self.volume_size = volume_size
+        self.paths = []
+        self._fp = None
+        self._room = 0
+        self._pos = 0
+
+    def _next_volume(self):
+        if self._fp:
+            self._fp.close()
+        path = f"{self.path}.{len(self.paths) + 1:03d}" if self.volume_size else self.path
+        self.paths.append(path)
+        self._fp = open(path, "wb")
+        self._room = self.volume_size
+
+    def write(self, data):
+        if self._fp is None:
+            self._next_volume()
+        view = memoryview(data)
+        while view.nbytes:
+            if self.volume_size and not self._room:
+                self._next_volume()
+            n = min(view.nbytes, self._room) if self.volume_size else view.nbytes
+            self._fp.write(view[:n])
+            self._room -= n
+            self._pos += n
+            view = view[n:]
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        if self._fp is None:
+            self._next_volume()
+        self._fp.close()
+
+    def discard(self):
+        if self._fp:
+            self._fp.close()
+        for path in self.paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class ZipStreamWriter:
+    """
+    Minimal ZIP writer for data that is already compressed (raw deflate) or stored, so
+    compression can happen on worker threads. Never seeks (works on split volumes);
+    entries whose sizes aren't known up front get a data descriptor. ZIP64 where needed.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self._central = []
+
+    @staticmethod
+    def _dos_time(mtime: float):
+        t = time.localtime(max(mtime, 315619200))  # DOS dates start in 1980
+        return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+    def _local_header(self, name: bytes, flags, method, mtime, crc, csize, usize, zip64) -> bytes:
+        dtime, ddate = self._dos_time(mtime)
+        extra = b""
+        if zip64:
+            extra = struct.pack("<HHQQ", 1, 16, usize, csize)
+            csize = usize = 0xFFFFFFFF
+        return struct.pack("<4sHHHHHLLLHH", b"PK\x03\x04", 45 if zip64 else 20, flags, method, dtime, ddate,
+                           crc, csize, usize, len(name), len(extra)) + name + extra
+
+    def _add_central(self, name, flags, method, mtime, crc, csize, usize, offset, mode):
+        self._central.append((name, flags, method, mtime, crc, csize, usize, offset, mode))
+
+    @staticmethod
+    def _encode(arcname: str):
+        try:
+            return arcname.encode("ascii"), 0
+        except UnicodeEncodeError:
+            return arcname.encode("utf-8"), 0x800
+
+    def add_bytes(self, arcname: str, data: bytes, method: int, crc: int, usize: int, mtime: float, mode: int = 0o644):
+        """
+        Add an entry whose (compressed) data is already in memory.
+        """
+        self.add_raw(arcname, (data,), method, crc, len(data), usize, mtime, mode)
+
+    def add_raw(self, arcname: str, chunks, method: int, crc: int, csize: int, usize: int, mtime: float,
+                mode: int = 0o644):
+        """
+        Add an entry from chunks of already compressed data whose sizes and CRC are known up front.
+        """
+        name, flags = self._encode(arcname)
+        offset = self.fp.tell()
+        zip64 = usize >= 0xFFFFFFFF or csize >= 0xFFFFFFFF
+        self.fp.write(self._local_header(name, flags, method, mtime, crc, csize, usize, zip64))
+        for chunk in chunks:
+            self.fp.write(chunk)
+        self._add_central(name, flags, method, mtime, crc, csize, usize, offset, mode)
+
+    def add_stream(self, arcname: str, chunks, method: int, level: int, mtime: float, mode: int = 0o644) -> int:
+        """
+        Add an entry from an iterable of uncompressed chunks, compressing here if method is deflate.
+        Sizes and CRC follow in a data descriptor. Returns the uncompressed size.
+        """
+        name, flags = self._encode(arcname)
+        flags |= 0x08
+        offset = self.fp.tell()
+        self.fp.write(self._local_header(name, flags, method, mtime, 0, 0, 0, True))
+        comp = zlib.compressobj(level, zlib.DEFLATED, -15) if method == zipfile.ZIP_DEFLATED else None
+        crc = usize = csize = 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            usize += len(chunk)
+            if comp:
+                chunk = comp.compress(chunk)
+            csize += len(chunk)
+            self.fp.write(chunk)
+        if comp:
+            tail = comp.flush()
+            csize += len(tail)
+            self.fp.write(tail)
+        self.fp.write(struct.pack("<4sLQQ", b"PK\x07\x08", crc, csize, usize))
+        self._add_central(name, flags, method, mtime, crc, csize, usize, offset, mode)
+        return usize
+
+    def close(self):
+        cd_offset = self.fp.tell()
+        for name, flags, method, mtime, crc, csize, usize, offset, mode in self._central:
+            dtime, ddate = self._dos_time(mtime)
+            extra = b""
+            if usize >= 0xFFFFFFFF:
+                extra += struct.pack("<Q", usize)
+                usize = 0xFFFFFFFF
+            if csize >= 0xFFFFFFFF:
+                extra += struct.pack("<Q", csize)
+                csize = 0xFFFFFFFF
+            if offset >= 0xFFFFFFFF:
+                extra += struct.pack("<Q", offset)
+                offset = 0xFFFFFFFF
+            if extra:
+                extra = struct.pack("<HH", 1, len(extra)) + extra
+            version = 45 if extra or flags & 0x08 else 20
+            self.fp.write(struct.pack("<4sHHHHHHLLLHHHHHLL", b"PK\x01\x02", (3 << 8) | version, version, flags, method,
+                                      dtime, ddate, crc, csize, usize, len(name), len(extra), 0, 0, 0,
+                                      ((0o100000 | mode) & 0xFFFF) << 16, offset) + name + extra)
+        cd_size = self.fp.tell() - cd_offset
+        count = len(self._central)
+        if count >= 0xFFFF or cd_offset >= 0xFFFFFFFF or cd_size >= 0xFFFFFFFF:
+            eocd64 = self.fp.tell()
+            self.fp.write(struct.pack("<4sQHHLLQQQQ", b"PK\x06\x06", 44, 45, 45, 0, 0, count, count, cd_size, cd_offset))
+            self.fp.write(struct.pack("<4sLQL", b"PK\x06\x07", 0, eocd64, 1))
+            count, cd_size, cd_offset = min(count, 0xFFFF), min(cd_size, 0xFFFFFFFF), min(cd_offset, 0xFFFFFFFF)
+        self.fp.write(struct.pack("<4sHHHHLLH", b"PK\x05\x06", 0, 0, count, count, cd_size, cd_offset, 0))
+
+
+def looks_incompressible(path: str, size: int) -> bool:
+    """
+    Known compressed formats by extension; otherwise deflate a sample from the middle of the file.
+    """
+    if os.path.splitext(path)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return True
+    if size < EXPORT_SAMPLE:
+        return False
+    with open(path, "rb") as f:
+        f.seek((size - EXPORT_SAMPLE) // 2)
+        sample = f.read(EXPORT_SAMPLE)
+    return len(zlib.compress(sample, 1)) > len(sample) * EXPORT_STORE_RATIO
+
+
+def _read_chunks(path: str, progress: Progress, buffer: int = LARGE_COPY_BUFFER):
+    with open(path, "rb") as f:
+        while True:
+            progress.check()
+            chunk = f.read(buffer)
+            if not chunk:
+                return
+            yield chunk
+            progress.advance(len(chunk), files=0)
+
+
+def _compress_member(path: str, size: int, level: int):
+    """
+    Worker: read a file that fits in memory and deflate it unless that doesn't pay.
+    Returns (method, crc, data).
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    crc = zlib.crc32(raw)
+    if level and not looks_incompressible(path, size):
+        comp = zlib.compressobj(level, zlib.DEFLATED, -15)
+        data = comp.compress(raw) + comp.flush()
+        if len(data) < len(raw):
+            return zipfile.ZIP_DEFLATED, crc, data
+    return zipfile.ZIP_STORED, crc, raw
+
+
+def _compress_ahead(members, work, workers: int = EXPORT_WORKERS):
+    """
+    Yield (member, future) in order while work(member) runs ahead on worker threads for the members
+    that are files of up to EXPORT_IN_MEMORY bytes (future None for the rest, which the caller streams).
+    Members are tuples with the path at index 1 and the size at index 2. At most EXPORT_WINDOW bytes of
+    file data are held in memory.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = deque()  # (member, future or None) in order
+        in_flight = 0
+        it = iter(members)
+        done = False
+        while pending or not done:
+            # keep the workers busy, but hold at most EXPORT_WINDOW bytes of file data in memory
+            while not done and (not pending or (in_flight < EXPORT_WINDOW and len(pending) < workers * 64)):
+                member = next(it, None)
+                if member is None:
+                    done = True
+                    break
+                small = isinstance(member[1], str) and member[2] <= EXPORT_IN_MEMORY
+                pending.append((member, pool.submit(work, member) if small else None))
+                in_flight += member[2] if small else 0
+            if not pending:
+                break
+            member, fut = pending.popleft()
+            if fut is not None:
+                fut.result()
+                in_flight -= member[2]
+            yield member, fut
+
+
+def export_profile_zip(prof_path: str, save: str, progress: Progress = None, level: int = EXPORT_LEVEL,
+                       volume_size: int = 0, workers: int = EXPORT_WORKERS, files: list = None) -> list:
+    """
+    Write every profile file into a ZIP, in walk order. Files up to EXPORT_IN_MEMORY are read and
+    deflated on worker threads (already-compressed ones are stored), bigger ones are streamed by
+    the writer. level 0 stores everything; volume_size > 0 splits into save.001, save.002, ...
+    `files` ([(name in the archive, path or (PackReader, path in the pack))]) replaces the walk, e.g.
+    for a layered or packed profile. Packed files go into the ZIP as they are in the pack, without
+    compressing them again (unless level 0 asks for them stored).
+    Returns the written file(s). A cancelled or failed export leaves no partial file behind.
+    """
+    progress = progress or Progress()
+    progress.set_phase("Listing")
+    members = []  # (arc, source, size, mtime, mode)
+    if files is None:
+        files = []
+        for root, dirs, names in os.walk(prof_path):
+            dirs[:] = sorted(d for d in dirs if not is_internal_name(d))
+            for f in sorted(names):
+                if not is_internal_name(f):
+                    fp = os.path.join(root, f)
+                    files.append((os.path.relpath(fp, prof_path).replace(os.sep, "/"), fp))
+    for arc, src in files:
+        if isinstance(src, tuple):
+            size, mtime = src[0].entries[src[1]][:2]
+            members.append((arc, src, size, mtime / 1e9, 0o644))
+        else:
+            st = os.stat(src)
+            members.append((arc, src, st.st_size, st.st_mtime, st.st_mode & 0o777))
+    progress.add_total(sum(m[2] for m in members), len(members))
+    progress.set_phase("Writing")
+    out = VolumeWriter(save, volume_size)
+    try:
+        zw = ZipStreamWriter(out)
+        ahead = _compress_ahead(members, lambda m: _compress_member(m[1], m[2], level), workers)
+        with contextlib.closing(ahead):
+            for (arc, src, size, mtime, mode), fut in ahead:
+                progress.check()
+                if isinstance(src, tuple):
+                    pack, rel = src
+                    csize, method, crc = pack.entries[rel][4:]
+                    if level or method == zipfile.ZIP_STORED:
+                        zw.add_raw(arc, pack.raw_chunks(rel), method, crc, csize, size, mtime, mode)
+                    else:
+                        zw.add_stream(arc, pack.chunks(rel), zipfile.ZIP_STORED, 0, mtime, mode)
+                    progress.advance(size)
+                elif fut is None:
+                    method = zipfile.ZIP_STORED if not level or looks_incompressible(src, size) else zipfile.ZIP_DEFLATED
+                    zw.add_stream(arc, _read_chunks(src, progress), method, level, mtime, mode)
+                    progress.advance(0)
+                else:
+                    method, crc, data = fut.result()
+                    zw.add_bytes(arc, data, method, crc, size, mtime, mode)
+                    progress.advance(size)
+        zw.close()
+        out.close()
+        return out.paths
+    except BaseException:
+        out.discard()
+        raise
+
+
+# --- Packed profiles ---
+# A packed profile keeps all of its files in PACK_FILE inside its folder instead of as loose files:
+# a header, the file data back to back and a compressed JSON table of contents at the end, with one
+# row per file: [path, size, mtime_ns, sha256, offset, packed size, method (ZIP_STORED / raw deflate), crc32].
+
+
+def _pack_member(path: str, size: int, level: int, digest: str = None):
+    """
+    Worker: _compress_member plus the file's content digest (unless already known).
+    Returns (method, crc, data, digest).
+    """
+    method, crc, data = _compress_member(path, size, level)
+    if digest is None:
+        digest = hashlib.sha256(data).hexdigest() if method == zipfile.ZIP_STORED else hash_file(path)
+    return method, crc, data, digest
+
+
+def _pack_stream(path: str, size: int, level: int, out, progress: Progress):
+    """
+    Append a file too big for the workers to the pack, deflating it while reading unless it
+    looks incompressible; if deflate didn't pay after all it is written again stored.
+    Returns (method, crc, digest).
+    """
+    start = out.tell()
+    comp = zlib.compressobj(level, zlib.DEFLATED, -15) if level and not looks_incompressible(path, size) else None
+    sha = hashlib.sha256()
+    crc = 0
+    for chunk in _read_chunks(path, progress):
+        crc = zlib.crc32(chunk, crc)
+        sha.update(chunk)
+        out.write(comp.compress(chunk) if comp else chunk)
+    if comp is None:
+        return zipfile.ZIP_STORED, crc, sha.hexdigest()
+    out.write(comp.flush())
+    if out.tell() - start < size:
+        return zipfile.ZIP_DEFLATED, crc, sha.hexdigest()
+    out.seek(start)
+    out.truncate()
+    with open(path, "rb") as f:
+        shutil.copyfileobj(f, out, LARGE_COPY_BUFFER)
+    return zipfile.ZIP_STORED, crc, sha.hexdigest()
+
+
+def pack_profile(prof_path: str, progress: Progress = None, level: int = PACK_LEVEL, workers: int = EXPORT_WORKERS,
+                 known: dict = None) -> dict:
+    """
+    Write every file of a profile into its PACK_FILE, compressed like an export (on worker threads,
+    bundles and other incompressible files stored). `known` is the profile's manifest from the index;
+    its digests are reused for files that didn't change. The loose files are left in place, and a
+    cancelled or failed run leaves no pack behind. Returns file / byte counts.
+    """
+    progress = progress or Progress()
+    progress.set_phase("Listing")
+    known = known or {}
+    members = []  # (rel, path, size, mtime, digest or None)
+    for rel, (size, mtime, _) in sorted(scan_manifest(prof_path).items()):
+        prev = known.get(rel)
+        digest = prev[2] if prev and prev[0] == size and prev[1] == mtime else None
+        members.append((rel, _native(prof_path, rel), size, mtime, digest))
+    progress.add_total(sum(m[2] for m in members), len(members))
+    progress.set_phase("Packing")
+    path = os.path.join(prof_path, PACK_FILE)
+    tmp = path + ".tmp"
+    toc = []
+    stats = {"files": len(members), "bytes": 0, "packed_bytes": 0, "stored": 0, "deflated": 0}
+    try:
+        with open(tmp, "wb") as out:
+            out.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, 0))
+            ahead = _compress_ahead(members, lambda m: _pack_member(m[1], m[2], level, m[4]), workers)
+            with contextlib.closing(ahead):
+                for (rel, fp, size, mtime, digest), fut in ahead:
+                    progress.check()
+                    offset = out.tell()
+                    if fut is None:
+                        method, crc, digest = _pack_stream(fp, size, level, out, progress)
+                        progress.advance(0)
+                    else:
+                        method, crc, data, digest = fut.result()
+                        out.write(data)
+                        progress.advance(size)
+                    toc.append([rel, size, mtime, digest, offset, out.tell() - offset, method, crc])
+                    stats["bytes"] += size
+                    stats["stored" if method == zipfile.ZIP_STORED else "deflated"] += 1
+            toc_offset = out.tell()
+            data = zlib.compress(json.dumps({"files": toc}, separators=(",", ":")).encode("utf-8"))
+            out.write(data)
+            out.seek(0)
+            out.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, toc_offset, len(data)))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+    stats["packed_bytes"] = os.path.getsize(path)
+    return stats
+
+
+class PackReader:
+    """
+    A packed profile opened for random access. The table of contents is read once; file data is
+    read through a read-only mmap of the pack (stored files are sliced out of it, deflated ones
+    inflated chunk by chunk), so any single file can be read, extracted or copied into a ZIP
+    without unpacking the rest. Safe to share between threads.
+    """
+
+    def __init__(self, path: str, store_dir: str = None):
+        self.path = path
+        self.store_dir = store_dir
+        with open(path, "rb") as f:
+            head = f.read(PACK_HEADER.size)
+            if len(head) != PACK_HEADER.size or head[:len(PACK_MAGIC)] != PACK_MAGIC:
+                raise ValueError(f"Not a BLSM pack: {path}")
+            _, version, toc_offset, toc_size = PACK_HEADER.unpack(head)
+            if version != PACK_VERSION or not toc_offset:
+                raise ValueError(f"Unsupported or unfinished BLSM pack: {path}")
+            f.seek(toc_offset)
+            toc = json.loads(zlib.decompress(f.read(toc_size)))
+            st = os.fstat(f.fileno())
+        # size and mtime of the pack itself: a different stamp means it was rewritten
+        self.stamp = (st.st_size, st.st_mtime_ns)
+        # rel -> (size, mtime_ns, digest, offset, packed size, method, crc32)
+        self.entries = {row[0]: tuple(row[1:]) for row in toc["files"]}
+        self._fp = open(path, "rb")
+        self._map = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self._map.close()
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def manifest(self) -> dict:
+        return {rel: [size, mtime, digest] for rel, (size, mtime, digest, *_) in self.entries.items()}
+
+    def size(self, rel: str) -> int:
+        return self.entries[rel][0]
+
+    def blob(self, rel: str) -> Optional[str]:
+        """
+        The file's blob in the store if the store still has it with the same size and mtime
+        (files shared with other profiles stay there), else None.
+        """
+        if not self.store_dir:
+            return None
+        size, mtime, digest = self.entries[rel][:3]
+        path = _blob_path(self.store_dir, digest)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return path if st.st_size == size and st.st_mtime_ns == mtime else None
+
+    def raw_chunks(self, rel: str, buffer: int = LARGE_COPY_BUFFER):
+        """
+        The file's data as stored in the pack (raw deflate or plain), in slices of at most buffer bytes.
+        """
+        offset, csize = self.entries[rel][3:5]
+        for pos in range(offset, offset + csize, buffer):
+            yield self._map[pos:min(pos + buffer, offset + csize)]
+
+    def chunks(self, rel: str, buffer: int = LARGE_COPY_BUFFER):
+        """
+        The file's contents in chunks of at most buffer bytes.
+        """
+        if self.entries[rel][5] == zipfile.ZIP_STORED:
+            yield from self.raw_chunks(rel, buffer)
+            return
+        inflater = zlib.decompressobj(-15)
+        for chunk in self.raw_chunks(rel, buffer):
+            while chunk:
+                data = inflater.decompress(chunk, buffer)
+                if data:
+                    yield data
+                chunk = inflater.unconsumed_tail
+        tail = inflater.flush()
+        if tail:
+            yield tail
+
+    def read(self, rel: str) -> bytes:
+        return b"".join(self.chunks(rel))
+
+    def extract(self, rel: str, dst: str, buffer: int = LARGE_COPY_BUFFER, created=None) -> int:
+        """
+        Write one file to dst (which must not exist yet) with its original mtime; a CRC mismatch
+        (damaged pack) raises ValueError. created(dst) is called once dst exists. Returns the bytes written.
+        """
+        size, mtime, crc = self.entries[rel][0], self.entries[rel][1], self.entries[rel][6]
+        check = written = 0
+        with open(dst, "xb") as f:
+            if created is not None:
+                created(dst)
+            for chunk in self.chunks(rel, buffer):
+                check = zlib.crc32(chunk, check)
+                written += len(chunk)
+                f.write(chunk)
+        if check != crc or written != size:
+            raise ValueError(f"{rel} is damaged in {self.path}")
+        os.utime(dst, ns=(mtime, mtime))
+        return written
+
+
+def open_pack(prof_path: str, store_dir: str = None) -> Optional[PackReader]:
+    """
+    The PackReader of a packed profile, None if the profile is a plain folder.
+    """
+    path = os.path.join(prof_path, PACK_FILE)
+    return PackReader(path, store_dir) if os.path.isfile(path) else None
+
+
+# --- Profile index ---
+
+
+# --- Pallet manifests ---
+
+
+def _marrow_ref(objects: dict, item):
+    # Marrow JSON links objects by {"ref": id}; older files inline them
+    if isinstance(item, dict) and "ref" in item and str(item["ref"]) in objects:
+        return objects[str(item["ref"])]
+    return item if isinstance(item, dict) else {}
+
+
+def _crate_kind(data: dict, obj: dict, link) -> str:
+    # "SLZ.Marrow.Warehouse.AvatarCrate, ..." -> "Avatar"
+    type_id = (link.get("type") if isinstance(link, dict) else None) or obj.get("isa", {}).get("type")
+    fullname = data.get("types", {}).get(str(type_id), {}).get("fullname", "") if type_id is not None else ""
+    name = fullname.split(",")[0].rsplit(".", 1)[-1]
+    return name[:-len("Crate")] if name.endswith("Crate") and name != "Crate" else name
+
+
+def _load_json(path: str, data: bytes = None):
+    # a JSON file, or its already read contents (e.g. from a pack); a UTF-8 BOM is fine
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    return json.loads(data)
+
+
+def parse_pallet_json(path: str, data: bytes = None) -> Optional[dict]:
+    """
+    barcode / title / author / version, crates and dependencies of a Bonelab pallet.json
+    (Marrow object graph or the flat older layout). None if it isn't one.
+    `data` is the file's contents when they are already read.
+    """
+    try:
+        data = _load_json(path, data)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    objects = data.get("objects") if isinstance(data.get("objects"), dict) else {}
+    pallet = _marrow_ref(objects, data.get("root")) if objects else data
+    if not pallet.get("barcode") and objects:
+        # no usable root: the object that lists crates is the pallet
+        pallet = next((o for o in objects.values() if isinstance(o, dict) and "crates" in o), {})
+    barcode = pallet.get("barcode")
+    if not isinstance(barcode, str) or not barcode:
+        return None
+    crates = []
+    for link in pallet.get("crates") or []:
+        obj = _marrow_ref(objects, link)
+        if obj.get("barcode"):
+            crates.append({"barcode": obj["barcode"], "title": str(obj.get("title") or ""),
+                           "kind": _crate_kind(data, obj, link)})
+    deps = []
+    for link in pallet.get("dependencies") or []:
+        obj = _marrow_ref(objects, link)
+        if obj.get("barcode"):
+            deps.append({"barcode": obj["barcode"], "version": str(obj.get("version") or "")})
+    return {
+        "barcode": barcode,
+        "title": str(pallet.get("title") or ""),
+        "author": str(pallet.get("author") or ""),
+        "version": str(pallet.get("version") or ""),
+        "crates": crates,
+        "dependencies": deps,
+    }
+
+
+def parse_mod_manifest(path: str, data: bytes = None) -> Optional[dict]:
+    """
+    Pallet barcode and mod.io listing (title / author / version) from a <pallet>.manifest file.
+    """
+    try:
+        data = _load_json(path, data)
+        objects = data.get("objects", {})
+        for obj in objects.values():
+            if isinstance(obj, dict) and obj.get("palletBarcode"):
+                listing = _marrow_ref(objects, obj.get("modListing"))
+                return {"barcode": obj["palletBarcode"], "title": str(listing.get("title") or ""),
+                        "author": str(listing.get("author") or ""), "version": str(listing.get("version") or "")}
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def search_terms(*texts) -> set:
+    """
+    Lower-case words of barcodes / titles / authors, as stored in (and looked up from) the term index.
+    """
+    terms = set()
+    for text in texts:
+        terms.update(t for t in re.split(r"[^0-9a-z]+", (text or "").lower()) if t)
+    return terms
+
+
+class ProfileIndex:
+    """
+    SQLite index of every profile: per-profile and per-entry (top-level item) file counts,
+    bytes and mtimes, plus the per-file manifest with content hashes where known, and the
+    pallets (barcodes, crates, dependencies) found in each profile with a word index over them.
+    It is refreshed incrementally after each mutation and, on startup, only checked against
+    directory mtimes. Usable from the job thread and the Tk thread at the same time.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS profiles (name TEXT PRIMARY KEY, mtime_ns INTEGER, files INTEGER, bytes INTEGER);
+    CREATE TABLE IF NOT EXISTS entries (profile TEXT, name TEXT, mtime_ns INTEGER, files INTEGER, bytes INTEGER,
+                                        PRIMARY KEY (profile, name));
+    CREATE TABLE IF NOT EXISTS files (profile TEXT, rel TEXT, entry TEXT, size INTEGER, mtime_ns INTEGER, digest TEXT,
+                                      PRIMARY KEY (profile, rel));
+    CREATE INDEX IF NOT EXISTS files_by_digest ON files (digest);
+    CREATE TABLE IF NOT EXISTS pallets (profile TEXT, entry TEXT, path TEXT, barcode TEXT COLLATE NOCASE, title TEXT,
+                                        author TEXT, version TEXT, PRIMARY KEY (profile, path));
+    CREATE INDEX IF NOT EXISTS pallets_by_barcode ON pallets (barcode);
+    CREATE TABLE IF NOT EXISTS crates (profile TEXT, entry TEXT, pallet TEXT, barcode TEXT COLLATE NOCASE, title TEXT,
+                                       kind TEXT);
+    CREATE INDEX IF NOT EXISTS crates_by_barcode ON crates (barcode);
+    CREATE INDEX IF NOT EXISTS crates_by_profile ON crates (profile, entry);
+    CREATE TABLE IF NOT EXISTS deps (profile TEXT, entry TEXT, pallet TEXT, barcode TEXT COLLATE NOCASE, version TEXT);
+    CREATE INDEX IF NOT EXISTS deps_by_profile ON deps (profile, entry);
+    CREATE TABLE IF NOT EXISTS terms (term TEXT, profile TEXT, entry TEXT, barcode TEXT);
+    CREATE INDEX IF NOT EXISTS terms_by_term ON terms (term);
+    CREATE INDEX IF NOT EXISTS terms_by_profile ON terms (profile, entry);
+    CREATE TABLE IF NOT EXISTS resolved (profile TEXT PRIMARY KEY, key TEXT, data TEXT);
+    CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+    # bump when the pallet parsing changes: every profile's pallets are re-read on the next sync
+    PALLET_INDEX_VERSION = "1"
+    PALLET_TABLES = ("pallets", "crates", "deps", "terms")
+
+    def __init__(self, path: str = INDEX_FILE, profiles_dir: str = PROFILES_DIR, store_dir: str = STORE_DIR):
+        self.profiles_dir = profiles_dir
+        self.store_dir = store_dir
+        self._lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'pallet_index'").fetchone()
+        self._pallets_stale = row is None or row[0] != self.PALLET_INDEX_VERSION
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    # --- reading ---
+    def profiles(self) -> list:
+        with self._lock:
+            return self.db.execute("SELECT name, files, bytes FROM profiles ORDER BY name").fetchall()
+
+    def profile_totals(self, name: str):
+        with self._lock:
+            return self.db.execute("SELECT files, bytes FROM profiles WHERE name = ?", (name,)).fetchone()
+
+    def entries(self, name: str) -> list:
+        with self._lock:
+            return self.db.execute("SELECT name, files, bytes FROM entries WHERE profile = ? ORDER BY name",
+                                   (name,)).fetchall()
+
+    def manifest(self, name: str) -> dict:
+        with self._lock:
+            rows = self.db.execute("SELECT rel, size, mtime_ns, digest FROM files WHERE profile = ?", (name,))
+            return {rel: [size, mtime, digest] for rel, size, mtime, digest in rows}
+
+    def children(self, name: str, path: str = "") -> Optional[list]:
+        """
+        Direct children of a folder inside a profile ("" = top level), aggregated from the file
+        table: [(name, is_dir, files, bytes)]. None if the profile isn't indexed.
+        """
+        with self._lock:
+            if self.db.execute("SELECT 1 FROM profiles WHERE name = ?", (name,)).fetchone() is None:
+                return None
+            if not path:
+                return [(n, not is_file, files, size) for n, files, size, is_file in self.db.execute(
+                    "SELECT e.name, e.files, e.bytes, EXISTS (SELECT 1 FROM files f WHERE f.profile = e.profile "
+                    "AND f.rel = e.name) FROM entries e WHERE e.profile = ?", (name,))]
+            prefix = path + "/"
+            rows = self.db.execute("SELECT rel, size FROM files WHERE profile = ? AND rel >= ? AND rel < ?",
+                                   (name, prefix, prefix + "\uffff")).fetchall()
+        found = {}
+        for rel, size in rows:
+            child, sep, _ = rel[len(prefix):].partition("/")
+            node = found.setdefault(child, [child, bool(sep), 0, 0])
+            node[2] += 1
+            node[3] += size
+        return [tuple(n) for n in found.values()]
+
+    def profiles_with_digest(self, digest: str) -> list:
+        with self._lock:
+            return [r[0] for r in self.db.execute("SELECT DISTINCT profile FROM files WHERE digest = ?", (digest,))]
+
+    # --- writing ---
+    def set_digests(self, name: str, digests: dict):
+        with self._lock, self.db:
+            self.db.executemany("UPDATE files SET digest = ? WHERE profile = ? AND rel = ?",
+                                [(d, name, rel) for rel, d in digests.items()])
+
+    def remove_profile(self, name: str):
+        with self._lock, self.db:
+            for table, col in self._profile_columns():
+                self.db.execute(f"DELETE FROM {table} WHERE {col} = ?", (name,))
+
+    def rename_profile(self, old: str, new: str):
+        with self._lock, self.db:
+            for table, col in self._profile_columns():
+                self.db.execute(f"UPDATE {table} SET {col} = ? WHERE {col} = ?", (new, old))
+
+    def _profile_columns(self):
+        return [("profiles", "name"), ("entries", "profile"), ("files", "profile"), ("resolved", "profile")] + \
+               [(table, "profile") for table in self.PALLET_TABLES]
+
+    # --- layered profiles ---
+    def layer_key(self, specs: dict) -> str:
+        """
+        Fingerprint of a set of layers: their definitions plus what the index knows about each
+        one's files (totals and top-level mtimes). Changes whenever a resolution could.
+        """
+        names = sorted(specs)
+        marks = ",".join("?" * len(names))
+        with self._lock:
+            totals = self.db.execute(f"SELECT name, mtime_ns, files, bytes FROM profiles WHERE name IN ({marks}) "
+                                     "ORDER BY name", names).fetchall()
+            entries = self.db.execute(f"SELECT profile, name, mtime_ns, bytes FROM entries WHERE profile IN ({marks}) "
+                                      "ORDER BY profile, name", names).fetchall()
+        # entries are folded in here, not summed in SQL: a few mtime_ns already overflow SQLite's integers
+        h = hashlib.sha256(json.dumps([[[n, specs[n]] for n in names], totals]).encode("utf-8"))
+        for profile, name, mtime_ns, size in entries:
+            h.update(f"\n{profile}:{name}:{mtime_ns}:{size}".encode("utf-8"))
+        return h.hexdigest()
+
+    def resolved(self, name: str, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self.db.execute("SELECT data FROM resolved WHERE profile = ? AND key = ?", (name, key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_resolved(self, name: str, key: str, data: dict):
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO resolved VALUES (?, ?, ?)", (name, key, json.dumps(data)))
+
+    def pallet_paths(self, names) -> list:
+        """
+        [(profile, pallet.json path, barcode, version)] of the given profiles.
+        """
+        names = list(names)
+        with self._lock:
+            return self.db.execute(f"SELECT profile, path, barcode, version FROM pallets WHERE profile IN "
+                                   f"({','.join('?' * len(names))})", names).fetchall()
+
+    def dependencies(self, names) -> list:
+        """
+        [(profile, pallet, dependency barcode, wanted version)] declared by the given profiles' pallets.
+        """
+        names = list(names)
+        with self._lock:
+            return self.db.execute(f"SELECT profile, pallet, barcode, version FROM deps WHERE profile IN "
+                                   f"({','.join('?' * len(names))})", names).fetchall()
+
+    # --- pallets ---
+    def index_pallets(self, name: str, entry_names=None):
+        """
+        (Re)read the pallet.json / *.manifest files of a profile, or of some of its top-level
+        entries, from the already updated file table.
+        """
+        prof_path = os.path.join(self.profiles_dir, name)
+        with self._lock:
+            rows = self.db.execute("SELECT rel, entry FROM files WHERE profile = ? AND (rel LIKE '%pallet.json' "
+                                   "OR rel LIKE '%.manifest')", (name,)).fetchall()
+        scope = None if entry_names is None else set(entry_names)
+        pallets, crates, deps, terms, listings = [], [], [], [], {}
+        # a packed profile's files are read from its pack
+        pack = open_pack(prof_path) if rows else None
+        try:
+            for rel, entry in rows:
+                if scope is not None and entry not in scope:
+                    continue
+                base = rel.rsplit("/", 1)[-1].lower()
+                data = pack.read(rel) if pack is not None and rel in pack.entries else None
+                if base == "pallet.json":
+                    info = parse_pallet_json(_native(prof_path, rel), data)
+                    if info is None:
+                        continue
+                    pallets.append([name, entry, rel, info["barcode"], info["title"], info["author"], info["version"]])
+                    crates += [(name, entry, info["barcode"], c["barcode"], c["title"], c["kind"]) for c in info["crates"]]
+                    deps += [(name, entry, info["barcode"], d["barcode"], d["version"]) for d in info["dependencies"]]
+                    terms += [(t, name, entry, info["barcode"])
+                              for t in search_terms(info["barcode"], info["title"], info["author"])]
+                    for c in info["crates"]:
+                        terms += [(t, name, entry, c["barcode"]) for t in search_terms(c["barcode"], c["title"])]
+                elif base.endswith(".manifest"):
+                    listing = parse_mod_manifest(_native(prof_path, rel), data)
+                    if listing:
+                        listings[listing["barcode"].lower()] = listing
+        finally:
+            if pack is not None:
+                pack.close()
+        # the mod.io listing fills in what the pallet itself leaves empty
+        for row in pallets:
+            listing = listings.get(row[3].lower())
+            if listing:
+                row[4:7] = [row[4] or listing["title"], row[5] or listing["author"], row[6] or listing["version"]]
+        with self._lock, self.db:
+            for table in self.PALLET_TABLES:
+                if scope is None:
+                    self.db.execute(f"DELETE FROM {table} WHERE profile = ?", (name,))
+                else:
+                    self.db.executemany(f"DELETE FROM {table} WHERE profile = ? AND entry = ?",
+                                        [(name, e) for e in scope])
+            self.db.executemany("INSERT OR REPLACE INTO pallets VALUES (?, ?, ?, ?, ?, ?, ?)", pallets)
+            self.db.executemany("INSERT INTO crates VALUES (?, ?, ?, ?, ?, ?)", crates)
+            self.db.executemany("INSERT INTO deps VALUES (?, ?, ?, ?, ?)", deps)
+            self.db.executemany("INSERT INTO terms VALUES (?, ?, ?, ?)", terms)
+
+    def find_barcode(self, barcode: str) -> list:
+        """
+        Every profile holding a pallet or crate with this barcode: [(profile, kind, barcode, title, version, pallet)].
+        """
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT profile, 'Pallet', barcode, title, version, barcode FROM pallets WHERE barcode = ? "
+                "UNION ALL SELECT c.profile, c.kind, c.barcode, c.title, p.version, c.pallet FROM crates c "
+                "LEFT JOIN pallets p ON p.profile = c.profile AND p.barcode = c.pallet WHERE c.barcode = ? "
+                "ORDER BY 1", (barcode, barcode)).fetchall()
+        return rows
+
+    def search(self, text: str, limit: int = 200) -> list:
+        """
+        Pallets / crates whose barcode, title or author contain all words of text (the last one as a prefix):
+        [(profile, kind, barcode, title, version, pallet)].
+        """
+        words = [t for t in re.split(r"[^0-9a-z]+", text.lower()) if t]
+        if not words:
+            return []
+        clauses, params = [], []
+        for i, w in enumerate(words):
+            if i == len(words) - 1:
+                clauses.append("SELECT profile, barcode FROM terms WHERE term >= ? AND term < ?")
+                params += [w, w + "\uffff"]
+            else:
+                clauses.append("SELECT profile, barcode FROM terms WHERE term = ?")
+                params.append(w)
+        with self._lock:
+            hits = self.db.execute("SELECT DISTINCT * FROM (" + " INTERSECT ".join(clauses) + ") LIMIT ?",
+                                   params + [limit]).fetchall()
+            out = []
+            for profile, barcode in hits:
+                row = self.db.execute("SELECT profile, 'Pallet', barcode, title, version, barcode FROM pallets "
+                                      "WHERE profile = ? AND barcode = ?", (profile, barcode)).fetchone()
+                if row is None:
+                    row = self.db.execute("SELECT c.profile, c.kind, c.barcode, c.title, p.version, c.pallet "
+                                          "FROM crates c LEFT JOIN pallets p ON p.profile = c.profile "
+                                          "AND p.barcode = c.pallet WHERE c.profile = ? AND c.barcode = ?",
+                                          (profile, barcode)).fetchone()
+                if row is not None:
+                    out.append(row)
+        return sorted(out, key=lambda r: (r[3].lower() or r[2].lower(), r[0]))
+
+    def version_conflicts(self) -> list:
+        """
+        Pallets present in more than one version (across profiles) or more than once in one profile:
+        [{"barcode", "versions": {version: [profiles]}, "duplicates": [profiles with 2+ copies]}].
+        """
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT barcode, version, profile FROM pallets WHERE barcode IN (SELECT barcode FROM pallets "
+                "GROUP BY barcode HAVING COUNT(DISTINCT version) > 1 OR COUNT(*) > COUNT(DISTINCT profile)) "
+                "ORDER BY barcode, version, profile").fetchall()
+        found = {}
+        for barcode, version, profile in rows:
+            c = found.setdefault(barcode.lower(), {"barcode": barcode, "versions": {}, "duplicates": []})
+            c["versions"].setdefault(version, []).append(profile)
+        for c in found.values():
+            seen = [p for profiles in c["versions"].values() for p in profiles]
+            c["duplicates"] = sorted({p for p in seen if seen.count(p) > 1})
+            c["versions"] = {v: sorted(set(profiles)) for v, profiles in c["versions"].items()}
+        return list(found.values())
+
+    def missing_dependencies(self, dependency: str = None) -> list:
+        """
+        Dependencies that a profile's pallets declare but the profile doesn't contain, optionally only
+        for one dependency barcode: [(profile, pallet, missing barcode, wanted version)].
+        """
+        query = ("SELECT d.profile, d.pallet, d.barcode, d.version FROM deps d WHERE NOT EXISTS "
+                 "(SELECT 1 FROM pallets p WHERE p.profile = d.profile AND p.barcode = d.barcode)")
+        params = ()
+        if dependency:
+            query += " AND d.barcode = ?"
+            params = (dependency,)
+        with self._lock:
+            return self.db.execute(query + " ORDER BY d.profile, d.barcode", params).fetchall()
+
+    def _top_level(self, prof_path: str) -> dict:
+        # {entry: stamp}; a folder's stamp is the newest mtime of any directory in it, so a
+        # file added, removed or renamed at any depth changes it
+        found = {}
+        with os.scandir(prof_path) as it:
+            for e in it:
+                if is_internal_name(e.name):
+                    continue
+                stamp = e.stat(follow_symlinks=False).st_mtime_ns
+                if e.is_dir(follow_symlinks=False):
+                    stamp = max(stamp, _newest_dir_mtime(e.path))
+                found[e.name] = stamp
+        return found
+
+    def rescan_profile(self, name: str, entry_names=None):
+        """
+        Re-stat a profile (or just some of its top-level entries) and store the result.
+        Hashes are kept for files whose size and mtime didn't change, and taken from the
+        blob store for files that are store links; everything else gets digest NULL.
+        A packed profile is read from its pack's table of contents instead.
+        """
+        prof_path = os.path.join(self.profiles_dir, name)
+        if not os.path.isdir(prof_path):
+            self.remove_profile(name)
+            return
+        pack = open_pack(prof_path)
+        if pack is not None:
+            self._index_pack(name, pack)
+            return
+        top = self._top_level(prof_path)
+        scope = sorted(top) if entry_names is None else [n for n in entry_names]
+        old = self.manifest(name)
+        catalog = _load_inode_catalog(self.store_dir)
+        file_rows = []
+        entry_rows = []
+        for entry in scope:
+            if entry not in top:
+                continue
+            path = os.path.join(prof_path, entry)
+            if os.path.isdir(path) and not os.path.islink(path):
+                paths = [(f"{entry}/{rel}", _native(path, rel)) for rel in scan_manifest(path)]
+            else:
+                paths = [(entry, path)]
+            files = size_sum = 0
+            for rel, p in paths:
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                prev = old.get(rel)
+                digest = prev[2] if prev and prev[0] == st.st_size and prev[1] == st.st_mtime_ns else None
+                digest = digest or catalog.get(_inode_key(st))
+                file_rows.append((name, rel, entry, st.st_size, st.st_mtime_ns, digest))
+                files += 1
+                size_sum += st.st_size
+            entry_rows.append((name, entry, top[entry], files, size_sum))
+        with self._lock, self.db:
+            if entry_names is None:
+                self.db.execute("DELETE FROM entries WHERE profile = ?", (name,))
+                self.db.execute("DELETE FROM files WHERE profile = ?", (name,))
+            else:
+                for entry in scope:
+                    self.db.execute("DELETE FROM entries WHERE profile = ? AND name = ?", (name, entry))
+                    self.db.execute("DELETE FROM files WHERE profile = ? AND entry = ?", (name, entry))
+            self.db.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?)", entry_rows)
+            self.db.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)", file_rows)
+            files, size_sum = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files WHERE profile = ?",
+                                              (name,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?)",
+                            (name, os.stat(prof_path).st_mtime_ns, files, size_sum))
+        self.index_pallets(name, None if entry_names is None else scope)
+
+    def _index_pack(self, name: str, pack: PackReader):
+        # a packed profile is indexed from its table of contents, always as a whole; the pack's
+        # mtime stands in for the folder and entry mtimes
+        with pack:
+            manifest = pack.manifest()
+            stamp = pack.stamp[1]
+        file_rows = []
+        totals = {}
+        for rel, (size, mtime, digest) in manifest.items():
+            entry = rel.split("/", 1)[0]
+            file_rows.append((name, rel, entry, size, mtime, digest))
+            t = totals.setdefault(entry, [0, 0])
+            t[0] += 1
+            t[1] += size
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM entries WHERE profile = ?", (name,))
+            self.db.execute("DELETE FROM files WHERE profile = ?", (name,))
+            self.db.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?)",
+                                [(name, entry, stamp, files, size) for entry, (files, size) in totals.items()])
+            self.db.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?, ?)", file_rows)
+            self.db.execute("INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?)",
+                            (name, stamp, len(file_rows), sum(r[3] for r in file_rows)))
+        self.index_pallets(name)
+
+    def sync(self, names=None) -> list:
+        """
+        Bring the index in line with the disk using directory mtimes only: new profiles are
+        scanned, vanished ones dropped, and only top-level entries in which some directory's
+        mtime changed rescanned.
+        Returns the names of profiles that changed.
+        """
+        on_disk = []
+        for n in os.listdir(self.profiles_dir):
+            if not is_internal_name(n) and os.path.isdir(os.path.join(self.profiles_dir, n)):
+                on_disk.append(n)
+        if names is None:
+            with self._lock:
+                known_names = [r[0] for r in self.db.execute("SELECT name FROM profiles")]
+            for gone in known_names:
+                if gone not in on_disk:
+                    self.remove_profile(gone)
+            names = on_disk
+        if self._pallets_stale:
+            # index written by an older BLSM: read every profile's pallets once
+            with self._lock:
+                indexed_names = [r[0] for r in self.db.execute("SELECT name FROM profiles")]
+            for name in indexed_names:
+                self.index_pallets(name)
+            with self._lock, self.db:
+                self.db.execute("INSERT OR REPLACE INTO meta VALUES ('pallet_index', ?)", (self.PALLET_INDEX_VERSION,))
+            self._pallets_stale = False
+        changed = []
+        for name in names:
+            prof_path = os.path.join(self.profiles_dir, name)
+            if not os.path.isdir(prof_path):
+                self.remove_profile(name)
+                changed.append(name)
+                continue
+            with self._lock:
+                known = self.db.execute("SELECT mtime_ns FROM profiles WHERE name = ?", (name,)).fetchone()
+                indexed = dict(self.db.execute("SELECT name, mtime_ns FROM entries WHERE profile = ?", (name,)))
+            if known is None:
+                self.rescan_profile(name)
+                changed.append(name)
+                continue
+            pack = os.path.join(prof_path, PACK_FILE)
+            if os.path.isfile(pack):
+                # packed: only the pack's own mtime matters
+                if known[0] != os.stat(pack).st_mtime_ns:
+                    self.rescan_profile(name)
+                    changed.append(name)
+                continue
+            top = self._top_level(prof_path)
+            stale = [n for n, m in top.items() if indexed.get(n) != m] + [n for n in indexed if n not in top]
+            if stale or known[0] != os.stat(prof_path).st_mtime_ns:
+                self.rescan_profile(name, stale)
+                changed.append(name)
+        return changed
+
+
+# --- Profile operations (run as jobs by the UI) ---
+
+
+def add_paths_to_profile(paths, dest_profile: str, mods_folder: str = None, mode: str = "link",
+                         progress: Progress = None, store_dir: str = STORE_DIR,
+                         state_file: str = ACTIVE_STATE_FILE) -> list:
+    """
+    Add ZIPs (extracted), folders and plain files to a profile; ZIPs go into mods_folder instead when given.
+    Returns [(path, error)] for items that failed. A failed item is rolled back on its own,
+    cancelling rolls back everything added by this call.
+    """
+    progress = progress or Progress()
+    errors = []
+    done = []
+    cache = ImportCache(store_dir)
+    try:
+        for f in paths:
+            progress.check()
+            is_zip = os.path.isfile(f) and f.lower().endswith(".zip")
+            target = mods_folder if (is_zip and mods_folder) else dest_profile
+            txn = Transaction(sibling_work_dir(target, "rollback"))
+            try:
+                progress.set_phase(os.path.basename(f))
+                if is_zip:
+                    if target == mods_folder:
+                        clear_active_state(state_file)
+                    import_archive(f, target, mode, progress, txn, cache)
+                elif os.path.isdir(f):
+                    # external folders are copied, never hardlinked: the user may keep editing them
+                    materialize_tree(f, os.path.join(dest_profile, os.path.basename(f)), "copy", progress, txn)
+                else:
+                    # regular file -> copy into profile
+                    d = os.path.join(dest_profile, os.path.basename(f))
+                    txn.displace(d)
+                    progress.advance(copy_file(f, d, LARGE_COPY_BUFFER, txn.created))
+                done.append(txn)
+            except JobCancelled:
+                txn.rollback()
+                raise
+            except Exception as e:
+                txn.rollback()
+                errors.append((f, e))
+    except JobCancelled:
+        for txn in reversed(done):
+            txn.rollback()
+        raise
+    finally:
+        cache.evict()
+        cache.save()
+    for txn in done:
+        txn.commit()
+    if mode == "link":
+        progress.set_phase("Deduplicating")
+        ingest_tree(dest_profile, store_dir, progress)
+    return errors
+
+
+def create_profile_from_folder(src: str, dest: str, mode: str = "link", progress: Progress = None,
+                               store_dir: str = STORE_DIR):
+    """
+    New profile `dest` holding everything in src (usually the Mods folder). Removed again on cancel/failure.
+    """
+    progress = progress or Progress()
+    os.makedirs(dest)
+    try:
+        progress.set_phase("Copying")
+        materialize_tree(src, dest, mode, progress)
+        if mode == "link":
+            progress.set_phase("Deduplicating")
+            ingest_tree(dest, store_dir, progress)
+    except BaseException:
+        shutil.rmtree(dest, ignore_errors=True)
+        raise
+
+
+def find_archives(source: str) -> list:
+    """
+    ZIPs in a directory (recursively) or matching a glob, largest first.
+    """
+    if os.path.isdir(source):
+        found = []
+        for r, dirs, files in os.walk(source):
+            found.extend(os.path.join(r, f) for f in files if f.lower().endswith(".zip"))
+    else:
+        found = [p for p in glob.glob(source, recursive=True) if os.path.isfile(p) and p.lower().endswith(".zip")]
+    return sorted(found, key=os.path.getsize, reverse=True)
+
+
+def _bulk_extract_worker(zip_path: str, staging: str, threads: int) -> dict:
+    # runs in a pool process: extract one archive into its private staging dir
+    t0 = time.perf_counter()
+    extract_zip_autofix(zip_path, staging, workers=threads)
+    return {"path": zip_path, "seconds": time.perf_counter() - t0, "cached": False}
+
+
+def bulk_import(source: str, dest_profile: str, workers: int = BULK_IMPORT_WORKERS, mode: str = "link",
+                progress: Progress = None, store_dir: str = STORE_DIR) -> dict:
+    """
+    Import every archive in a directory / glob into a profile using a process pool.
+    Archives known to the import cache are linked straight from the store; the others are
+    extracted into their own staging folder, stored, and placed into the profile when done,
+    so a broken archive never leaves half its files behind. Failures are collected in the report
+    instead of stopping the run; cancelling rolls back everything placed so far.
+    """
+    progress = progress or Progress()
+    t0 = time.perf_counter()
+    archives = find_archives(source)
+    sizes = {a: os.path.getsize(a) for a in archives}
+    progress.add_total(sum(sizes.values()), len(archives))
+    report = {"source": source, "profile": os.path.basename(os.path.normpath(dest_profile)),
+              "archives": len(archives), "imported": [], "failed": []}
+    staging_root = os.path.join(dest_profile, f"{INTERNAL_PREFIX}_import")
+    txn = Transaction(sibling_work_dir(dest_profile, "rollback"))
+    threads = max(1, EXTRACT_WORKERS // max(1, workers))
+    cache = ImportCache(store_dir)
+    fingerprints = {}
+    try:
+        # cache hits first: no extraction at all
+        misses = []
+        for i, a in enumerate(archives):
+            progress.check()
+            try:
+                fp = fingerprints[i] = archive_fingerprint(a)
+            except Exception as e:
+                report["failed"].append({"path": a, "error": f"{type(e).__name__}: {e}"})
+                progress.advance(sizes[a])
+                continue
+            entry = cache.lookup(fp)
+            if entry is None:
+                misses.append(i)
+                continue
+            t = time.perf_counter()
+            cache.place(entry, dest_profile, mode, txn=txn)
+            report["imported"].append({"path": a, "seconds": time.perf_counter() - t, "cached": True,
+                                       "bytes": entry["bytes"], "files": len(entry["files"])})
+            progress.advance(sizes[a])
+        if misses:
+            # imported here: it pulls in multiprocessing, which startup doesn't need
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(misses)))) as ex:
+                futures = {ex.submit(_bulk_extract_worker, archives[i], os.path.join(staging_root, str(i)), threads): i
+                           for i in misses}
+                pending = set(futures)
+                try:
+                    while pending:
+                        finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                        progress.check()
+                        for fut in finished:
+                            i = futures[fut]
+                            a = archives[i]
+                            staging = os.path.join(staging_root, str(i))
+                            try:
+                                r = fut.result()
+                                entry = cache.add_tree(fingerprints[i], staging, os.path.basename(a))
+                                cache.place(entry, dest_profile, mode, txn=txn)
+                                r.update(bytes=entry["bytes"], files=len(entry["files"]))
+                                report["imported"].append(r)
+                            except Exception as e:
+                                report["failed"].append({"path": a, "error": f"{type(e).__name__}: {e}"})
+                            shutil.rmtree(staging, ignore_errors=True)
+                            progress.advance(sizes[a])
+                except BaseException:
+                    for fut in pending:
+                        fut.cancel()
+                    raise
+    except BaseException:
+        txn.rollback()
+        raise
+    finally:
+        shutil.rmtree(staging_root, ignore_errors=True)
+        cache.evict()
+        cache.save()
+    txn.commit()
+    if mode == "link" and report["imported"]:
+        progress.set_phase("Deduplicating")
+        ingest_tree(dest_profile, store_dir, progress)
+    seconds = time.perf_counter() - t0
+    total = sum(r["bytes"] for r in report["imported"])
+    report.update({
+        "cached": sum(1 for r in report["imported"] if r["cached"]),
+        "seconds": round(seconds, 3),
+        "bytes": total,
+        "files": sum(r["files"] for r in report["imported"]),
+        "bytes_per_sec": round(total / seconds) if seconds > 0 else 0,
+        "archives_per_sec": round(len(report["imported"]) / seconds, 2) if seconds > 0 else 0,
+    })
+    return report
+
+
+def format_import_report(report: dict, max_failures: int = 15) -> str:
+    lines = [
+        f"Imported {len(report['imported'])} of {report['archives']} archives into {report['profile']}"
+        f" ({report['cached']} from cache)",
+        f"{report['files']} files, {format_bytes(report['bytes'])} in {format_duration(report['seconds'])}"
+        f" ({format_bytes(report['bytes_per_sec'])}/s, {report['archives_per_sec']} archives/s)",
+    ]
+    if report["failed"]:
+        lines.append(f"{len(report['failed'])} failed:")
+        for f in report["failed"][:max_failures]:
+            lines.append(f"  {os.path.basename(f['path'])}: {f['error']}")
+        if len(report["failed"]) > max_failures:
+            lines.append(f"  ... and {len(report['failed']) - max_failures} more")
+    return "\n".join(lines)
+
+
+def delete_profile_tree(prof_path: str, store_dir: str = STORE_DIR):
+    shutil.rmtree(prof_path)
+    store_gc(store_dir)
+
+
+# --- Config ---
+
+
+def load_config(path: str = CONFIG_FILE) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_config(config: dict, path: str = CONFIG_FILE):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp, path)
+
+
+# --- Public API ---
+
+
+@dataclass
+class ProfileInfo:
+    name: str
+    files: int  # own files; a layered profile's parents are not counted
+    bytes: int
+    parents: List[str] = field(default_factory=list)
+    packed: bool = False  # files kept in a pack (see ModManager.pack)
+
+
+@dataclass
+class TreeNode:
+    name: str
+    path: str  # "/"-separated, relative to the profile
+    is_dir: bool
+    files: int
+    bytes: int
+
+
+@dataclass
+class PalletHit:
+    profile: str
+    kind: str  # "Pallet", or the crate type: "Avatar", "Level", "Spawnable", ...
+    barcode: str
+    title: str
+    version: str
+    pallet: str
+
+
+@dataclass
+class VerifyReport:
+    profile: Optional[str]
+    missing: List[str]
+    extra: List[str]
+    modified: List[str]
+    touched: List[str] = field(default_factory=list)  # same contents, different timestamp
+    checked: int = 0  # files in the Mods folder
+    hashed: int = 0  # files whose contents had to be compared
+    hashed_bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.extra or self.modified)
+
+
+@dataclass
+class ModsChanges:
+    """
+    What updating a profile from the Mods folder would do (see ModManager.changes_from_mods).
+    """
+    profile: str
+    added: List[str]  # only in the Mods folder: copied into the profile
+    removed: List[str]  # no longer in the Mods folder: removed from the profile
+    changed: List[str]  # different contents: replaced in the profile
+    touched: List[str] = field(default_factory=list)  # same contents, different timestamp
+    add_bytes: int = 0  # size of the added and changed files in the Mods folder
+    remove_bytes: int = 0  # size of the removed and replaced files in the profile
+    checked: int = 0
+    hashed: int = 0
+    hashed_bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.removed or self.changed)
+
+
+def _operation(op: str):
+    """
+    Run a ModManager method as one logged operation (OpLog.record). It must take `progress`;
+    one is created if the caller passed none, so phases and counters are always recorded.
+    """
+    def wrap(method):
+        # positions of "name" / "progress" among the arguments after self
+        params = method.__code__.co_varnames[1:method.__code__.co_argcount]
+        at = params.index("progress")
+
+        @functools.wraps(method)
+        def run(self, *args, **kwargs):
+            name = args[0] if args and params[0] == "name" else kwargs.get("name")
+            if len(args) > at:
+                progress = args[at] or Progress()
+                args = args[:at] + (progress,) + args[at + 1:]
+            else:
+                progress = kwargs["progress"] = kwargs.get("progress") or Progress()
+            with self.ops.record(op, progress, profile=name, mode=self.mode) as entry:
+                result = method(self, *args, **kwargs)
+                entry["result"] = result
+            return result
+        return run
+    return wrap
+
+
+class ModManager:
+    """
+    Headless BLSM: one profiles directory (with its blob store and index) plus one Mods folder.
+    Every long-running method takes an optional Progress for reporting and cancellation.
+    """
+
+    def __init__(self, profiles_dir: str = PROFILES_DIR, mods_folder: str = "", mode: str = "link",
+                 index_path: str = INDEX_FILE, staged: bool = False):
+        if mode not in ACTIVATION_MODES:
+            raise ValueError(f"mode must be one of {ACTIVATION_MODES}")
+        os.makedirs(profiles_dir, exist_ok=True)
+        self.profiles_dir = profiles_dir
+        self.store_dir = os.path.join(profiles_dir, f"{INTERNAL_PREFIX}_store")
+        self.state_file = os.path.join(profiles_dir, f"{INTERNAL_PREFIX}_active.json")
+        self.mods_folder = mods_folder
+        self.mode = mode
+        # activate by swapping in a pre-built tree instead of editing the Mods folder in place
+        self.staged = staged
+        self.index = ProfileIndex(index_path, profiles_dir, self.store_dir)
+        # operation log next to the index; profiling (cProfile + tracemalloc per operation) is opt-in
+        self.ops = OpLog(os.path.join(os.path.dirname(os.path.abspath(index_path)), OPS_LOG))
+        # open packs of packed profiles, reused until the pack changes
+        self._packs = {}
+        self._packs_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict = None) -> "ModManager":
+        config = load_config() if config is None else config
+        return cls(mods_folder=config.get("mods_folder", ""), mode=config.get("activation_mode", "link"),
+                   staged=config.get("staged_activation", False))
+
+    def close(self):
+        with self._packs_lock:
+            for pack in self._packs.values():
+                pack.close()
+            self._packs.clear()
+        self.index.close()
+
+    # --- profiles ---
+    def profile_path(self, name: str) -> str:
+        if not name or is_internal_name(name) or os.path.basename(name) != name:
+            raise ValueError(f"Invalid profile name: {name!r}")
+        return os.path.join(self.profiles_dir, name)
+
+    def exists(self, name: str) -> bool:
+        return os.path.isdir(self.profile_path(name))
+
+    def _require(self, name: str) -> str:
+        path = self.profile_path(name)
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Profile not found: {name}")
+        return path
+
+    def _require_mods(self) -> str:
+        if not self.mods_folder or not os.path.isdir(self.mods_folder):
+            raise FileNotFoundError("Mods folder not set or doesn't exist.")
+        return self.mods_folder
+
+    def list_profiles(self, sync: bool = True) -> List[ProfileInfo]:
+        if sync:
+            self.index.sync()
+        infos = []
+        for row in self.index.profiles():
+            path = os.path.join(self.profiles_dir, row[0])
+            infos.append(ProfileInfo(*row, parents=load_layers(path)["parents"],
+                                     packed=os.path.isfile(os.path.join(path, PACK_FILE))))
+        return infos
+
+    def list_contents(self, name: str) -> List[ProfileInfo]:
+        return [ProfileInfo(*row) for row in self.index.entries(name)]
+
+    def list_children(self, name: str, path: str = "") -> List[TreeNode]:
+        """
+        One level of a profile's tree ("" = top level, otherwise a "/"-separated folder path),
+        folders first. Comes from the index; a profile the index doesn't know yet is scanned.
+        """
+        rows = self.index.children(name, path)
+        if rows is None:
+            rows = scan_children(_native(self._require(name), path) if path else self._require(name))
+        prefix = path + "/" if path else ""
+        nodes = [TreeNode(n, prefix + n, is_dir, files, size) for n, is_dir, files, size in rows]
+        return sorted(nodes, key=lambda n: (not n.is_dir, n.name.lower()))
+
+    def active_profile(self) -> Optional[str]:
+        return load_active_profile(self.state_file)
+
+    def create_profile(self, name: str):
+        os.makedirs(self.profile_path(name), exist_ok=False)
+        self.index.rescan_profile(name)
+
+    def rename_profile(self, old: str, new: str):
+        src = self._require(old)
+        dst = self.profile_path(new)
+        if os.path.exists(dst):
+            raise FileExistsError(f"Profile already exists: {new}")
+        self._release_pack(old)
+        os.rename(src, dst)
+        self.index.rename_profile(old, new)
+        # profiles built on it follow the new name
+        for child in self.inheritors(new, old):
+            spec = self.layers(child)
+            self.set_layers(child, [new if p == old else p for p in spec["parents"]], spec["remove"])
+
+    @_operation("delete")
+    def delete_profile(self, name: str, progress: Progress = None):
+        children = self.inheritors(name)
+        if children:
+            raise ValueError(f"{name} is a parent of {', '.join(children)}; remove it from their layers first.")
+        self._release_pack(name)
+        delete_profile_tree(self._require(name), self.store_dir)
+        self.index.remove_profile(name)
+
+    # --- layered profiles ---
+    def layers(self, name: str) -> dict:
+        return load_layers(self._require(name))
+
+    def set_layers(self, name: str, parents: Iterable[str], remove: Iterable[str] = ()):
+        """
+        Make a profile build on parent profiles (later ones win), minus the given paths of theirs.
+        Empty parents and remove make it a plain profile again.
+        """
+        path = self._require(name)
+        parents = list(parents)
+        for parent in parents:
+            self._require(parent)
+        old = load_layers(path)
+        save_layers(path, parents, list(remove))
+        try:
+            self._layer_specs(name)
+        except ValueError:
+            save_layers(path, old["parents"], old["remove"])
+            raise
+
+    def inheritors(self, name: str, old_name: str = None) -> List[str]:
+        """
+        Profiles listing name (or old_name, during a rename) as a parent.
+        """
+        parent = old_name or name
+        return [n for n in sorted(os.listdir(self.profiles_dir))
+                if not is_internal_name(n) and parent in load_layers(os.path.join(self.profiles_dir, n))["parents"]]
+
+    def _layer_specs(self, name: str) -> dict:
+        # layer definitions of a profile and all its ancestors; refuses cycles and missing parents
+        specs = {}
+        stack = [(name, ())]
+        while stack:
+            n, chain = stack.pop()
+            if n in chain:
+                raise ValueError("Profile layers form a cycle: " + " -> ".join(chain + (n,)))
+            if n in specs:
+                continue
+            path = self.profile_path(n)
+            if not os.path.isdir(path):
+                raise FileNotFoundError(f"Parent profile not found: {n} (used by {chain[-1]})" if chain else
+                                        f"Profile not found: {n}")
+            specs[n] = load_layers(path)
+            stack += [(p, chain + (n,)) for p in specs[n]["parents"]]
+        return specs
+
+    def resolve(self, name: str) -> dict:
+        """
+        Effective file set of a profile with its parents: the manifest, the profile each path
+        comes from and the conflicts between parents. Cached in the index until a layer changes.
+        """
+        specs = self._layer_specs(name)
+        self.index.sync(list(specs))
+        if not specs[name]["parents"]:
+            manifest = self.index.manifest(name)
+            return {"manifest": manifest, "sources": dict.fromkeys(manifest, name), "conflicts": [],
+                    "layered": False, "cached": False}
+        key = self.index.layer_key(specs)
+        data = self.index.resolved(name, key)
+        if data is not None:
+            return dict(data, layered=True, cached=True)
+        manifest, sources, conflicts = resolve_layers(name, specs.__getitem__, self.index.manifest)
+        # the same pallet twice (e.g. two versions in different folders) is a conflict too
+        by_barcode = {}
+        for profile, rel, barcode, version in self.index.pallet_paths(specs):
+            if sources.get(rel) == profile:
+                by_barcode.setdefault(barcode.lower(), []).append((rel, profile, version))
+        for found in by_barcode.values():
+            if len(found) > 1:
+                conflicts.append({"kind": "pallet", "profile": name, "path": found[0][0].rsplit("/", 1)[0],
+                                  "layers": [f[1] for f in found], "versions": [f[2] for f in found],
+                                  "paths": [f[0] for f in found]})
+        data = {"manifest": manifest, "sources": sources, "conflicts": conflicts}
+        self.index.save_resolved(name, key, data)
+        return dict(data, layered=True, cached=False)
+
+    def _target(self, name: str):
+        # (manifest, sources for the file placing functions or None, conflicts) to activate / verify / export
+        data = self.resolve(name)
+        if not data["layered"]:
+            return data["manifest"], None, []
+        roots = {}
+        sources = {}
+        for rel, profile in data["sources"].items():
+            root = roots.get(profile)
+            if root is None:
+                root = roots[profile] = self._root(profile)
+            sources[rel] = root
+        return data["manifest"], sources, data["conflicts"]
+
+    # --- packed profiles ---
+    def is_packed(self, name: str) -> bool:
+        return os.path.isfile(os.path.join(self.profile_path(name), PACK_FILE))
+
+    def _pack(self, name: str) -> Optional[PackReader]:
+        # the open pack of a packed profile (None for a plain one); reopened when the pack changed
+        path = os.path.join(self.profile_path(name), PACK_FILE)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            st = None
+        with self._packs_lock:
+            pack = self._packs.get(name)
+            if pack is not None and (st is None or pack.stamp != (st.st_size, st.st_mtime_ns)):
+                self._packs.pop(name).close()
+                pack = None
+            if pack is None and st is not None:
+                pack = self._packs[name] = PackReader(path, self.store_dir)
+            return pack
+
+    def _release_pack(self, name: str):
+        # close a profile's pack before it is moved or deleted (an open mapping pins the file on Windows)
+        with self._packs_lock:
+            pack = self._packs.pop(name, None)
+        if pack is not None:
+            pack.close()
+
+    def _root(self, name: str):
+        # where a profile's files are read from: its folder, or its pack when packed
+        return self._pack(name) or self._require(name)
+
+    def _require_unpacked(self, name: str) -> str:
+        path = self.profile_path(name)
+        if os.path.isfile(os.path.join(path, PACK_FILE)):
+            raise ValueError(f"{name} is packed; unpack it before changing its files.")
+        return path
+
+    @_operation("pack")
+    def pack(self, name: str, progress: Progress = None, level: int = PACK_LEVEL) -> dict:
+        """
+        Move a profile's files into one compressed pack inside its folder (level 1-9, 0 = store only).
+        The loose files go, and with them the store blobs no other profile uses. A packed profile
+        can still be listed, searched, activated, verified and exported (all straight from the
+        pack); adding or removing files needs unpack() first.
+        """
+        self._require(name)
+        path = self._require_unpacked(name)
+        progress = progress or Progress()
+        self.index.sync([name])
+        result = pack_profile(path, progress, level, known=self.index.manifest(name))
+        progress.set_phase("Removing files")
+        for entry in os.listdir(path):
+            if is_internal_name(entry):
+                continue
+            entry_path = os.path.join(path, entry)
+            if os.path.isdir(entry_path) and not os.path.islink(entry_path):
+                shutil.rmtree(entry_path)
+            else:
+                os.remove(entry_path)
+        result["freed"] = store_gc(self.store_dir)
+        self.index.rescan_profile(name)
+        return result
+
+    @_operation("unpack")
+    def unpack(self, name: str, progress: Progress = None) -> dict:
+        """
+        Turn a packed profile back into a plain folder (files the store still has are linked from it).
+        """
+        path = self._require(name)
+        pack = self._pack(name)
+        if pack is None:
+            raise ValueError(f"{name} is not packed.")
+        progress = progress or Progress()
+        target = pack.manifest()
+        # files left over from an interrupted pack are kept if they match; nothing else is removed
+        _, add, replace = diff_manifests(target, scan_manifest(path))
+        m = apply_diff(pack, path, target, [], add, replace, self.mode, progress)
+        if self.mode == "link":
+            progress.set_phase("Deduplicating")
+            ingest_tree(path, self.store_dir, progress)
+        self._release_pack(name)
+        os.remove(os.path.join(path, PACK_FILE))
+        self.index.rescan_profile(name)
+        return {"files": len(target), "placed": m.counts, "throughput": m.stats()}
+
+    @_operation("remove")
+    def remove_entries(self, name: str, entries: Iterable[str], progress: Progress = None) -> List[Tuple[str, Exception]]:
+        """
+        Remove folders/files from a profile: top-level names or "/"-separated paths inside it.
+        Returns the ones that failed with their error.
+        """
+        self._require(name)
+        path = self._require_unpacked(name)
+        entries = list(entries)
+        errors = []
+        for entry in entries:
+            target = _native(path, entry)
+            try:
+                if os.path.commonpath([os.path.abspath(path), os.path.abspath(target)]) != os.path.abspath(path) \
+                        or os.path.abspath(target) == os.path.abspath(path):
+                    raise ValueError(f"Not inside the profile: {entry}")
+                if os.path.isdir(target):
+                    shutil.rmtree(target)
+                elif os.path.exists(target):
+                    os.remove(target)
+            except Exception as e:
+                errors.append((entry, e))
+        store_gc(self.store_dir)
+        self.index.rescan_profile(name, sorted({e.split("/")[0] for e in entries}))
+        return errors
+
+    # --- import ---
+    @_operation("import")
+    def import_paths(self, name: str, paths: Iterable[str], to_mods: bool = False,
+                     progress: Progress = None) -> List[Tuple[str, Exception]]:
+        """
+        Add ZIPs / folders / files to a profile (ZIPs into the Mods folder with to_mods).
+        The profile is created if it doesn't exist yet. Returns the items that failed with their error.
+        """
+        dest = self._require_unpacked(name)
+        os.makedirs(dest, exist_ok=True)
+        mods = self._require_mods() if to_mods else None
+        try:
+            return add_paths_to_profile(list(paths), dest, mods, self.mode, progress, self.store_dir, self.state_file)
+        finally:
+            self.index.sync([name])
+
+    @_operation("bulk-import")
+    def bulk_import(self, name: str, source: str, workers: int = BULK_IMPORT_WORKERS,
+                    progress: Progress = None) -> dict:
+        dest = self._require_unpacked(name)
+        os.makedirs(dest, exist_ok=True)
+        try:
+            return bulk_import(source, dest, workers, self.mode, progress, self.store_dir)
+        finally:
+            self.index.sync([name])
+
+    @_operation("create")
+    def create_from_mods(self, name: str, progress: Progress = None):
+        dest = self.profile_path(name)
+        if os.path.exists(dest):
+            raise FileExistsError(f"Profile already exists: {name}")
+        try:
+            create_profile_from_folder(self._require_mods(), dest, self.mode, progress, self.store_dir)
+        finally:
+            self.index.sync([name])
+
+    @_operation("dedupe")
+    def deduplicate(self, progress: Progress = None) -> Dict[str, int]:
+        progress = progress or Progress()
+        files = hashed = 0
+        for info in self.list_profiles():
+            progress.set_phase(info.name)
+            stats = ingest_tree(self.profile_path(info.name), self.store_dir, progress)
+            files += stats["files"]
+            hashed += stats["hashed"]
+            # store links now have known digests
+            self.index.rescan_profile(info.name)
+        return {"files": files, "hashed": hashed, "freed": store_gc(self.store_dir)}
+
+    # --- Mods folder ---
+    @_operation("activate")
+    def activate(self, name: str, progress: Progress = None) -> dict:
+        """
+        Make the Mods folder match the profile, touching only what differs. With staged
+        activation the profile is (if not already) built next to the Mods folder and swapped in.
+        """
+        mods = self._require_mods()
+        # the index knows the profile's manifest (a cheap mtime check makes sure it's current);
+        # a layered profile's is resolved from its parents'
+        target, sources, conflicts = self._target(name)
+        path = self._root(name)
+        if not (self.staged and can_swap(mods)):
+            result = activate_incremental(path, mods, self.mode, name, progress, target, self.state_file, sources)
+            return dict(result, conflicts=conflicts) if sources else result
+        progress = progress or Progress()
+        result = self._stage(name, path, target, progress, sources)
+        progress.set_phase("Swapping")
+        t0 = time.perf_counter()
+        kept = swap_in_stage(mods, name, target, self.state_file)
+        result = dict(result, swapped=True, swap_seconds=round(time.perf_counter() - t0, 4), previous_staged=kept)
+        return dict(result, conflicts=conflicts) if sources else result
+
+    @_operation("stage")
+    def stage(self, name: str, progress: Progress = None) -> dict:
+        """
+        Pre-build the profile next to the Mods folder so activating it later is a rename.
+        """
+        self._require_mods()
+        target, sources, _ = self._target(name)
+        return self._stage(name, self._root(name), target, progress or Progress(), sources)
+
+    def _stage(self, name: str, path: str, target: dict, progress: Progress, sources: dict = None) -> dict:
+        if is_stage_current(self.mods_folder, name, target):
+            return {"removed": 0, "added": 0, "replaced": 0, "kept": len(target), "placed": {}}
+        progress.set_phase("Staging")
+        return stage_profile(path, self.mods_folder, name, self.mode, progress, target, sources)
+
+    @_operation("unload")
+    def unload(self, progress: Progress = None):
+        clear_mods_folder(self._require_mods(), progress, self.state_file)
+
+    @_operation("export")
+    def export(self, name: str, dest_zip: str, progress: Progress = None, level: int = EXPORT_LEVEL,
+               volume_size: int = 0) -> List[str]:
+        """
+        Export a profile as ZIP (level 0-9, 0 = store only), split into volume_size pieces if > 0.
+        Returns the written file(s). A layered profile is exported with its parents' files,
+        a packed one straight from its pack.
+        """
+        path = self._require(name)
+        pack = self._pack(name)
+        files = None
+        if self.layers(name)["parents"]:
+            target, sources, _ = self._target(name)
+            files = [(rel, (sources[rel], rel) if isinstance(sources[rel], PackReader) else _native(sources[rel], rel))
+                     for rel in sorted(target)]
+        elif pack is not None:
+            files = [(rel, (pack, rel)) for rel in sorted(pack.entries)]
+        return export_profile_zip(path, dest_zip, progress, level, volume_size, files=files)
+
+    # --- pallet search (answered from the index; sync=False when it's known to be current) ---
+    def _layered_pallets(self) -> Dict[str, set]:
+        # {layered profile: {(profile the pallet comes from, pallet barcode lowercased)}} over its resolved layers
+        found = {}
+        for name, _, _ in self.index.profiles():
+            try:
+                if not load_layers(self.profile_path(name))["parents"]:
+                    continue
+                specs = self._layer_specs(name)
+                sources = self.resolve(name)["sources"]
+            except (OSError, ValueError, sqlite3.Error):
+                log.warning("Layers of %s could not be resolved for searching", name, exc_info=True)
+                continue
+            found[name] = {(profile, barcode.lower()) for profile, rel, barcode, _ in self.index.pallet_paths(specs)
+                           if sources.get(rel) == profile}
+        return found
+
+    def _with_layers(self, rows) -> List[PalletHit]:
+        # hits of a parent's pallets count for every profile inheriting them
+        hits = [PalletHit(*row) for row in rows]
+        layered = self._layered_pallets()
+        out = [h for h in hits if h.profile not in layered]
+        for name, pallets in layered.items():
+            out += [PalletHit(**dict(asdict(h), profile=name)) for h in hits if (h.profile, h.pallet.lower()) in pallets]
+        return out
+
+    def find_barcode(self, barcode: str, sync: bool = True) -> List[PalletHit]:
+        if sync:
+            self.index.sync()
+        return sorted(self._with_layers(self.index.find_barcode(barcode)), key=lambda h: h.profile)
+
+    def search(self, text: str, sync: bool = True) -> List[PalletHit]:
+        if sync:
+            self.index.sync()
+        return sorted(self._with_layers(self.index.search(text)),
+                      key=lambda h: (h.title.lower() or h.barcode.lower(), h.profile))
+
+    def version_conflicts(self, sync: bool = True) -> List[dict]:
+        if sync:
+            self.index.sync()
+        return self.index.version_conflicts()
+
+    def missing_dependencies(self, dependency: str = None, sync: bool = True) -> List[dict]:
+        if sync:
+            self.index.sync()
+        layered = self._layered_pallets()
+        rows = [r for r in self.index.missing_dependencies(dependency) if r[0] not in layered]
+        # a layered profile has the pallets of its whole chain, so check it against all of them
+        for name, pallets in layered.items():
+            have = {barcode for _, barcode in pallets}
+            for profile, pallet, dep, v in self.index.dependencies({profile for profile, _ in pallets}):
+                if (profile, pallet.lower()) in pallets and dep.lower() not in have \
+                        and (not dependency or dep.lower() == dependency.lower()):
+                    rows.append((name, pallet, dep, v))
+        return [{"profile": p, "pallet": pallet, "missing": dep, "version": v}
+                for p, pallet, dep, v in sorted(set(rows), key=lambda r: (r[0], r[2].lower(), r[1].lower()))]
+
+    def recover(self) -> dict:
+        """
+        Startup cleanup: put back what a crashed run had moved aside and purge leftover trash,
+        next to the profiles and next to the Mods folder.
+        """
+        result = recover_work_dirs(os.path.join(self.profiles_dir, f"{INTERNAL_PREFIX}_rollback"))
+        if not self.mods_folder:
+            return result
+        # a swap cut short between its renames leaves no Mods folder; that comes first
+        result["swap_rolled_back"] = recover_swap(self.mods_folder)
+        rollback_roots = [sibling_work_dir(self.mods_folder, "rollback")]
+        stage_root = sibling_work_dir(self.mods_folder, "stage")
+        if os.path.isdir(stage_root):
+            rollback_roots += [os.path.join(stage_root, n, f"{INTERNAL_PREFIX}_rollback")
+                               for n in os.listdir(stage_root) if not is_internal_name(n)]
+        for root in rollback_roots:
+            more = recover_work_dirs(root)
+            result["restored"] += more["restored"]
+            result["purging"] += more["purging"]
+        sweep_stages(self.mods_folder)
+        return result
+
+    @_operation("verify")
+    def verify(self, name: str = None, deep: bool = False, progress: Progress = None) -> VerifyReport:
+        """
+        Compare the Mods folder with a profile (default: the active one): size and mtime first,
+        contents only for files where those disagree (for every file with deep).
+        """
+        name = name or self.active_profile()
+        if not name:
+            raise ValueError("No profile given and none is active.")
+        mods = self._require_mods()
+        t0 = time.perf_counter()
+        target, sources, _ = self._target(name)
+        result = verify_tree(self._root(name), mods, target, progress, deep, sources=sources)
+        return VerifyReport(name, seconds=round(time.perf_counter() - t0, 4), **result)
+
+    @_operation("update-check")
+    def changes_from_mods(self, name: str = None, deep: bool = False, progress: Progress = None) -> ModsChanges:
+        """
+        The files that differ between the Mods folder and a plain profile (default: the active one),
+        found like verify(): size and mtime first, contents only where those disagree (for every
+        file with deep). Nothing is changed; pass the result to update_from_mods.
+        """
+        name = name or self.active_profile()
+        if not name:
+            raise ValueError("No profile given and none is active.")
+        self._require(name)
+        path = self._require_unpacked(name)
+        if self.layers(name)["parents"]:
+            raise ValueError(f"{name} builds on other profiles; only plain profiles can be updated from the Mods folder.")
+        mods = self._require_mods()
+        t0 = time.perf_counter()
+        self.index.sync([name])
+        target = self.index.manifest(name)
+        found = verify_tree(path, mods, target, progress, deep)
+        return ModsChanges(name, added=found["extra"], removed=found["missing"], changed=found["modified"],
+                           touched=found["touched"],
+                           add_bytes=sum(os.path.getsize(_native(mods, rel)) for rel in found["extra"] + found["modified"]),
+                           remove_bytes=sum(target[rel][0] for rel in found["missing"] + found["modified"]),
+                           checked=found["checked"], hashed=found["hashed"], hashed_bytes=found["hashed_bytes"],
+                           seconds=round(time.perf_counter() - t0, 4))
+
+    @_operation("update")
+    def update_from_mods(self, name: str = None, changes: ModsChanges = None, progress: Progress = None) -> dict:
+        """
+        Bring a profile in line with the Mods folder, transferring only the files in `changes`
+        (worked out first if no change set of the same profile is given). Afterwards the Mods
+        folder counts as that profile activated.
+        """
+        name = name or (changes.profile if changes else None) or self.active_profile()
+        if changes is None or changes.profile != name:
+            changes = self.changes_from_mods(name, progress=progress)
+        path = self._require_unpacked(name)
+        mods = self._require_mods()
+        clear_active_state(self.state_file)
+        result = update_from_folder(mods, path, changes.removed, changes.added, changes.changed, changes.touched,
+                                    self.mode, progress, self.store_dir)
+        self.index.rescan_profile(name, sorted({rel.split("/")[0] for rel in
+                                                changes.removed + changes.added + changes.changed}))
+        save_active_state(mods, name, self.index.manifest(name), self.state_file)
+        return result
+
+    @_operation("repair")
+    def repair(self, name: str = None, report: VerifyReport = None, progress: Progress = None) -> dict:
+        """
+        Fix only the entries a verify found wrong (verifies first if no report of the same profile is given).
+        """
+        name = name or (report.profile if report else None) or self.active_profile()
+        if report is None or report.profile != name:
+            report = self.verify(name, progress=progress)
+        mods = self._require_mods()
+        target, sources, _ = self._target(name)
+        return repair_tree(self._root(name), mods, target, report.missing, report.extra, report.modified,
+                           report.touched, self.mode, name, progress, self.state_file, sources)
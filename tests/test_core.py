@@ -0,0 +1,331 @@
+"""
+Regression tests for blsm_core (headless; run with python -m pytest or python -m unittest).
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import blsm_core  # noqa: E402
+
+
+class TempDirTest(unittest.TestCase):
+    def setUp(self):
+        self.work = tempfile.mkdtemp(prefix="blsm-test-")
+
+    def tearDown(self):
+        blsm_core.TRASH.wait()
+        shutil.rmtree(self.work, ignore_errors=True)
+
+    def path(self, *parts) -> str:
+        return os.path.join(self.work, *parts)
+
+    def write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+class ExtractTest(TempDirTest):
+    def test_single_file_archive_is_extracted(self):
+        archive = self.path("mod.zip")
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("mod.json", "{}")
+        dest = self.path("out")
+        os.makedirs(dest)
+        result = blsm_core.extract_zip_autofix(archive, dest)
+        self.assertEqual(result["written"], 1)
+        with open(os.path.join(dest, "mod.json")) as f:
+            self.assertEqual(f.read(), "{}")
+
+    def test_existing_files_are_replaced(self):
+        archive = self.path("mod.zip")
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("Wrap/Pal/a.txt", "new")
+        dest = self.path("out")
+        os.makedirs(os.path.join(dest, "Pal"))
+        with open(os.path.join(dest, "Pal", "a.txt"), "w") as f:
+            f.write("old")
+        self.assertEqual(blsm_core.extract_zip_autofix(archive, dest), {"written": 1})
+        with open(os.path.join(dest, "Pal", "a.txt")) as f:
+            self.assertEqual(f.read(), "new")
+
+    def test_wrapper_folder_is_stripped(self):
+        self.assertEqual(blsm_core.zip_strip_prefix(["Wrap/", "Wrap/a.txt", "Wrap/b/c.txt"]), "Wrap/")
+        self.assertEqual(blsm_core.zip_strip_prefix(["mod.json"]), "")
+        self.assertEqual(blsm_core.zip_strip_prefix(["Pal/pallet.json", "Pal/x.bundle"]), "")
+
+
+class CopyTest(TempDirTest):
+    def setUp(self):
+        super().setUp()
+        self.data = os.urandom(300_000)
+        with open(self.path("src"), "wb") as f:
+            f.write(self.data)
+
+    def copy(self, size: int) -> int:
+        with open(self.path("src"), "rb", buffering=0) as fsrc, open(self.path("dst"), "wb", buffering=0) as fdst:
+            return blsm_core._copy_data(fsrc, fdst, size, 4096)
+
+    def test_kernel_copy_stopping_early_is_finished(self):
+        calls = []
+
+        def stalling(infd, outfd, count, *args):
+            calls.append(count)
+            return os.write(outfd, os.read(infd, min(count, 1000))) if len(calls) == 1 else 0
+
+        with mock.patch.dict(blsm_core._kernel_copy, {"copy_file_range": True, "sendfile": False}), \
+                mock.patch.object(blsm_core.os, "copy_file_range", stalling, create=True):
+            self.assertEqual(self.copy(len(self.data)), len(self.data))
+        with open(self.path("dst"), "rb") as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_short_source_raises(self):
+        with self.assertRaises(OSError):
+            self.copy(len(self.data) + 10)
+
+
+class PlaceTest(TempDirTest):
+    def check_failed_placement_keeps_user_file(self, mode: str):
+        self.write(self.path("prof", "Pal", "sub", "u.txt"), b"profile")
+        self.write(self.path("Mods", "Pal", "sub", "u.txt"), b"user")
+        target = {"Pal/sub/u.txt": [7, 0, None], "Pal/gone.txt": [3, 0, None]}
+        with self.assertRaises(OSError):
+            blsm_core.apply_diff(self.path("prof"), self.path("Mods"), target, [], ["Pal/sub/u.txt", "Pal/gone.txt"],
+                                 [], mode)
+        with open(self.path("Mods", "Pal", "sub", "u.txt"), "rb") as f:
+            self.assertEqual(f.read(), b"user")
+        self.assertFalse(os.path.exists(self.path("Mods", "Pal", "gone.txt")))
+
+    def test_rollback_restores_existing_file_link_mode(self):
+        self.check_failed_placement_keeps_user_file("link")
+
+    def test_rollback_restores_existing_file_copy_mode(self):
+        self.check_failed_placement_keeps_user_file("copy")
+
+    def test_copy_never_overwrites(self):
+        self.write(self.path("a"), b"a")
+        self.write(self.path("b"), b"b")
+        with self.assertRaises(FileExistsError):
+            blsm_core.copy_file(self.path("a"), self.path("b"))
+
+
+class ActivateTest(TempDirTest):
+    def activate(self) -> dict:
+        return blsm_core.activate_incremental(self.path("prof"), self.path("Mods"), "link", "P",
+                                              state_file=self.path("active.json"))
+
+    def test_files_added_deep_in_mods_are_found(self):
+        self.write(self.path("prof", "Pal", "sub", "x.bundle"), b"x")
+        os.makedirs(self.path("Mods"))
+        self.activate()
+        self.write(self.path("Mods", "Pal", "sub", "y.bundle"), b"user")
+        self.assertIsNone(blsm_core.load_active_manifest(self.path("Mods"), self.path("active.json")))
+        result = self.activate()
+        self.assertEqual((result["removed"], result["kept"]), (1, 1))
+        self.assertFalse(os.path.exists(self.path("Mods", "Pal", "sub", "y.bundle")))
+
+
+    def test_modified_mods_tree_is_repaired(self):
+        self.write(self.path("prof", "Pal", "a.bundle"), b"a")
+        self.write(self.path("prof", "Pal", "sub", "b.bundle"), b"b")
+        os.makedirs(self.path("Mods"))
+        self.activate()
+        os.remove(self.path("Mods", "Pal", "sub", "b.bundle"))
+        os.remove(self.path("Mods", "Pal", "a.bundle"))
+        self.write(self.path("Mods", "Pal", "a.bundle"), b"changed")
+        result = self.activate()
+        self.assertEqual((result["added"], result["replaced"]), (1, 1))
+        with open(self.path("Mods", "Pal", "a.bundle"), "rb") as f:
+            self.assertEqual(f.read(), b"a")
+        with open(self.path("prof", "Pal", "a.bundle"), "rb") as f:
+            self.assertEqual(f.read(), b"a")
+
+    def test_files_added_deep_in_a_profile_are_activated(self):
+        self.write(self.path("profiles", "P", "Pal", "sub", "deep", "a.bundle"), b"a")
+        os.makedirs(self.path("Mods"))
+        mm = blsm_core.ModManager(self.path("profiles"), self.path("Mods"), "link", self.path("index.sqlite"))
+        try:
+            mm.activate("P")
+            self.write(self.path("profiles", "P", "Pal", "sub", "deep", "b.bundle"), b"b")
+            result = mm.activate("P")
+            self.assertEqual((result["added"], result["kept"]), (1, 1))
+            self.assertTrue(os.path.exists(self.path("Mods", "Pal", "sub", "deep", "b.bundle")))
+        finally:
+            mm.index.close()
+
+
+class StagedSwapTest(TempDirTest):
+    def setUp(self):
+        super().setUp()
+        self.write(self.path("profiles", "P", "PPal", "p.bundle"), b"p")
+        self.write(self.path("profiles", "Q", "QPal", "q.bundle"), b"q")
+        os.makedirs(self.path("Mods"))
+        self.mm = blsm_core.ModManager(self.path("profiles"), self.path("Mods"), "link", self.path("index.sqlite"),
+                                       staged=True)
+        self.mm.state_file = self.path("active.json")
+        self.stage_root = self.path(f"{blsm_core.INTERNAL_PREFIX}_stage")
+
+    def tearDown(self):
+        self.mm.index.close()
+        super().tearDown()
+
+    def test_switching_keeps_previous_profile_staged(self):
+        self.mm.activate("P")
+        result = self.mm.activate("Q")
+        self.assertEqual((result["swapped"], result["previous_staged"]), (True, "P"))
+        self.assertEqual(os.listdir(self.path("Mods")), ["QPal"])
+        self.assertTrue(self.mm.verify("Q").ok)
+        self.assertEqual(self.mm.activate("P")["added"], 0)
+        self.assertEqual(os.listdir(self.path("Mods")), ["PPal"])
+
+    def test_recovery_after_both_renames_trashes_the_old_tree(self):
+        self.mm.activate("P")
+        aside = os.path.join(self.stage_root, f"{blsm_core.INTERNAL_PREFIX}_previous-1")
+        self.write(os.path.join(aside, "old.bundle"), b"old")
+        with open(os.path.join(self.stage_root, blsm_core.SWAP_JOURNAL), "w") as f:
+            json.dump({"mods": self.path("Mods"), "staged": "", "aside": aside}, f)
+        self.assertTrue(blsm_core.recover_swap(self.path("Mods")))
+        self.assertFalse(os.path.exists(aside))
+        self.assertEqual(os.listdir(self.path("Mods")), ["PPal"])
+
+    def test_recovery_between_renames_puts_mods_back(self):
+        self.mm.activate("P")
+        aside = os.path.join(self.stage_root, f"{blsm_core.INTERNAL_PREFIX}_previous-1")
+        os.replace(self.path("Mods"), aside)
+        with open(os.path.join(self.stage_root, blsm_core.SWAP_JOURNAL), "w") as f:
+            json.dump({"mods": self.path("Mods"), "staged": "", "aside": aside}, f)
+        self.assertTrue(self.mm.recover()["swap_rolled_back"])
+        self.assertEqual(os.listdir(self.path("Mods")), ["PPal"])
+
+    def test_swap_sweeps_leftovers(self):
+        leftover = os.path.join(self.stage_root, f"{blsm_core.INTERNAL_PREFIX}_previous-1")
+        self.write(os.path.join(leftover, "old.bundle"), b"old")
+        self.write(os.path.join(self.stage_root, "Gone", "state.json"), b"{}")
+        self.mm.activate("P")
+        self.assertFalse(os.path.exists(leftover))
+        self.assertFalse(os.path.exists(os.path.join(self.stage_root, "Gone")))
+
+
+class PackExportTest(TempDirTest):
+    files = {"Pal/pallet.json": b"{}", "Pal/big.bundle": b"b" * 200_000, "Other/x.txt": b"x"}
+
+    def setUp(self):
+        super().setUp()
+        for rel, data in self.files.items():
+            self.write(self.path("profiles", "P", *rel.split("/")), data)
+        os.makedirs(self.path("Mods"))
+        self.mm = blsm_core.ModManager(self.path("profiles"), self.path("Mods"), "link", self.path("index.sqlite"))
+        self.mm.state_file = self.path("active.json")
+
+    def tearDown(self):
+        self.mm.index.close()
+        super().tearDown()
+
+    def assertTree(self, root: str, files: dict):
+        found = {}
+        for rel in blsm_core.scan_manifest(root):
+            with open(os.path.join(root, *rel.split("/")), "rb") as f:
+                found[rel] = f.read()
+        self.assertEqual(found, files)
+
+    def assertZip(self, path: str, files: dict):
+        with zipfile.ZipFile(path) as zf:
+            self.assertEqual({n: zf.read(n) for n in zf.namelist()}, files)
+
+    def test_packed_profile_activates_and_unpacks(self):
+        self.mm.pack("P")
+        self.assertTrue(self.mm.is_packed("P"))
+        self.assertFalse(os.path.exists(self.path("profiles", "P", "Pal")))
+        self.mm.activate("P")
+        self.assertTree(self.path("Mods"), self.files)
+        self.assertTrue(self.mm.verify("P", deep=True).ok)
+        self.mm.unpack("P")
+        self.assertFalse(self.mm.is_packed("P"))
+        self.assertTree(self.path("profiles", "P"), self.files)
+
+    def test_export_plain_packed_and_split(self):
+        self.assertZip(self.mm.export("P", self.path("plain.zip"))[0], self.files)
+        self.mm.pack("P")
+        self.assertZip(self.mm.export("P", self.path("packed.zip"))[0], self.files)
+        volumes = self.mm.export("P", self.path("split.zip"), level=0, volume_size=64 * 1024)
+        self.assertGreater(len(volumes), 1)
+        with open(self.path("joined.zip"), "wb") as out:
+            for v in volumes:
+                with open(v, "rb") as f:
+                    out.write(f.read())
+        self.assertZip(self.path("joined.zip"), self.files)
+
+    def test_layered_export_includes_parent_files(self):
+        self.write(self.path("profiles", "C", "Mine", "m.txt"), b"m")
+        self.mm.set_layers("C", ["P"], remove=["Other"])
+        expected = {rel: data for rel, data in self.files.items() if not rel.startswith("Other/")}
+        expected["Mine/m.txt"] = b"m"
+        self.assertZip(self.mm.export("C", self.path("c.zip"))[0], expected)
+
+
+class LayeredSearchTest(TempDirTest):
+    def add_pallet(self, profile: str, barcode: str, dependencies=()):
+        folder = self.path("profiles", profile, barcode)
+        os.makedirs(folder)
+        with open(os.path.join(folder, "pallet.json"), "w", encoding="utf-8") as f:
+            json.dump({"barcode": barcode, "title": barcode, "author": "t", "version": "1.0.0", "crates": [],
+                       "dependencies": [{"barcode": d, "version": "1.0.0"} for d in dependencies]}, f)
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(self.path("Mods"))
+        self.mm = blsm_core.ModManager(self.path("profiles"), self.path("Mods"), "link", self.path("index.sqlite"))
+        self.add_pallet("Base", "A.Pal")
+        self.add_pallet("Child", "C.Pal", dependencies=["A.Pal", "B.Pal"])
+        self.mm.set_layers("Child", ["Base"])
+
+    def tearDown(self):
+        self.mm.index.close()
+        super().tearDown()
+
+    def test_inherited_dependency_is_not_missing(self):
+        missing = [(m["profile"], m["pallet"], m["missing"]) for m in self.mm.missing_dependencies()]
+        self.assertEqual(missing, [("Child", "C.Pal", "B.Pal")])
+
+    def test_inherited_pallet_is_found(self):
+        self.assertEqual([h.profile for h in self.mm.find_barcode("A.Pal")], ["Base", "Child"])
+        self.assertEqual([h.profile for h in self.mm.search("a pal")], ["Base", "Child"])
+
+    def test_many_entries_in_a_layer(self):
+        # the layer fingerprint must not add up mtime_ns values (SQLite integers overflow after a few)
+        for i in range(8):
+            self.add_pallet("Base", f"Extra{i}.Pal")
+        self.mm.index.sync()
+        self.assertEqual(len(self.mm.resolve("Child")["manifest"]), 10)
+        self.assertEqual([h.profile for h in self.mm.find_barcode("Extra7.Pal")], ["Base", "Child"])
+
+
+class VerifyTest(TempDirTest):
+    def test_deep_verify_hashes_linked_files(self):
+        os.makedirs(self.path("Mods"))
+        mm = blsm_core.ModManager(self.path("profiles"), self.path("Mods"), "link", self.path("index.sqlite"))
+        try:
+            os.makedirs(self.path("profiles", "P", "Pal"))
+            with open(self.path("profiles", "P", "Pal", "x.bundle"), "wb") as f:
+                f.write(b"x" * 100)
+            mm.activate("P")
+            self.assertEqual(mm.verify("P").hashed, 0)
+            report = mm.verify("P", deep=True)
+            self.assertTrue(report.ok)
+            self.assertEqual((report.hashed, report.hashed_bytes > 0), (1, True))
+        finally:
+            mm.index.close()
+
+
+class SourceTest(unittest.TestCase):
+    def test_gui_keeps_crlf_line_endings(self):
+        with open(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "BLSM.py"), "rb") as f:
+            lines = f.read().split(b"\n")[:-1]
+        self.assertTrue(lines and all(line.endswith(b"\r") for line in lines))